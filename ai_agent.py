@@ -1,26 +1,33 @@
 """
 AI Agent للبحث في موقع جامعة عمان العربية
 يستخدم LangChain و OpenAI لتقديم إجابات ذكية
+
+LangChain والوكيل وقاعدة المعرفة تُبنى عند أول استخدام فقط (get_agent_executor)،
+فاستيراد الملف سريع ويمكن استخدام أداة البحث وحدها دون تحميل LangChain
+
+الوكيل نفسه بلا حالة ومشترك بين كل الـ threads، وسجل كل جلسة محفوظ في SessionStore
+ويُمرَّر له آخر MEMORY_WINDOW أدوار فقط، فلا تختلط محادثات المستخدمين
 """
 
 import os
-import requests
-from bs4 import BeautifulSoup
-from langchain.agents import AgentExecutor, create_openai_functions_agent
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.memory import ConversationBufferMemory
-from langchain_core.messages import SystemMessage
-from langchain_core.tools import tool
-
-# إعداد OpenAI API (متوفر في البيئة)
-llm = ChatOpenAI(
-    model="gpt-4.1-mini",
-    temperature=0.7,
-    api_key=os.getenv("OPENAI_API_KEY")
-)
-
-@tool
+import sys
+import threading
+
+from knowledge_store import get_store
+from session_store import SessionStore
+
+# عدد الأدوار السابقة (سؤال وجواب) من الجلسة التي تُرسل مع كل رسالة
+MEMORY_WINDOW = int(os.getenv("AGENT_MEMORY_WINDOW", 5))
+# عدد الأقفال التي توزَّع عليها الجلسات؛ القفل يحمي قراءة السجل والإضافة إليه فقط، لا استدعاء النموذج
+SESSION_LOCK_STRIPES = 64
+
+_agent_executor = None
+_agent_executor_lock = threading.Lock()
+
+# تخزين المحادثات (محدود الحجم ومدة الخمول)
+conversations = SessionStore()
+_session_locks = [threading.Lock() for _ in range(SESSION_LOCK_STRIPES)]
+
 def search_aau_website(query: str) -> str:
     """
     أداة للبحث في موقع جامعة عمان العربية.
@@ -33,106 +40,15 @@ def search_aau_website(query: str) -> str:
         معلومات من موقع جامعة عمان العربية
     """
     try:
-        # قاعدة معرفة محلية شاملة عن الجامعة
-        knowledge_base = {
-            "contact": {
-                "keywords": ["رقم", "هاتف", "تواصل", "اتصال", "موبايل", "جوال", "ايميل", "بريد"],
-                "info": """
-معلومات التواصل مع جامعة عمان العربية:
-- الهاتف: 0798877440
-- الموقع الإلكتروني: https://www.aau.edu.jo/ar
-- العنوان: شارع الأردن، مبيس - عمان، الأردن
-- أوقات العمل: من الأحد إلى الخميس
-- وسائل التواصل الاجتماعي: Facebook, LinkedIn, Twitter, YouTube
-"""
-            },
-            "rankings": {
-                "keywords": ["تصنيف", "ترتيب", "مرتبة", "إنجازات", "تميز"],
-                "info": """
-إنجازات وتصنيفات جامعة عمان العربية:
-- دخول تصنيف QS العالمي 2026 للمرة الأولى
-- المرتبة 110 عربياً في تصنيف QS Arab Region 2025
-- المرتبة السادسة في تصنيف التايمز للجامعات العربية
-- المرتبة الرابعة أردنياً في تصنيف التايمز للتأثير 2025
-- المرتبة الأولى على الجامعات الخاصة في تصنيف ويبوميتركس 2025
-- المرتبة الأولى على الجامعات الخاصة والثانية أردنياً في تصنيف سيماجو 2025
-- المرتبة السادسة محلياً وضمن أول 388 جامعة عالمياً في تصنيف Green Metric 2024
-"""
-            },
-            "accreditations": {
-                "keywords": ["اعتماد", "شهادة", "جودة", "معتمد"],
-                "info": """
-الاعتمادات الدولية لجامعة عمان العربية:
-- EUR-ACE: اعتماد دولي لهندسة البرمجيات (4 سنوات)
-- AABI: الأولى عربياً والسادس عالمياً في اعتماد الطيران الدولي
-- AACSB: اعتماد أمريكي لكلية الأعمال (مجدد)
-- ACPE: اعتماد أمريكي لكلية الصيدلة
-- IAA: موافقة أولية لاعتماد كلية الشريعة
-- EASA: اعتماد وكالة سلامة الطيران الأوروبية
-- ISO: شهادة الأيزو (2020-2027)
-"""
-            },
-            "majors": {
-                "keywords": ["تخصص", "كلية", "برنامج", "دراسة", "بكالوريوس", "ماجستير"],
-                "info": """
-الكليات والتخصصات في جامعة عمان العربية:
-- كلية الهندسة: هندسة البرمجيات (معتمدة EUR-ACE)، هندسة الطيران (معتمدة AABI و EASA)
-- كلية الأعمال: معتمدة أمريكياً AACSB، تخصصات: إدارة، محاسبة، تسويق، مالية
-- كلية الصيدلة: معتمدة أمريكياً ACPE
-- كلية الشريعة: اعتماد دولي IAA
-- كلية الحقوق
-- كلية العلوم التربوية والنفسية
-- كلية تكنولوجيا المعلومات
-- كلية الآداب والعلوم
-- كلية علوم الطيران
-- كلية العلوم الطبية التطبيقية
-- الكلية التقنية
-"""
-            },
-            "admission": {
-                "keywords": ["قبول", "تسجيل", "التحاق", "طالب", "شروط"],
-                "info": """
-القبول والتسجيل في جامعة عمان العربية:
-- فتح باب القبول والتسجيل للفصل الدراسي 2026-2025
-- للاستفسار والتسجيل: 0798877440
-- الموقع الإلكتروني: https://www.aau.edu.jo/ar
-- يمكن التواصل مع قسم القبول والتسجيل للحصول على معلومات تفصيلية
-- متاح للطلاب الأردنيين وغير الأردنيين
-"""
-            },
-            "discounts": {
-                "keywords": ["خصم", "منحة", "ثانوية", "معدل", "ضمان", "متقاعد"],
-                "info": """
-الخصومات المتاحة في جامعة عمان العربية:
-- خصومات حقيقية إضافية لكامل فترة الدراسة
-- خصم معدل الثانوية العامة: يصل إلى 90% حسب المعدل
-- خصم متقاعدي الضمان الاجتماعي
-- نوافذ الحلول المالية للطلاب
-للاستفسار: 0798877440
-"""
-            },
-            "fees": {
-                "keywords": ["رسوم", "اقساط", "دفع", "تكلفة", "سعر", "ساعة"],
-                "info": """
-رسوم الدراسة في جامعة عمان العربية:
-- جدول رسوم الساعات الدراسية مفصل متوفر على الموقع
-- نوافذ الحلول المالية للطلاب
-- خصومات تصل إلى 90% حسب معدل الثانوية
-- للاستفسار عن الرسوم: 0798877440
-- الموقع: https://www.aau.edu.jo/ar
-"""
-            }
-        }
+        # البحث في قاعدة المعرفة الموحّدة (chatbot-knowledge.json) مع فهارسها
+        results = [info for _, info in get_store().search(query)]
         
-        # البحث في قاعدة المعرفة
-        query_lower = query.lower()
-        results = []
-        
-        for category, data in knowledge_base.items():
-            for keyword in data["keywords"]:
-                if keyword in query_lower:
-                    results.append(data["info"])
-                    break
+        # البحث في صفحات الموقع (من الذاكرة المؤقتة على القرص إن وُجدت)
+        try:
+            from website_fetcher import get_fetcher
+            results += [f"{text}\n(المصدر: {url})" for url, text in get_fetcher().search(query)]
+        except Exception as e:
+            sys.stderr.write(f"Website search failed: {e}\n")
         
         if results:
             return "\n\n".join(results)
@@ -148,8 +64,6 @@ def search_aau_website(query: str) -> str:
     except Exception as e:
         return f"عذراً، حدث خطأ أثناء البحث: {str(e)}"
 
-# الأداة جاهزة (تم تعريفها باستخدام @tool decorator)
-
 # إعداد prompt للوكيل
 system_message = """أنت Tec، مساعد ذكي متخصص في جامعة عمان العربية.
 
@@ -166,42 +80,95 @@ system_message = """أنت Tec، مساعد ذكي متخصص في جامعة ع
 - قدم معلومات منظمة وسهلة القراءة
 """
 
-prompt = ChatPromptTemplate.from_messages([
-    ("system", system_message),
-    MessagesPlaceholder(variable_name="chat_history"),
-    ("human", "{input}"),
-    MessagesPlaceholder(variable_name="agent_scratchpad"),
-])
-
-# إنشاء الوكيل
-tools = [search_aau_website]
-agent = create_openai_functions_agent(llm, tools, prompt)
-
-# إنشاء الذاكرة
-memory = ConversationBufferMemory(
-    memory_key="chat_history",
-    return_messages=True
-)
-
-# إنشاء Agent Executor
-agent_executor = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    memory=memory,
-    verbose=True,
-    handle_parsing_errors=True
-)
-
-def chat(message: str) -> str:
+def create_agent_executor():
+    """بناء الوكيل: استيراد LangChain، إعداد النموذج والأداة (بدون ذاكرة، السجل يُمرَّر مع كل طلب)"""
+    from langchain.agents import AgentExecutor, create_openai_functions_agent
+    from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.tools import tool
+    from langchain_openai import ChatOpenAI
+
+    from completion_client import MAX_RETRIES, REQUEST_DEADLINE
+
+    # إعداد OpenAI API (متوفر في البيئة)
+    # LangChain يدير استدعاءاته بنفسه: نطبق نفس حدود الإعادة ومهلة الطلب على كل استدعاء
+    llm = ChatOpenAI(
+        model="gpt-4.1-mini",
+        temperature=0.7,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        timeout=REQUEST_DEADLINE,
+        max_retries=MAX_RETRIES
+    )
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_message),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+
+    # إنشاء الوكيل
+    tools = [tool(search_aau_website)]
+    agent = create_openai_functions_agent(llm, tools, prompt)
+
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        verbose=True,
+        handle_parsing_errors=True
+    )
+
+def get_agent_executor():
+    """الوكيل المشترك للعملية، يُبنى عند أول استدعاء"""
+    global _agent_executor
+    if _agent_executor is None:
+        with _agent_executor_lock:
+            if _agent_executor is None:
+                _agent_executor = create_agent_executor()
+    return _agent_executor
+
+def _history_window(messages):
+    """آخر MEMORY_WINDOW أدوار من الجلسة كرسائل LangChain"""
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    turns = [message for message in messages if message["role"] in ("user", "assistant")]
+    history = []
+    for message in turns[-MEMORY_WINDOW * 2:] if MEMORY_WINDOW > 0 else []:
+        if message["role"] == "user":
+            history.append(HumanMessage(content=message["content"]))
+        else:
+            history.append(AIMessage(content=message["content"]))
+    return history
+
+def chat(session_id: str, message: str) -> str:
     """
-    دالة للتفاعل مع الوكيل
+    دالة للتفاعل مع الوكيل، آمنة للاستدعاء من عدة threads
+
+    Args:
+        session_id: معرّف المستخدم أو الجلسة
+        message: رسالة المستخدم
     """
+    session_lock = _session_locks[hash(session_id) % SESSION_LOCK_STRIPES]
+    with session_lock:
+        chat_history = _history_window(conversations.get_or_create(session_id, system_message))
+
+    # استدعاء الوكيل خارج القفل، فالجلسات المشتركة في نفس القفل لا تنتظر بعضها
     try:
-        response = agent_executor.invoke({"input": message})
-        return response["output"]
+        response = get_agent_executor().invoke({
+            "input": message,
+            "chat_history": chat_history
+        })
+        answer = response["output"]
     except Exception as e:
         return f"عذراً، حدث خطأ: {str(e)}\n\nيمكنك التواصل مع الجامعة على: 0798877440"
 
+    with session_lock:
+        conversations.append(
+            session_id,
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": answer}
+        )
+    return answer
+
 if __name__ == "__main__":
     # اختبار الوكيل
     print("Tec AI Agent - جاهز للعمل!")
@@ -215,7 +182,7 @@ if __name__ == "__main__":
     
     for question in test_questions:
         print(f"\nسؤال: {question}")
-        answer = chat(question)
+        answer = chat("test", question)
         print(f"جواب: {answer}")
         print("-" * 50)
 
@@ -4,74 +4,43 @@ AI Agent CLI - مع دعم سياق المحادثة وتحليل الصور
 
 import sys
 import json
+import hashlib
 import os
-import base64
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
+from knowledge_store import get_store, with_knowledge_context, knowledge_only_answer, PREFETCH_RETRIEVAL
+from answer_cache import AnswerCache, conversation_turns
+from history_manager import HistoryManager
+from tool_executor import ToolExecutor
+from single_flight import SingleFlight
+from metrics import RequestTrace, record_retrieval
+from image_processing import ImageInput, get_description_cache
+from completion_client import CompletionClient, CompletionUnavailable, Deadline, REQUEST_DEADLINE
+from intent_classifier import IntentRouter
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# استدعاءات النموذج ضمن مهلة الطلب مع إعادة المحاولة
+completions = CompletionClient(client)
+# الوقت المحجوز من مهلة server.cjs لإرسال الرد
+RESPONSE_MARGIN = 1.0
 
-KNOWLEDGE_BASE = {
-    "admissions": {
-        "keywords": ["قبول", "تسجيل", "شروط", "معدلات", "تخصصات", "بكالوريوس", "ماجستير", "دكتوراه", "تقديم"],
-        "info": """للقبول والتسجيل في جامعة عمان العربية، يرجى زيارة الموقع الرسمي للجامعة أو التواصل مع دائرة القبول والتسجيل. تختلف شروط القبول والمعدلات المطلوبة حسب التخصص والدرجة العلمية (بكالوريوس، ماجستير، دكتوراه).
-        يمكنك العثور على التفاصيل الكاملة وشروط التقديم على الرابط التالي: https://www.aau.edu.jo/ar/admission-and-registration
-        أو الاتصال على 0798877440."""
-    },
-    "fees": {
-        "keywords": ["رسوم", "قسط", "تكلفة", "دفع", "مالي", "أقساط"],
-        "info": """تختلف الرسوم الدراسية في جامعة عمان العربية حسب التخصص والبرنامج. للحصول على معلومات دقيقة حول الرسوم الدراسية، يرجى زيارة صفحة الرسوم على الموقع الرسمي للجامعة أو التواصل مع الدائرة المالية.
-        رابط الرسوم الدراسية: https://www.aau.edu.jo/ar/fees
-        أو الاتصال على 0798877440."""
-    },
-    "faculties": {
-        "keywords": ["كليات", "تخصصات", "أقسام", "دراسة", "برامج"],
-        "info": """تضم جامعة عمان العربية العديد من الكليات والتخصصات المتميزة، منها:
-        - كلية العلوم وتكنولوجيا المعلومات
-        - كلية الهندسة
-        - كلية الأعمال
-        - كلية الحقوق
-        - كلية الآداب والعلوم
-        - كلية العمارة والتصميم
-        - كلية علوم الطيران
-        يمكنك استعراض جميع الكليات والتخصصات المتاحة على الموقع الرسمي للجامعة: https://www.aau.edu.jo/ar/faculties-and-departments"""
-    },
-    "library": {
-        "keywords": ["مكتبة", "كتب", "مراجع", "بحث", "دراسات"],
-        "info": """توفر مكتبة جامعة عمان العربية مصادر غنية للطلاب والباحثين، بما في ذلك الكتب والمجلات العلمية وقواعد البيانات الإلكترونية. يمكنك زيارة المكتبة خلال ساعات العمل أو الوصول إلى مصادرها الرقمية عبر موقع الجامعة.
-        للمزيد من المعلومات حول خدمات المكتبة: https://www.aau.edu.jo/ar/library"""
-    },
-    "scholarships": {
-        "keywords": ["منح", "خصومات", "مساعدات", "دعم مالي"],
-        "info": """تقدم جامعة عمان العربية مجموعة متنوعة من المنح الدراسية والخصومات للطلاب المتفوقين وذوي الاحتياجات الخاصة. تتوفر تفاصيل المنح وشروط التقديم عليها على الموقع الرسمي للجامعة.
-        صفحة المنح الدراسية: https://www.aau.edu.jo/ar/scholarships"""
-    },
-    "student_affairs": {
-        "keywords": ["شؤون طلاب", "خدمات طلابية", "أنشطة", "سكن", "مواصلات"],
-        "info": """تقدم دائرة شؤون الطلبة في جامعة عمان العربية مجموعة واسعة من الخدمات والأنشطة للطلاب، بما في ذلك الإرشاد الأكاديمي، الأنشطة اللامنهجية، خدمات السكن والمواصلات، والمساعدة في حل المشكلات الطلابية.
-        للتواصل مع شؤون الطلبة: https://www.aau.edu.jo/ar/student-affairs"""
-    },
-    "location": {
-        "keywords": ["موقع", "عنوان", "خريطة", "وصول", "كيف أصل"],
-        "info": """تقع جامعة عمان العربية في شارع الأردن، منطقة مبـيس، عمان، الأردن. يمكنك استخدام خرائط Google للوصول إلى الجامعة بسهولة.
-        رابط خرائط Google: https://maps.app.goo.gl/your-university-location"""
-    },
-    "contact": {
-        "keywords": ["رقم", "هاتف", "تواصل", "اتصال", "موبايل", "جوال", "ايميل", "بريد", "email", "phone"],
-        "info": """معلومات التواصل مع جامعة عمان العربية:
-📞 الهاتف: 0798877440
-🌐 الموقع: https://www.aau.edu.jo/ar
-📍 العنوان: شارع الأردن، مبيس - عمان، الأردن
-⏰ أوقات العمل: من الأحد إلى الخميس"""
-    },
-    "technest": {
-        "keywords": ["تكنست", "فريق", "team", "technest"],
-        "info": """فريق TechNest - فريق رائع من جامعة عمان العربية:
-🎮 متخصصون في تطوير الألعاب والتطبيقات
-💡 فريق مبدع وموهوب من طلاب وخريجي الجامعة
-🔗 الموقع: https://technestjo.dev
-📧 الانضمام: https://technestjo.dev/join-us"""
-    }
-}
+# قاعدة المعرفة الموحّدة (chatbot-knowledge.json) مع فهارسها وإعادة التحميل التلقائي
+KNOWLEDGE_STORE = get_store()
+
+# التحيات والأسئلة الشائعة الواضحة تُجاب من الردود المحفوظة دون استدعاء النموذج
+INTENT_ROUTER = IntentRouter(KNOWLEDGE_STORE)
+
+# ذاكرة مؤقتة للإجابات المتكررة (مفيدة في وضع العامل الدائم --serve)
+ANSWER_CACHE = AnswerCache()
+
+# الأسئلة المتطابقة المتزامنة (في وضع --serve) تنتظر نتيجة أول طلب بدل استدعاء OpenAI لكل منها
+SINGLE_FLIGHT = SingleFlight()
+
+# ضغط سجل المحادثة الطويل ضمن ميزانية من الـ tokens
+HISTORY = HistoryManager()
 
 tools = [
     {
@@ -94,28 +63,21 @@ tools = [
 ]
 
 def search_aau_knowledge(query):
-    """البحث في قاعدة المعرفة باستخدام طريقة بسيطة وفعالة"""
-    query_lower = query.lower()
-    
-    # البحث عن كلمات مفتاحية مطابقة
-    best_match = None
-    best_match_count = 0
-    
-    for category, data in KNOWLEDGE_BASE.items():
-        keywords = data.get("keywords", [])
-        match_count = sum(1 for keyword in keywords if keyword in query_lower)
-        
-        if match_count > best_match_count:
-            best_match_count = match_count
-            best_match = data.get("info", "")
+    """البحث في قاعدة المعرفة وإرجاع أفضل نتيجة"""
+    results = KNOWLEDGE_STORE.search(query, top_k=1)
+    record_retrieval("tool", bool(results))
     
     # إذا وجدنا تطابقاً، أعد المعلومات
-    if best_match_count > 0:
-        return best_match
+    if results:
+        return results[0][1]
     
     # إذا لم نجد تطابقاً، أعد رسالة افتراضية
     return f"لم أجد معلومات محددة عن '{query}'. يرجى الاتصال بالجامعة على الرقم 0798877440 للمساعدة."
 
+# تنفيذ الأدوات التي يطلبها النموذج (بالتوازي عند طلب أكثر من أداة)
+TOOL_EXECUTOR = ToolExecutor()
+TOOL_EXECUTOR.register("search_aau_knowledge", search_aau_knowledge)
+
 SYSTEM_MESSAGE = """أنت Tec 🤖، مساعد ذكي في جامعة عمان العربية.
 - اجب على الأسئلة بناءً على السياق السابق للمحادثة
 - إذا تم إرسال صورة، قم بتحليلها وأجب على السؤال بناءً على محتوى الصورة
@@ -124,102 +86,410 @@ SYSTEM_MESSAGE = """أنت Tec 🤖، مساعد ذكي في جامعة عمان
 - استخدم الإيموجي بشكل مناسب
 - حاول الإجابة على الأسئلة بشكل مباشر قدر الإمكان"""
 
-def analyze_image(image_data):
-    """تحليل الصورة باستخدام OpenAI Vision API"""
+IMAGE_DESCRIPTION_PROMPT = """صف محتوى هذه الصورة بدقة وبشكل كامل باللغة العربية.
+- انسخ أي نص مكتوب في الصورة كما هو (مثل الجداول والإعلانات ورسائل الخطأ)
+- اذكر نوع الصورة (لقطة شاشة، مستند، صورة فوتوغرافية...) والعناصر المهمة فيها"""
+
+def analyze_image(image_data, trace=None, deadline=None):
+    """
+    وصف الصورة باستخدام OpenAI Vision API بعد تصغيرها وضغطها؛
+    الوصف يُحفظ حسب بصمة محتوى الصورة فلا تُحلَّل نفس الصورة مرتين
+
+    Returns:
+        نص الوصف، أو None إذا لم تكن البيانات صورة صالحة
+    """
     try:
-        # إذا كانت الصورة بصيغة base64
-        if image_data.startswith('data:image'):
-            # استخراج البيانات من data URL
-            image_data = image_data.split(',')[1]
-        
-        return {
-            "type": "image_url",
-            "image_url": {
-                "url": f"data:image/jpeg;base64,{image_data}"
-            }
-        }
-    except Exception as e:
+        image = ImageInput(image_data)
+        cache = get_description_cache()
+        entry = cache.get(image.digest)
+        if entry is not None:
+            return entry["description"]
+        image_url = image.to_url()
+    except ValueError as e:
+        sys.stderr.write(f"Image rejected: {e}\n")
         return None
 
-def chat(message, conversation_history=None, image_data=None):
+    response = completions.create(
+        deadline,
+        model="gpt-4.1-mini",
+        messages=[{
+            "role": "user",
+            "content": [
+                {"type": "text", "text": IMAGE_DESCRIPTION_PROMPT},
+                {"type": "image_url", "image_url": {"url": image_url}}
+            ]
+        }]
+    )
+    if trace is not None:
+        trace.record_usage("image_description", response)
+    description = response.choices[0].message.content
+    if description:
+        cache.set(image.digest, {"description": description})
+    return description
+
+def chat(message, conversation_history=None, image_data=None, session_id=None, trace=None, deadline=None):
+    """
+    Args:
+        trace: RequestTrace لتسجيل زمن كل مرحلة وعدد الـ tokens (اختياري)
+        deadline: مهلة الطلب؛ عند اقترابها تُعاد إجابة من قاعدة المعرفة مباشرة
+    """
+    trace = trace or RequestTrace("cli")
+    deadline = deadline or Deadline()
     try:
-        messages = [{"role": "system", "content": SYSTEM_MESSAGE}]
-        
-        if conversation_history:
-            for hist_msg in conversation_history:
-                messages.append({
-                    "role": hist_msg.get("role", "user"),
-                    "content": hist_msg.get("content", "")
-                })
+        if not image_data:
+            # رسالة الترحيب من الواجهة وحدها لا تجعل السؤال متابعة لمحادثة
+            with trace.stage("intent"):
+                routed = INTENT_ROUTER.route(message, bool(conversation_turns(conversation_history)))
+            if routed:
+                intent, response = routed
+                trace.record_intent(intent)
+                return response
         
-        # إنشء محتوى الرسالة
-        user_content = [{"type": "text", "text": message}]
+        # الأسئلة المتكررة تُجاب من الذاكرة المؤقتة دون استدعاء OpenAI
+        cache_key = None
+        cached_answer = None
+        if not image_data:
+            cache_key = ANSWER_CACHE.make_key(message, KNOWLEDGE_STORE.version, conversation_history)
+            cached_answer = ANSWER_CACHE.get(cache_key)
+        trace.record_cache(cache_key, cached_answer)
+        if cached_answer is not None:
+            return cached_answer
         
-        # إضافة الصورة إذا كانت موجودة
-        if image_data:
-            image_content = analyze_image(image_data)
-            if image_content:
-                user_content.append(image_content)
-        
-        messages.append({
-            "role": "user",
-            "content": user_content if len(user_content) > 1 else message
-        })
+        def generate():
+            try:
+                answer = generate_answer(message, conversation_history, image_data, session_id, trace, deadline)
+            except CompletionUnavailable as e:
+                # الإجابة البديلة لا تُحفظ في الذاكرة المؤقتة
+                sys.stderr.write(f"Answering from the knowledge base only: {e}\n")
+                trace.record_degraded()
+                return knowledge_only_answer(KNOWLEDGE_STORE.search(message))
+            ANSWER_CACHE.set(cache_key, answer)
+            return answer
         
-        response = client.chat.completions.create(
+        answer, coalesced = SINGLE_FLIGHT.run(cache_key, generate, deadline)
+        trace.record_coalesced(coalesced)
+        return answer
+    
+    except Exception as e:
+        print(f"AI Agent chat function error: {str(e)}", file=sys.stderr)
+        return f"عذراً، حدث خطأ داخلي: {str(e)}"
+
+def history_key(session_id, conversation_history):
+    """
+    مفتاح ملخص السجل في HISTORY: sessionId، أو بصمة أول سؤال في المحادثة للعملاء الذين لا يرسلونه
+    (تطابق الملخص المحفوظ مع الرسائل المطوية يُتحقق منه في HistoryManager، فلا تختلط محادثتان بنفس البداية)
+    """
+    if session_id:
+        return session_id
+    turns = conversation_turns(conversation_history)
+    if not turns:
+        return None
+    first = json.dumps(turns[0].get("content", ""), ensure_ascii=False)
+    return "history:" + hashlib.sha1(first.encode("utf-8")).hexdigest()
+
+def generate_answer(message, conversation_history, image_data, session_id, trace, deadline):
+    """استدعاءات OpenAI لسؤال غير موجود في الذاكرة المؤقتة"""
+    messages = [{"role": "system", "content": SYSTEM_MESSAGE}]
+    
+    if conversation_history:
+        for hist_msg in conversation_history:
+            messages.append({
+                "role": hist_msg.get("role", "user"),
+                "content": hist_msg.get("content", "")
+            })
+    
+    # الصورة تُرسل كوصف نصي، فلا تتكرر بياناتها في الطلبات اللاحقة
+    content = message
+    if image_data:
+        with trace.stage("image_description"):
+            description = analyze_image(image_data, trace, deadline)
+        if description:
+            content = f"{message}\n\n[وصف الصورة المرفقة]\n{description}"
+    
+    messages.append({"role": "user", "content": content})
+    
+    # الأدوار القديمة تُطوى في ملخص محفوظ للجلسة بدل إعادة إرسالها كاملة
+    with trace.stage("history"):
+        messages = HISTORY.compact(history_key(session_id, conversation_history), messages)
+    
+    # وضع "استرجاع ثم توليد": نجلب المعلومات محلياً ونرسلها مع السؤال في طلب واحد
+    prefetched = []
+    if PREFETCH_RETRIEVAL:
+        with trace.stage("retrieval"):
+            prefetched = KNOWLEDGE_STORE.search(message)
+        record_retrieval("prefetch", bool(prefetched))
+    if prefetched:
+        with trace.stage("first_completion"):
+            response = completions.create(
+                deadline,
+                model="gpt-4.1-mini",
+                messages=with_knowledge_context(messages, prefetched)
+            )
+        trace.record_usage("first_completion", response)
+        return response.choices[0].message.content
+    
+    # لا توجد نتائج محلية: نترك للنموذج استدعاء أداة البحث
+    with trace.stage("first_completion"):
+        response = completions.create(
+            deadline,
             model="gpt-4.1-mini",
             messages=messages,
             tools=tools,
             tool_choice="auto"
         )
+    trace.record_usage("first_completion", response)
+    
+    response_message = response.choices[0].message
+    tool_calls = response_message.tool_calls
+    
+    if tool_calls:
+        messages.append(response_message)
         
-        response_message = response.choices[0].message
-        tool_calls = response_message.tool_calls
+        with trace.stage("tool_execution"):
+            messages.extend(TOOL_EXECUTOR.execute(tool_calls))
         
-        if tool_calls:
-            messages.append(response_message)
-            
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-                
-                if function_name == "search_aau_knowledge":
-                    function_response = search_aau_knowledge(function_args.get("query"))
-                    messages.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": function_response
-                    })
-            
-            second_response = client.chat.completions.create(
+        with trace.stage("second_completion"):
+            second_response = completions.create(
+                deadline,
                 model="gpt-4.1-mini",
                 messages=messages
             )
-            return second_response.choices[0].message.content
-        else:
-            return response_message.content
+        trace.record_usage("second_completion", second_response)
+        answer = second_response.choices[0].message.content
+    else:
+        answer = response_message.content
     
-    except Exception as e:
-        print(f"AI Agent chat function error: {str(e)}", file=sys.stderr)
-        return f"عذراً، حدث خطأ داخلي: {str(e)}"
+    return answer
 
-if __name__ == "__main__":
+def request_deadline(input_data):
+    """مهلة الطلب: OPENAI_REQUEST_DEADLINE، أو أقل منها إذا أرسل server.cjs مهلته (timeoutMs)"""
+    seconds = REQUEST_DEADLINE
+    timeout_ms = input_data.get("timeoutMs")
+    if isinstance(timeout_ms, (int, float)) and timeout_ms > 0:
+        seconds = min(seconds, timeout_ms / 1000 - RESPONSE_MARGIN)
+    return Deadline(seconds)
+
+def handle_request(input_data, trace=None, deadline=None):
+    """معالجة طلب واحد وإرجاع كائن الاستجابة"""
+    message = input_data.get("message")
+    if not message:
+        return {"error": "No message provided"}
+
+    conversation_history = input_data.get("conversationHistory")
+    image_data = input_data.get("imageUrl")
+    session_id = input_data.get("sessionId")
+    deadline = deadline or request_deadline(input_data)
+    return {"response": chat(message, conversation_history, image_data, session_id, trace, deadline)}
+
+def encode_response(payload, trace):
+    """
+    سطر JSON للاستجابة مع كتلة "stats" في آخره (زمن كل مرحلة بالمللي ثانية، الـ tokens، نتيجة الذاكرة المؤقتة)؛
+    تُضاف الكتلة بعد التسلسل حتى يشمل زمن "serialization" تسلسل الإجابة نفسها
+    """
+    with trace.stage("serialization"):
+        line = json.dumps(payload, ensure_ascii=False)
+    stats = json.dumps(trace.finish(), ensure_ascii=False)
+    return f'{line[:-1]}, "stats": {stats}}}'
+
+def serve(max_workers):
+    """
+    وضع العامل الدائم: يقرأ طلبات JSON من stdin (طلب في كل سطر)
+    ويكتب الاستجابات على stdout مع نفس الـ id، مع معالجة عدة طلبات بالتوازي
+    """
+    sys.stdin.reconfigure(encoding="utf-8")
+    sys.stdout.reconfigure(encoding="utf-8")
+    write_lock = threading.Lock()
+
+    def write_line(line):
+        with write_lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    def write_response(payload):
+        write_line(json.dumps(payload, ensure_ascii=False))
+
+    def run(request_id, input_data, deadline):
+        trace = RequestTrace("cli_serve")
+        try:
+            result = handle_request(input_data, trace, deadline)
+        except Exception as e:
+            sys.stderr.write(f"Worker error for request {request_id}: {e}\n")
+            result = {"error": f"An unexpected error occurred: {str(e)}"}
+        result["id"] = request_id
+        write_line(encode_response(result, trace))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for raw_line in sys.stdin:
+            raw_line = raw_line.strip()
+            if not raw_line:
+                continue
+            try:
+                input_data = json.loads(raw_line)
+            except json.JSONDecodeError as e:
+                sys.stderr.write(f"JSON Decode Error: {e}\nInput was: {raw_line}\n")
+                write_response({"id": None, "error": "Invalid JSON input"})
+                continue
+            if not isinstance(input_data, dict):
+                write_response({"id": None, "error": "Invalid JSON input"})
+                continue
+            # المهلة تبدأ عند استلام الطلب، فيُحسب منها وقت الانتظار في الطابور
+            executor.submit(run, input_data.get("id"), input_data, request_deadline(input_data))
+
+def _batch_key(request_id, line_number):
+    """مفتاح الطلب في وضع الدفعات: id إن وُجد، وإلا رقم السطر في ملف الإدخال"""
+    return f"id:{request_id}" if request_id is not None else f"line:{line_number}"
+
+def _load_completed(output_path):
+    """
+    مفاتيح الطلبات المُجابة في ملف إخراج سابق؛ يُعاد كتابة الملف بها فقط
+    (تُحذف الأخطاء والإجابات من قاعدة المعرفة دون النموذج والسطر الأخير المقطوع، فتُعاد)
+    """
+    if not os.path.exists(output_path):
+        return set()
+    keys = set()
+    kept = []
+    with open(output_path, "r", encoding="utf-8") as f:
+        for raw_line in f:
+            try:
+                record = json.loads(raw_line)
+            except json.JSONDecodeError:
+                continue
+            if "response" not in record or record.get("stats", {}).get("degraded"):
+                continue
+            keys.add(_batch_key(record.get("id"), record.get("line")))
+            kept.append(raw_line if raw_line.endswith("\n") else raw_line + "\n")
+    temporary_path = output_path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        f.writelines(kept)
+    os.replace(temporary_path, output_path)
+    return keys
+
+def batch(input_path, output_path, max_workers, ordered=True, resume=False):
+    """
+    وضع الدفعات: طلبات JSONL من ملف (أو stdin مع "-") تُنفذ بعدد محدد من الطلبات المتزامنة،
+    والنتائج JSONL مع id ورقم السطر، بترتيب الإدخال أو حسب الانتهاء (ordered=False).
+    كل سطر يُكتب فور جاهزيته، ومع resume تُتخطى الطلبات المُجابة في ملف الإخراج من تشغيل سابق
+    """
+    completed = _load_completed(output_path) if resume else set()
+    source = sys.stdin if input_path == "-" else open(input_path, "r", encoding="utf-8")
+    if source is sys.stdin:
+        sys.stdin.reconfigure(encoding="utf-8")
+    if output_path == "-":
+        sys.stdout.reconfigure(encoding="utf-8")
+        output = sys.stdout
+    else:
+        output = open(output_path, "a" if resume else "w", encoding="utf-8")
+
+    write_lock = threading.Lock()
+    # حد للطلبات المقروءة غير المكتوبة، حتى لا يُقرأ ملف الإدخال كله في الذاكرة
+    slots = threading.BoundedSemaphore(max_workers * 4)
+    pending = {}
+    next_sequence = 0
+    counts = {"answered": 0, "errors": 0, "skipped": 0}
+
+    def write_line(line):
+        output.write(line + "\n")
+        output.flush()
+        slots.release()
+
+    def emit(sequence, line, failed):
+        nonlocal next_sequence
+        with write_lock:
+            counts["errors" if failed else "answered"] += 1
+            if not ordered:
+                write_line(line)
+                return
+            pending[sequence] = line
+            while next_sequence in pending:
+                write_line(pending.pop(next_sequence))
+                next_sequence += 1
+
+    def run(sequence, line_number, input_data):
+        trace = RequestTrace("cli_batch")
+        try:
+            # المهلة تبدأ عند بدء التنفيذ لا عند القراءة، فالانتظار في الطابور لا يُحسب منها
+            result = handle_request(input_data, trace)
+        except Exception as e:
+            sys.stderr.write(f"Batch error on line {line_number}: {e}\n")
+            result = {"error": f"An unexpected error occurred: {str(e)}"}
+        result = {"id": input_data.get("id"), "line": line_number, **result}
+        emit(sequence, encode_response(result, trace), "error" in result)
+
+    started = time.perf_counter()
+    sequence = 0
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for line_number, raw_line in enumerate(source, 1):
+            raw_line = raw_line.strip()
+            if not raw_line:
+                continue
+            try:
+                input_data = json.loads(raw_line)
+            except json.JSONDecodeError:
+                input_data = None
+            if not isinstance(input_data, dict):
+                sys.stderr.write(f"Invalid JSON on line {line_number}\n")
+                slots.acquire()
+                emit(sequence, json.dumps({"id": None, "line": line_number, "error": "Invalid JSON input"}), True)
+                sequence += 1
+                continue
+            if _batch_key(input_data.get("id"), line_number) in completed:
+                counts["skipped"] += 1
+                continue
+            # سجلات المحادثات المصدّرة (ChatbotConversation) تحفظ السؤال في userMessage
+            if not input_data.get("message") and input_data.get("userMessage"):
+                input_data["message"] = input_data["userMessage"]
+            slots.acquire()
+            executor.submit(run, sequence, line_number, input_data)
+            sequence += 1
+        executor.shutdown(wait=True)
+    except KeyboardInterrupt:
+        executor.shutdown(wait=True, cancel_futures=True)
+        sys.stderr.write("Batch interrupted; rerun with --resume to continue\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    sys.stderr.write(
+        f"Batch: {counts['answered']} answered, {counts['errors']} errors, "
+        f"{counts['skipped']} skipped in {time.perf_counter() - started:.1f}s\n"
+    )
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tec AI Agent CLI")
+    parser.add_argument("--serve", action="store_true",
+                        help="تشغيل عامل دائم يقرأ طلبات JSON سطراً بسطر من stdin")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("AI_AGENT_WORKER_THREADS", 8)),
+                        help="عدد الطلبات المتزامنة في وضع العامل الدائم ووضع الدفعات")
+    parser.add_argument("--batch", metavar="INPUT",
+                        help="تنفيذ طلبات JSONL من ملف (أو - لـ stdin) وكتابة النتائج JSONL")
+    parser.add_argument("--output", default="-",
+                        help="ملف نتائج وضع الدفعات (الافتراضي stdout)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="كتابة النتائج حسب الانتهاء بدل ترتيب الإدخال")
+    parser.add_argument("--resume", action="store_true",
+                        help="تخطي الطلبات المُجابة في ملف --output من تشغيل سابق وإكمال الملف")
+    args = parser.parse_args()
+    if args.resume and (not args.batch or args.output == "-"):
+        parser.error("--resume requires --batch and an --output file")
+    return args
+
+def main_once():
     try:
         input_data_raw = sys.stdin.read()
         sys.stderr.write(f"Received input: {input_data_raw}\n") # Log received input
         input_data = json.loads(input_data_raw)
         message = input_data.get("message")
-        conversation_history = input_data.get("conversationHistory")
-        image_data = input_data.get("imageUrl")
 
         if not message:
             print(json.dumps({"error": "No message provided"}))
             sys.exit(1)
         
-        response = chat(message, conversation_history, image_data)
+        trace = RequestTrace("cli")
+        response = handle_request(input_data, trace)["response"]
         sys.stderr.write(f"AI Agent response: {response}\n") # Log AI Agent response
-        print(json.dumps({"response": response}, ensure_ascii=False))
+        print(encode_response({"response": response}, trace))
     except json.JSONDecodeError as e:
         sys.stderr.write(f"JSON Decode Error: {e}\nInput was: {input_data_raw}\n") # Log JSON error
         print(json.dumps({"error": "Invalid JSON input"}))
@@ -229,3 +499,11 @@ if __name__ == "__main__":
         print(json.dumps({"error": f"An unexpected error occurred: {str(e)}"}))
         sys.exit(1)
 
+if __name__ == "__main__":
+    args = parse_args()
+    if args.serve:
+        serve(max(1, args.workers))
+    elif args.batch:
+        batch(args.batch, args.output, max(1, args.workers), ordered=not args.unordered, resume=args.resume)
+    else:
+        main_once()
@@ -4,99 +4,28 @@ AI Agent بسيط وفعال للبحث في موقع جامعة عمان الع
 """
 
 import os
-import json
 from openai import OpenAI
+from knowledge_store import get_store, with_knowledge_context, knowledge_only_answer, PREFETCH_RETRIEVAL
+from session_store import SessionStore, compact_message
+from history_manager import HistoryManager
+from tool_executor import ToolExecutor
+from completion_client import CompletionClient, CompletionUnavailable, Deadline
+from intent_classifier import IntentRouter
 
 # إعداد OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# استدعاءات النموذج ضمن مهلة الطلب مع إعادة المحاولة
+completions = CompletionClient(client)
 
-# قاعدة المعرفة الشاملة
-KNOWLEDGE_BASE = {
-    "contact": {
-        "keywords": ["رقم", "هاتف", "تواصل", "اتصال", "موبايل", "جوال", "ايميل", "بريد", "email", "phone"],
-        "info": """معلومات التواصل مع جامعة عمان العربية:
-📞 الهاتف: 0798877440
-🌐 الموقع الإلكتروني: https://www.aau.edu.jo/ar
-📍 العنوان: شارع الأردن، مبيس - عمان، الأردن
-⏰ أوقات العمل: من الأحد إلى الخميس
-📱 وسائل التواصل الاجتماعي: Facebook, LinkedIn, Twitter, YouTube"""
-    },
-    "rankings": {
-        "keywords": ["تصنيف", "ترتيب", "مرتبة", "إنجازات", "تميز", "ranking", "achievement"],
-        "info": """إنجازات وتصنيفات جامعة عمان العربية:
-🏆 دخول تصنيف QS العالمي 2026 للمرة الأولى
-🥇 المرتبة 110 عربياً في تصنيف QS Arab Region 2025
-🥇 المرتبة السادسة في تصنيف التايمز للجامعات العربية
-🥇 المرتبة الرابعة أردنياً في تصنيف التايمز للتأثير 2025
-🥇 المرتبة الأولى على الجامعات الخاصة في تصنيف ويبوميتركس 2025
-🥇 المرتبة الأولى على الجامعات الخاصة والثانية أردنياً في تصنيف سيماجو 2025
-🥇 المرتبة السادسة محلياً وضمن أول 388 جامعة عالمياً في تصنيف Green Metric 2024"""
-    },
-    "accreditations": {
-        "keywords": ["اعتماد", "شهادة", "جودة", "معتمد", "accreditation", "quality"],
-        "info": """الاعتمادات الدولية لجامعة عمان العربية:
-✅ EUR-ACE: اعتماد دولي لهندسة البرمجيات (4 سنوات)
-✅ AABI: الأولى عربياً والسادس عالمياً في اعتماد الطيران الدولي
-✅ AACSB: اعتماد أمريكي لكلية الأعمال (مجدد)
-✅ ACPE: اعتماد أمريكي لكلية الصيدلة
-✅ IAA: موافقة أولية لاعتماد كلية الشريعة
-✅ EASA: اعتماد وكالة سلامة الطيران الأوروبية
-✅ ISO: شهادة الأيزو (2020-2027)"""
-    },
-    "majors": {
-        "keywords": ["تخصص", "كلية", "برنامج", "دراسة", "بكالوريوس", "ماجستير", "major", "faculty"],
-        "info": """الكليات والتخصصات في جامعة عمان العربية:
-🎓 كلية الهندسة: هندسة البرمجيات (معتمدة EUR-ACE)، هندسة الطيران (معتمدة AABI و EASA)
-💼 كلية الأعمال: معتمدة أمريكياً AACSB - إدارة، محاسبة، تسويق، مالية
-💊 كلية الصيدلة: معتمدة أمريكياً ACPE
-📖 كلية الشريعة: اعتماد دولي IAA
-⚖️ كلية الحقوق
-👨‍🏫 كلية العلوم التربوية والنفسية
-💻 كلية تكنولوجيا المعلومات
-📚 كلية الآداب والعلوم
-✈️ كلية علوم الطيران
-🏥 كلية العلوم الطبية التطبيقية
-🔧 الكلية التقنية"""
-    },
-    "admission": {
-        "keywords": ["قبول", "تسجيل", "التحاق", "طالب", "شروط", "admission", "registration"],
-        "info": """القبول والتسجيل في جامعة عمان العربية:
-📅 فتح باب القبول والتسجيل للفصل الدراسي 2026-2025
-📞 للاستفسار والتسجيل: 0798877440
-🌐 الموقع الإلكتروني: https://www.aau.edu.jo/ar
-👥 متاح للطلاب الأردنيين وغير الأردنيين
-📋 يمكن التواصل مع قسم القبول والتسجيل للحصول على معلومات تفصيلية عن الشروط والأوراق المطلوبة"""
-    },
-    "discounts": {
-        "keywords": ["خصم", "منحة", "ثانوية", "معدل", "ضمان", "متقاعد", "discount", "scholarship"],
-        "info": """الخصومات المتاحة في جامعة عمان العربية:
-💰 خصومات حقيقية إضافية لكامل فترة الدراسة
-🎓 خصم معدل الثانوية العامة: يصل إلى 90% حسب المعدل
-👴 خصم متقاعدي الضمان الاجتماعي
-💳 نوافذ الحلول المالية للطلاب
-📞 للاستفسار: 0798877440"""
-    },
-    "fees": {
-        "keywords": ["رسوم", "اقساط", "دفع", "تكلفة", "سعر", "ساعة", "fees", "tuition"],
-        "info": """رسوم الدراسة في جامعة عمان العربية:
-💵 جدول رسوم الساعات الدراسية مفصل متوفر على الموقع
-💳 نوافذ الحلول المالية للطلاب
-🎁 خصومات تصل إلى 90% حسب معدل الثانوية
-📞 للاستفسار عن الرسوم: 0798877440
-🌐 الموقع: https://www.aau.edu.jo/ar"""
-    }
-}
+# قاعدة المعرفة الموحّدة (chatbot-knowledge.json) مع فهارسها وإعادة التحميل التلقائي
+KNOWLEDGE_STORE = get_store()
+
+# التحيات والأسئلة الشائعة الواضحة تُجاب من الردود المحفوظة دون استدعاء النموذج
+INTENT_ROUTER = IntentRouter(KNOWLEDGE_STORE)
 
 def search_aau_knowledge(query):
     """البحث في قاعدة المعرفة"""
-    query_lower = query.lower()
-    results = []
-    
-    for category, data in KNOWLEDGE_BASE.items():
-        for keyword in data["keywords"]:
-            if keyword in query_lower:
-                results.append(data["info"])
-                break
+    results = [info for _, info in KNOWLEDGE_STORE.search(query)]
     
     if results:
         return "\n\n".join(results)
@@ -127,6 +56,10 @@ tools = [
     }
 ]
 
+# تنفيذ الأدوات التي يطلبها النموذج (بالتوازي عند طلب أكثر من أداة)
+TOOL_EXECUTOR = ToolExecutor()
+TOOL_EXECUTOR.register("search_aau_knowledge", search_aau_knowledge)
+
 # System message
 SYSTEM_MESSAGE = """أنت Tec 🤖، مساعد ذكي متخصص في جامعة عمان العربية.
 
@@ -142,25 +75,48 @@ SYSTEM_MESSAGE = """أنت Tec 🤖، مساعد ذكي متخصص في جامع
 - استخدم الإيموجي بشكل مناسب
 - قدم معلومات منظمة وسهلة القراءة"""
 
-# تخزين المحادثات
-conversations = {}
+# تخزين المحادثات (محدود العدد والذاكرة مع حذف الجلسات الخاملة)
+conversations = SessionStore()
+
+# ضغط سجل المحادثة الطويل ضمن ميزانية من الـ tokens
+HISTORY = HistoryManager()
 
 def chat(user_id, message):
     """التفاعل مع المستخدم"""
+    deadline = Deadline()
     try:
         # إنشاء محادثة جديدة إذا لم تكن موجودة
-        if user_id not in conversations:
-            conversations[user_id] = [
-                {"role": "system", "content": SYSTEM_MESSAGE}
-            ]
+        messages = conversations.get_or_create(user_id, SYSTEM_MESSAGE)
+        routed = INTENT_ROUTER.route(message, len(messages) > 1)
         
         # إضافة رسالة المستخدم
-        conversations[user_id].append({"role": "user", "content": message})
+        conversations.append(user_id, {"role": "user", "content": message})
+        
+        if routed:
+            final_message = routed[1]
+            conversations.append(user_id, {"role": "assistant", "content": final_message})
+            return final_message
+        
+        # الأدوار القديمة تُطوى في ملخص محفوظ للجلسة بدل إعادة إرسالها كاملة
+        request_messages = HISTORY.compact(user_id, messages)
+        
+        # وضع "استرجاع ثم توليد": نجلب المعلومات محلياً ونرسلها مع السؤال في طلب واحد
+        prefetched = KNOWLEDGE_STORE.search(message) if PREFETCH_RETRIEVAL else []
+        if prefetched:
+            response = completions.create(
+                deadline,
+                model="gpt-4.1-mini",
+                messages=with_knowledge_context(request_messages, prefetched)
+            )
+            final_message = response.choices[0].message.content
+            conversations.append(user_id, {"role": "assistant", "content": final_message})
+            return final_message
         
-        # استدعاء OpenAI
-        response = client.chat.completions.create(
+        # لا توجد نتائج محلية: نترك للنموذج استدعاء أداة البحث
+        response = completions.create(
+            deadline,
             model="gpt-4.1-mini",
-            messages=conversations[user_id],
+            messages=request_messages,
             tools=tools,
             tool_choice="auto"
         )
@@ -170,38 +126,35 @@ def chat(user_id, message):
         
         # إذا طلب الوكيل استخدام أداة
         if tool_calls:
-            conversations[user_id].append(response_message)
+            tool_messages = [compact_message(response_message)]
             
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-                
-                if function_name == "search_aau_knowledge":
-                    function_response = search_aau_knowledge(function_args.get("query"))
-                    
-                    conversations[user_id].append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": function_response
-                    })
+            tool_messages.extend(TOOL_EXECUTOR.execute(tool_calls))
+            
+            conversations.append(user_id, *tool_messages)
             
             # استدعاء ثاني للحصول على الإجابة النهائية
-            second_response = client.chat.completions.create(
+            second_response = completions.create(
+                deadline,
                 model="gpt-4.1-mini",
-                messages=conversations[user_id]
+                messages=request_messages + tool_messages
             )
             
             final_message = second_response.choices[0].message.content
-            conversations[user_id].append({"role": "assistant", "content": final_message})
+            conversations.append(user_id, {"role": "assistant", "content": final_message})
             return final_message
         
         else:
             # إجابة مباشرة بدون استخدام أدوات
             final_message = response_message.content
-            conversations[user_id].append({"role": "assistant", "content": final_message})
+            conversations.append(user_id, {"role": "assistant", "content": final_message})
             return final_message
     
+    except CompletionUnavailable:
+        # انتهت المهلة أو تعذر الوصول للنموذج: إجابة من قاعدة المعرفة مباشرة
+        final_message = knowledge_only_answer(KNOWLEDGE_STORE.search(message))
+        conversations.append(user_id, {"role": "assistant", "content": final_message})
+        return final_message
+    
     except Exception as e:
         return f"عذراً، حدث خطأ: {str(e)}\n\nيمكنك التواصل مع الجامعة على: 0798877440"
 
@@ -3,11 +3,27 @@ Flask API للـ AI Agent
 يوفر endpoint للتفاعل مع الشات بوت الذكي
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import os
+import sys
 import json
 from openai import OpenAI
+from knowledge_store import with_knowledge_context, knowledge_only_answer, PREFETCH_RETRIEVAL
+from session_store import compact_message
+from metrics import REGISTRY, CONTENT_TYPE, RequestTrace, record_retrieval
+from completion_client import CompletionClient, CompletionUnavailable, Deadline
+from chatbot_state import (
+    ANSWER_CACHE,
+    HISTORY,
+    INTENT_ROUTER,
+    KNOWLEDGE_STORE,
+    SINGLE_FLIGHT,
+    SYSTEM_MESSAGE,
+    TOOL_EXECUTOR,
+    conversations,
+    tools,
+)
 import uuid
 
 app = Flask(__name__)
@@ -15,144 +31,14 @@ CORS(app)
 
 # إعداد OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# قاعدة المعرفة
-KNOWLEDGE_BASE = {
-    "contact": {
-        "keywords": ["رقم", "هاتف", "تواصل", "اتصال", "موبايل", "جوال", "ايميل", "بريد", "email", "phone"],
-        "info": """معلومات التواصل مع جامعة عمان العربية:
-📞 الهاتف: 0798877440
-🌐 الموقع الإلكتروني: https://www.aau.edu.jo/ar
-📍 العنوان: شارع الأردن، مبيس - عمان، الأردن
-⏰ أوقات العمل: من الأحد إلى الخميس
-📱 وسائل التواصل الاجتماعي: Facebook, LinkedIn, Twitter, YouTube"""
-    },
-    "rankings": {
-        "keywords": ["تصنيف", "ترتيب", "مرتبة", "إنجازات", "تميز", "ranking", "achievement"],
-        "info": """إنجازات وتصنيفات جامعة عمان العربية:
-🏆 دخول تصنيف QS العالمي 2026 للمرة الأولى
-🥇 المرتبة 110 عربياً في تصنيف QS Arab Region 2025
-🥇 المرتبة السادسة في تصنيف التايمز للجامعات العربية
-🥇 المرتبة الرابعة أردنياً في تصنيف التايمز للتأثير 2025
-🥇 المرتبة الأولى على الجامعات الخاصة في تصنيف ويبوميتركس 2025
-🥇 المرتبة الأولى على الجامعات الخاصة والثانية أردنياً في تصنيف سيماجو 2025
-🥇 المرتبة السادسة محلياً وضمن أول 388 جامعة عالمياً في تصنيف Green Metric 2024"""
-    },
-    "accreditations": {
-        "keywords": ["اعتماد", "شهادة", "جودة", "معتمد", "accreditation", "quality"],
-        "info": """الاعتمادات الدولية لجامعة عمان العربية:
-✅ EUR-ACE: اعتماد دولي لهندسة البرمجيات (4 سنوات)
-✅ AABI: الأولى عربياً والسادس عالمياً في اعتماد الطيران الدولي
-✅ AACSB: اعتماد أمريكي لكلية الأعمال (مجدد)
-✅ ACPE: اعتماد أمريكي لكلية الصيدلة
-✅ IAA: موافقة أولية لاعتماد كلية الشريعة
-✅ EASA: اعتماد وكالة سلامة الطيران الأوروبية
-✅ ISO: شهادة الأيزو (2020-2027)"""
-    },
-    "majors": {
-        "keywords": ["تخصص", "كلية", "برنامج", "دراسة", "بكالوريوس", "ماجستير", "major", "faculty", "هندسة", "أعمال", "صيدلة"],
-        "info": """الكليات والتخصصات في جامعة عمان العربية:
-🎓 كلية الهندسة: هندسة البرمجيات (معتمدة EUR-ACE)، هندسة الطيران (معتمدة AABI و EASA)
-💼 كلية الأعمال: معتمدة أمريكياً AACSB - إدارة، محاسبة، تسويق، مالية
-💊 كلية الصيدلة: معتمدة أمريكياً ACPE
-📖 كلية الشريعة: اعتماد دولي IAA
-⚖️ كلية الحقوق
-👨‍🏫 كلية العلوم التربوية والنفسية
-💻 كلية تكنولوجيا المعلومات
-📚 كلية الآداب والعلوم
-✈️ كلية علوم الطيران
-🏥 كلية العلوم الطبية التطبيقية
-🔧 الكلية التقنية"""
-    },
-    "admission": {
-        "keywords": ["قبول", "تسجيل", "التحاق", "طالب", "شروط", "admission", "registration"],
-        "info": """القبول والتسجيل في جامعة عمان العربية:
-📅 فتح باب القبول والتسجيل للفصل الدراسي 2026-2025
-📞 للاستفسار والتسجيل: 0798877440
-🌐 الموقع الإلكتروني: https://www.aau.edu.jo/ar
-👥 متاح للطلاب الأردنيين وغير الأردنيين
-📋 يمكن التواصل مع قسم القبول والتسجيل للحصول على معلومات تفصيلية عن الشروط والأوراق المطلوبة"""
-    },
-    "discounts": {
-        "keywords": ["خصم", "منحة", "ثانوية", "معدل", "ضمان", "متقاعد", "discount", "scholarship"],
-        "info": """الخصومات المتاحة في جامعة عمان العربية:
-💰 خصومات حقيقية إضافية لكامل فترة الدراسة
-🎓 خصم معدل الثانوية العامة: يصل إلى 90% حسب المعدل
-👴 خصم متقاعدي الضمان الاجتماعي
-💳 نوافذ الحلول المالية للطلاب
-📞 للاستفسار: 0798877440"""
-    },
-    "fees": {
-        "keywords": ["رسوم", "اقساط", "دفع", "تكلفة", "سعر", "ساعة", "fees", "tuition"],
-        "info": """رسوم الدراسة في جامعة عمان العربية:
-💵 جدول رسوم الساعات الدراسية مفصل متوفر على الموقع
-💳 نوافذ الحلول المالية للطلاب
-🎁 خصومات تصل إلى 90% حسب معدل الثانوية
-📞 للاستفسار عن الرسوم: 0798877440
-🌐 الموقع: https://www.aau.edu.jo/ar"""
-    }
-}
-
-def search_aau_knowledge(query):
-    """البحث في قاعدة المعرفة"""
-    query_lower = query.lower()
-    results = []
-    
-    for category, data in KNOWLEDGE_BASE.items():
-        for keyword in data["keywords"]:
-            if keyword in query_lower:
-                results.append(data["info"])
-                break
-    
-    if results:
-        return "\n\n".join(results)
-    
-    return """لم أجد معلومات محددة عن سؤالك في قاعدة البيانات الحالية.
-يمكنك التواصل مباشرة مع جامعة عمان العربية:
-📞 الهاتف: 0798877440
-🌐 الموقع: https://www.aau.edu.jo/ar"""
-
-# تعريف الأداة
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "search_aau_knowledge",
-            "description": "البحث في قاعدة معرفة جامعة عمان العربية",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "سؤال المستخدم"
-                    }
-                },
-                "required": ["query"]
-            }
-        }
-    }
-]
-
-SYSTEM_MESSAGE = """أنت Tec 🤖، مساعد ذكي متخصص في جامعة عمان العربية.
-
-مهمتك:
-1. فهم أسئلة المستخدمين بدقة
-2. استخدام أداة البحث للحصول على معلومات دقيقة
-3. تقديم إجابات واضحة ومفيدة باللغة العربية
-4. إذا لم تجد المعلومة، وجه المستخدم للاتصال بالجامعة
-
-أسلوبك:
-- ودود ومحترف
-- واضح ومباشر
-- استخدم الإيموجي بشكل مناسب
-- قدم معلومات منظمة وسهلة القراءة"""
-
-# تخزين المحادثات
-conversations = {}
+# استدعاءات النموذج ضمن مهلة الطلب مع إعادة المحاولة
+completions = CompletionClient(client)
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """API endpoint للتفاعل مع الشات بوت"""
+    trace = RequestTrace("chat")
+    deadline = Deadline()
     try:
         data = request.json
         message = data.get('message', '')
@@ -162,62 +48,42 @@ def chat():
             return jsonify({'error': 'Message is required'}), 400
         
         # إنشاء محادثة جديدة إذا لم تكن موجودة
-        if session_id not in conversations:
-            conversations[session_id] = [
-                {"role": "system", "content": SYSTEM_MESSAGE}
-            ]
-        
-        # إضافة رسالة المستخدم
-        conversations[session_id].append({"role": "user", "content": message})
+        messages = conversations.get_or_create(session_id, SYSTEM_MESSAGE)
         
-        # استدعاء OpenAI
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=conversations[session_id],
-            tools=tools,
-            tool_choice="auto"
-        )
+        with trace.stage("intent"):
+            routed = INTENT_ROUTER.route(message, len(messages) > 1)
         
-        response_message = response.choices[0].message
-        tool_calls = response_message.tool_calls
+        # الأسئلة المتكررة تُجاب من الذاكرة المؤقتة دون استدعاء OpenAI
+        cache_key = None
+        cached_answer = None
+        if not routed:
+            cache_key = ANSWER_CACHE.make_key(message, KNOWLEDGE_STORE.version, messages)
+            cached_answer = ANSWER_CACHE.get(cache_key)
+            trace.record_cache(cache_key, cached_answer)
         
-        # إذا طلب الوكيل استخدام أداة
-        if tool_calls:
-            conversations[session_id].append(response_message)
-            
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-                
-                if function_name == "search_aau_knowledge":
-                    function_response = search_aau_knowledge(function_args.get("query"))
-                    
-                    conversations[session_id].append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": function_response
-                    })
-            
-            # استدعاء ثاني للحصول على الإجابة النهائية
-            second_response = client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=conversations[session_id]
-            )
-            
-            final_message = second_response.choices[0].message.content
-            conversations[session_id].append({"role": "assistant", "content": final_message})
-            
-            return jsonify({
-                'response': final_message,
-                'session_id': session_id
-            })
+        # إضافة رسالة المستخدم
+        conversations.append(session_id, {"role": "user", "content": message})
         
+        if routed:
+            intent, final_message = routed
+            trace.record_intent(intent)
+        elif cached_answer is not None:
+            final_message = cached_answer
         else:
-            # إجابة مباشرة بدون استخدام أدوات
-            final_message = response_message.content
-            conversations[session_id].append({"role": "assistant", "content": final_message})
-            
+            def generate():
+                try:
+                    result = answer(message, session_id, messages, trace, deadline)
+                except CompletionUnavailable as e:
+                    # الإجابة البديلة لا تُحفظ في الذاكرة المؤقتة
+                    return degraded_answer(message, trace, e)
+                ANSWER_CACHE.set(cache_key, result)
+                return result
+            final_message, coalesced = SINGLE_FLIGHT.run(cache_key, generate, deadline)
+            trace.record_coalesced(coalesced)
+        
+        conversations.append(session_id, {"role": "assistant", "content": final_message})
+        
+        with trace.stage("serialization"):
             return jsonify({
                 'response': final_message,
                 'session_id': session_id
@@ -228,11 +94,226 @@ def chat():
             'error': str(e),
             'response': "عذراً، حدث خطأ. يمكنك التواصل مع الجامعة على: 0798877440"
         }), 500
+    finally:
+        trace.finish()
+
+def degraded_answer(message, trace, error):
+    """إجابة من قاعدة المعرفة دون النموذج عند انتهاء المهلة أو تعذر الوصول لـ OpenAI"""
+    print(f"Answering from the knowledge base only: {error}", file=sys.stderr)
+    trace.record_degraded()
+    return knowledge_only_answer(KNOWLEDGE_STORE.search(message))
+
+def answer(message, session_id, messages, trace, deadline):
+    """توليد الإجابة: استرجاع ثم توليد، أو استدعاء أداة البحث ثم استدعاء ثانٍ"""
+    # الأدوار القديمة تُطوى في ملخص محفوظ للجلسة بدل إعادة إرسالها كاملة
+    with trace.stage("history"):
+        request_messages = HISTORY.compact(session_id, messages)
+    
+    # وضع "استرجاع ثم توليد": نجلب المعلومات محلياً ونرسلها مع السؤال في طلب واحد
+    prefetched = []
+    if PREFETCH_RETRIEVAL:
+        with trace.stage("retrieval"):
+            prefetched = KNOWLEDGE_STORE.search(message)
+        record_retrieval("prefetch", bool(prefetched))
+    if prefetched:
+        with trace.stage("first_completion"):
+            response = completions.create(
+                deadline,
+                model="gpt-4.1-mini",
+                messages=with_knowledge_context(request_messages, prefetched)
+            )
+        trace.record_usage("first_completion", response)
+        return response.choices[0].message.content
+    
+    # لا توجد نتائج محلية: نترك للنموذج استدعاء أداة البحث
+    with trace.stage("first_completion"):
+        response = completions.create(
+            deadline,
+            model="gpt-4.1-mini",
+            messages=request_messages,
+            tools=tools,
+            tool_choice="auto"
+        )
+    trace.record_usage("first_completion", response)
+    
+    response_message = response.choices[0].message
+    tool_calls = response_message.tool_calls
+    
+    # إجابة مباشرة بدون استخدام أدوات
+    if not tool_calls:
+        return response_message.content
+    
+    # الوكيل طلب استخدام أداة
+    tool_messages = [compact_message(response_message)]
+    with trace.stage("tool_execution"):
+        tool_messages.extend(TOOL_EXECUTOR.execute(tool_calls))
+    
+    conversations.append(session_id, *tool_messages)
+    
+    # استدعاء ثاني للحصول على الإجابة النهائية
+    with trace.stage("second_completion"):
+        second_response = completions.create(
+            deadline,
+            model="gpt-4.1-mini",
+            messages=request_messages + tool_messages
+        )
+    trace.record_usage("second_completion", second_response)
+    return second_response.choices[0].message.content
+
+def sse_event(event, data):
+    """تنسيق حدث Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_completion(trace, stage, deadline, streamed, **kwargs):
+    """
+    استدعاء OpenAI بوضع البث: يولّد أحداث token لكل جزء من النص (ويضيفه إلى streamed)،
+    ويعيد (النص الكامل، طلبات الأدوات المجمّعة من الأجزاء)
+    """
+    content_parts = []
+    tool_calls = {}
+    # زمن المرحلة من إرسال الطلب حتى آخر جزء من البث
+    with trace.stage(stage):
+        stream = completions.create(deadline, stream=True, stream_options={"include_usage": True}, **kwargs)
+        for chunk in stream:
+            if chunk.usage:
+                trace.record_usage(stage, chunk)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content_parts.append(delta.content)
+                streamed.append(delta.content)
+                yield sse_event("token", {"content": delta.content})
+            for tool_call_delta in delta.tool_calls or []:
+                tool_call = tool_calls.setdefault(tool_call_delta.index, {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+                if tool_call_delta.id:
+                    tool_call["id"] = tool_call_delta.id
+                if tool_call_delta.function:
+                    tool_call["function"]["name"] += tool_call_delta.function.name or ""
+                    tool_call["function"]["arguments"] += tool_call_delta.function.arguments or ""
+    return "".join(content_parts), [tool_calls[index] for index in sorted(tool_calls)]
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    API endpoint يبث الإجابة كلمة بكلمة عبر Server-Sent Events
+    حدث replace يعني استبدال النص المعروض بالكامل (إجابة من قاعدة المعرفة بعد بث جزء من إجابة النموذج)
+    """
+    data = request.json or {}
+    message = data.get('message', '')
+    session_id = data.get('session_id', str(uuid.uuid4()))
+    
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    # إنشاء محادثة جديدة إذا لم تكن موجودة
+    messages = conversations.get_or_create(session_id, SYSTEM_MESSAGE)
+    
+    trace = RequestTrace("chat_stream")
+    deadline = Deadline()
+    with trace.stage("intent"):
+        routed = INTENT_ROUTER.route(message, len(messages) > 1)
+    if routed:
+        intent, cached_answer = routed
+        cache_key = None
+        trace.record_intent(intent)
+    else:
+        cache_key = ANSWER_CACHE.make_key(message, KNOWLEDGE_STORE.version, messages)
+        cached_answer = ANSWER_CACHE.get(cache_key)
+        trace.record_cache(cache_key, cached_answer)
+    conversations.append(session_id, {"role": "user", "content": message})
+    with trace.stage("history"):
+        request_messages = HISTORY.compact(session_id, messages)
+    
+    def generate():
+        # أجزاء النص التي وصلت للعميل
+        streamed = []
+        yield sse_event("session", {"session_id": session_id})
+        try:
+            if cached_answer is not None:
+                final_message = cached_answer
+                yield sse_event("token", {"content": final_message})
+            else:
+                prefetched = []
+                if PREFETCH_RETRIEVAL:
+                    with trace.stage("retrieval"):
+                        prefetched = KNOWLEDGE_STORE.search(message)
+                    record_retrieval("prefetch", bool(prefetched))
+                if prefetched:
+                    final_message, _ = yield from stream_completion(
+                        trace, "first_completion", deadline, streamed,
+                        model="gpt-4.1-mini",
+                        messages=with_knowledge_context(request_messages, prefetched)
+                    )
+                else:
+                    final_message, tool_calls = yield from stream_completion(
+                        trace, "first_completion", deadline, streamed,
+                        model="gpt-4.1-mini",
+                        messages=request_messages,
+                        tools=tools,
+                        tool_choice="auto"
+                    )
+                    if tool_calls:
+                        tool_messages = [{
+                            "role": "assistant",
+                            "content": final_message or None,
+                            "tool_calls": tool_calls
+                        }]
+                        with trace.stage("tool_execution"):
+                            tool_messages.extend(TOOL_EXECUTOR.execute(tool_calls))
+                        
+                        conversations.append(session_id, *tool_messages)
+                        
+                        # بث الإجابة النهائية بعد تنفيذ الأدوات
+                        final_message, _ = yield from stream_completion(
+                            trace, "second_completion", deadline, streamed,
+                            model="gpt-4.1-mini",
+                            messages=request_messages + tool_messages
+                        )
+                ANSWER_CACHE.set(cache_key, final_message)
+            
+            conversations.append(session_id, {"role": "assistant", "content": final_message})
+            yield sse_event("done", {"response": final_message, "session_id": session_id})
+        
+        except CompletionUnavailable as e:
+            final_message = degraded_answer(message, trace, e)
+            conversations.append(session_id, {"role": "assistant", "content": final_message})
+            # إذا وصل جزء من إجابة النموذج، يستبدل العميل النص المعروض بدل إلحاق الإجابة البديلة به
+            yield sse_event("replace" if streamed else "token", {"content": final_message})
+            yield sse_event("done", {"response": final_message, "session_id": session_id})
+        
+        except Exception as e:
+            yield sse_event("error", {
+                'error': str(e),
+                'response': "عذراً، حدث خطأ. يمكنك التواصل مع الجامعة على: 0798877440"
+            })
+        finally:
+            trace.finish()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """مقاييس Prometheus"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'message': 'Tec AI Agent is running'})
+    return jsonify({
+        'status': 'ok',
+        'message': 'Tec AI Agent is running',
+        'answer_cache': ANSWER_CACHE.stats(),
+        'sessions': conversations.stats()
+    })
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5001))
@@ -0,0 +1,274 @@
+"""
+ASGI API للـ AI Agent
+نفس endpoints الخاصة بـ ai_chatbot_api (/api/chat و /api/health و /metrics) لكن مع asyncio و AsyncOpenAI،
+بحيث تنتظر مئات المحادثات ردّ النموذج في عملية واحدة دون حجز thread لكل منها
+
+التشغيل:
+    uvicorn ai_chatbot_asgi:app --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import json
+import os
+import sys
+import uuid
+
+import httpx
+from openai import AsyncOpenAI
+
+from knowledge_store import with_knowledge_context, knowledge_only_answer, PREFETCH_RETRIEVAL
+from session_store import compact_message
+from metrics import REGISTRY, CONTENT_TYPE, RequestTrace, record_retrieval
+from completion_client import AsyncCompletionClient, CompletionUnavailable, Deadline
+from chatbot_state import (
+    ANSWER_CACHE,
+    HISTORY,
+    INTENT_ROUTER,
+    KNOWLEDGE_STORE,
+    SINGLE_FLIGHT,
+    SYSTEM_MESSAGE,
+    TOOL_EXECUTOR,
+    conversations,
+    tools,
+)
+
+# حجم مجمع الاتصالات المشترك مع OpenAI
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 200))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 50))
+
+ERROR_RESPONSE = "عذراً، حدث خطأ. يمكنك التواصل مع الجامعة على: 0798877440"
+
+_client = None
+_completions = None
+
+
+def get_client():
+    """AsyncOpenAI client واحد للعملية مع مجمع اتصالات مشترك"""
+    global _client, _completions
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+                ),
+                timeout=httpx.Timeout(60.0, connect=5.0)
+            )
+        )
+        _completions = AsyncCompletionClient(_client)
+    return _client
+
+
+def get_completions():
+    """استدعاءات النموذج عبر نفس الـ client ضمن مهلة الطلب مع إعادة المحاولة"""
+    get_client()
+    return _completions
+
+
+async def chat(data):
+    """نفس منطق /api/chat في ai_chatbot_api لكن باستدعاءات غير متزامنة"""
+    trace = RequestTrace("chat_asgi")
+    try:
+        return await _chat(data, trace, Deadline())
+    finally:
+        trace.finish()
+
+
+async def _chat(data, trace, deadline):
+    message = data.get('message', '')
+    session_id = data.get('session_id', str(uuid.uuid4()))
+
+    if not message:
+        return 400, {'error': 'Message is required'}
+
+    # إنشاء محادثة جديدة إذا لم تكن موجودة
+    messages = conversations.get_or_create(session_id, SYSTEM_MESSAGE)
+
+    # التحيات والأسئلة الشائعة الواضحة تُجاب من الردود المحفوظة دون استدعاء النموذج؛
+    # التصنيف وقراءة إصدار قاعدة المعرفة قد يعيدان بناء الفهارس وتدريب المصنف بعد تعديل الملفات،
+    # فيُنفذان في thread حتى لا يتوقف الـ event loop
+    with trace.stage("intent"):
+        routed = await asyncio.to_thread(INTENT_ROUTER.route, message, len(messages) > 1)
+    if routed:
+        intent, response = routed
+        trace.record_intent(intent)
+        conversations.append(session_id, {"role": "user", "content": message})
+        conversations.append(session_id, {"role": "assistant", "content": response})
+        return 200, {'response': response, 'session_id': session_id}
+
+    # الأسئلة المتكررة تُجاب من الذاكرة المؤقتة دون استدعاء OpenAI
+    knowledge_version = await asyncio.to_thread(lambda: KNOWLEDGE_STORE.version)
+    cache_key = ANSWER_CACHE.make_key(message, knowledge_version, messages)
+    cached_answer = ANSWER_CACHE.get(cache_key)
+    trace.record_cache(cache_key, cached_answer)
+
+    conversations.append(session_id, {"role": "user", "content": message})
+
+    if cached_answer is not None:
+        conversations.append(session_id, {"role": "assistant", "content": cached_answer})
+        return 200, {'response': cached_answer, 'session_id': session_id}
+
+    async def generate():
+        try:
+            result = await _answer(message, session_id, messages, trace, deadline)
+        except CompletionUnavailable as e:
+            # الإجابة البديلة لا تُحفظ في الذاكرة المؤقتة
+            sys.stderr.write(f"Answering from the knowledge base only: {e}\n")
+            trace.record_degraded()
+            return knowledge_only_answer(await asyncio.to_thread(KNOWLEDGE_STORE.search, message))
+        ANSWER_CACHE.set(cache_key, result)
+        return result
+
+    final_message, coalesced = await SINGLE_FLIGHT.run_async(cache_key, generate, deadline)
+    trace.record_coalesced(coalesced)
+    conversations.append(session_id, {"role": "assistant", "content": final_message})
+    return 200, {'response': final_message, 'session_id': session_id}
+
+
+async def _answer(message, session_id, messages, trace, deadline):
+    """توليد الإجابة كما في answer() في ai_chatbot_api"""
+    completions = get_completions()
+
+    # الأدوار القديمة تُطوى في ملخص محفوظ للجلسة بدل إعادة إرسالها كاملة
+    # البحث والضغط (وقد يستدعي الملخص النموذج) متزامنان، فيُنفذان في thread حتى لا يتوقف الـ event loop
+    with trace.stage("history"):
+        request_messages = await asyncio.to_thread(HISTORY.compact, session_id, messages)
+
+    # وضع "استرجاع ثم توليد": نجلب المعلومات محلياً ونرسلها مع السؤال في طلب واحد
+    prefetched = []
+    if PREFETCH_RETRIEVAL:
+        with trace.stage("retrieval"):
+            prefetched = await asyncio.to_thread(KNOWLEDGE_STORE.search, message)
+        record_retrieval("prefetch", bool(prefetched))
+    if prefetched:
+        with trace.stage("first_completion"):
+            response = await completions.create(
+                deadline,
+                model="gpt-4.1-mini",
+                messages=with_knowledge_context(request_messages, prefetched)
+            )
+        trace.record_usage("first_completion", response)
+        final_message = response.choices[0].message.content
+    else:
+        # لا توجد نتائج محلية: نترك للنموذج استدعاء أداة البحث
+        with trace.stage("first_completion"):
+            response = await completions.create(
+                deadline,
+                model="gpt-4.1-mini",
+                messages=request_messages,
+                tools=tools,
+                tool_choice="auto"
+            )
+        trace.record_usage("first_completion", response)
+
+        response_message = response.choices[0].message
+        tool_calls = response_message.tool_calls
+
+        if tool_calls:
+            tool_messages = [compact_message(response_message)]
+
+            with trace.stage("tool_execution"):
+                tool_messages.extend(await TOOL_EXECUTOR.execute_async(tool_calls))
+
+            conversations.append(session_id, *tool_messages)
+
+            # استدعاء ثاني للحصول على الإجابة النهائية
+            with trace.stage("second_completion"):
+                second_response = await completions.create(
+                    deadline,
+                    model="gpt-4.1-mini",
+                    messages=request_messages + tool_messages
+                )
+            trace.record_usage("second_completion", second_response)
+            final_message = second_response.choices[0].message.content
+        else:
+            final_message = response_message.content
+
+    return final_message
+
+
+def health():
+    return 200, {
+        'status': 'ok',
+        'message': 'Tec AI Agent is running',
+        'answer_cache': ANSWER_CACHE.stats(),
+        'sessions': conversations.stats()
+    }
+
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        event = await receive()
+        body += event.get("body", b"")
+        if not event.get("more_body"):
+            return body
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await _send_body(send, status, body, b"application/json; charset=utf-8")
+
+
+async def _send_body(send, status, body, content_type):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode()),
+            (b"access-control-allow-origin", b"*"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        event = await receive()
+        if event["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif event["type"] == "lifespan.shutdown":
+            if _client is not None:
+                await _client.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """تطبيق ASGI"""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"]
+    method = scope["method"]
+
+    if method == "OPTIONS":
+        await send({
+            "type": "http.response.start",
+            "status": 204,
+            "headers": [
+                (b"access-control-allow-origin", b"*"),
+                (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+                (b"access-control-allow-headers", b"Content-Type"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    if path == "/api/health" and method == "GET":
+        await _send_json(send, *health())
+    elif path == "/metrics" and method == "GET":
+        await _send_body(send, 200, REGISTRY.render().encode("utf-8"), CONTENT_TYPE.encode())
+    elif path == "/api/chat" and method == "POST":
+        try:
+            data = json.loads(await _read_body(receive) or b"{}")
+            await _send_json(send, *await chat(data))
+        except Exception as e:
+            await _send_json(send, 500, {'error': str(e), 'response': ERROR_RESPONSE})
+    else:
+        await _send_json(send, 404, {'error': 'Not found'})
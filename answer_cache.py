@@ -0,0 +1,138 @@
+"""
+ذاكرة مؤقتة للإجابات أمام استدعاءات OpenAI
+المفتاح هو السؤال بعد التطبيع + إصدار قاعدة المعرفة (+ آخر N أدوار من المحادثة اختيارياً)،
+مع حد أقصى للحجم (LRU) ومدة صلاحية وعدادات للإصابات
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from arabic_text import normalize_text
+
+# الحد الأقصى لعدد الإجابات المحفوظة
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_SIZE", 1024))
+# مدة صلاحية الإجابة بالثواني
+TTL = float(os.getenv("ANSWER_CACHE_TTL", 3600))
+# عدد أدوار المحادثة السابقة الداخلة في المفتاح (0 = تخزين الأسئلة الأولى فقط)
+CONTEXT_TURNS = int(os.getenv("ANSWER_CACHE_CONTEXT_TURNS", 0))
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_question(text):
+    """توحيد السؤال: تطبيع عربي وحذف علامات الترقيم والمسافات الزائدة"""
+    return " ".join(_WORD.findall(normalize_text(text or "")))
+
+
+def _content_text(content):
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def conversation_turns(history):
+    """
+    أدوار المحادثة (user و assistant) بدءاً من أول رسالة للمستخدم؛
+    رسائل المساعد قبلها (رسالة الترحيب التي يرسلها TecChatbot.jsx مع كل سؤال) ليست سياقاً
+    """
+    turns = [
+        message for message in (history or [])
+        if isinstance(message, dict) and message.get("role") in ("user", "assistant")
+    ]
+    for i, message in enumerate(turns):
+        if message["role"] == "user":
+            return turns[i:]
+    return []
+
+
+class AnswerCache:
+    """ذاكرة LRU آمنة للاستخدام من عدة threads"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, context_turns=CONTEXT_TURNS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.context_turns = context_turns
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._knowledge_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def make_key(self, question, knowledge_version, history=None):
+        """
+        مفتاح الإجابة، أو None إذا كان السؤال غير قابل للتخزين
+        (محادثة سابقة أطول مما يسمح به context_turns)
+
+        Args:
+            history: الرسائل السابقة بصيغة [{"role": ..., "content": ...}]
+        """
+        if knowledge_version != self._knowledge_version:
+            self.invalidate(knowledge_version)
+
+        turns = [
+            (message["role"], normalize_question(_content_text(message.get("content"))))
+            for message in conversation_turns(history)
+        ]
+        if len(turns) > self.context_turns * 2:
+            if self.context_turns == 0:
+                return None
+            turns = turns[-self.context_turns * 2:]
+
+        payload = json.dumps([knowledge_version, turns, normalize_question(question)], ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """الإجابة المحفوظة أو None"""
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            answer, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def set(self, key, answer):
+        if key is None or not answer:
+            return
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, knowledge_version=None):
+        """مسح كل الإجابات، ويُستدعى تلقائياً عند تغيّر إصدار قاعدة المعرفة"""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._knowledge_version = knowledge_version
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
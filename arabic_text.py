@@ -0,0 +1,67 @@
+"""
+تطبيع وتقطيع النصوص العربية والإنجليزية للبحث
+يوحّد أشكال الهمزة والألف والتاء المربوطة، ويحذف التشكيل وأداة التعريف "ال"
+"""
+
+import re
+
+# التشكيل والتطويل
+_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+
+_CHAR_MAP = str.maketrans({
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ة": "ه",
+    "ى": "ي",
+    "ؤ": "و",
+    "ئ": "ي",
+    "٠": "0", "١": "1", "٢": "2", "٣": "3", "٤": "4",
+    "٥": "5", "٦": "6", "٧": "7", "٨": "8", "٩": "9",
+})
+
+_TOKEN = re.compile(r"\w+")
+
+# أداة التعريف مع حروف الجر والعطف الملتصقة بها، الأطول أولاً
+_ARABIC_PREFIXES = ("وبال", "وال", "بال", "كال", "فال", "لل", "ال")
+
+STOPWORDS = frozenset({
+    # عربي (بعد التطبيع)
+    "في", "من", "الي", "على", "علي", "عن", "مع", "هل", "ما", "ماذا", "هو", "هي",
+    "او", "و", "ثم", "هذا", "هذه", "ذلك", "التي", "الذي", "كان", "يا", "لي", "انا",
+    "انت", "عند", "كل", "اي", "لا", "قد", "به", "بها", "له", "لها",
+    # English
+    "the", "a", "an", "of", "to", "in", "on", "at", "for", "is", "are", "and",
+    "or", "do", "does", "what", "how", "i", "you", "me", "my", "it", "be", "with",
+})
+
+
+def normalize_text(text):
+    """تطبيع النص: أحرف صغيرة، بدون تشكيل، وأشكال موحّدة للحروف العربية"""
+    text = _DIACRITICS.sub("", text.lower())
+    return text.translate(_CHAR_MAP)
+
+
+def _strip_affixes(token):
+    for prefix in _ARABIC_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            return token[len(prefix):]
+    if token.isascii() and len(token) > 3:
+        if token.endswith("ies"):
+            return token[:-3] + "y"
+        if token.endswith("s") and not token.endswith("ss"):
+            return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """تقطيع النص إلى كلمات مطبّعة بعد حذف أداة التعريف وكلمات التوقف"""
+    tokens = []
+    for token in _TOKEN.findall(normalize_text(text)):
+        if token in STOPWORDS:
+            continue
+        token = _strip_affixes(token)
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
@@ -0,0 +1,94 @@
+"""
+قياس حلقة chat() الكاملة لكل نقطة دخول أمام خادم OpenAI الوهمي
+(استرجاع، استدعاءات النموذج، تنفيذ الأدوات، وتحديث سجل المحادثة)
+
+يجب ضبط OPENAI_BASE_URL قبل استيراد هذا الملف (يقوم بذلك benchmarks.run)
+"""
+
+import sys
+
+from benchmarks import corpus, harness
+
+ENTRY_POINTS = ["ai_agent_cli", "ai_agent_simple", "ai_chatbot_api", "ai_chatbot_asgi", "ai_agent"]
+
+
+def _ai_agent_cli():
+    import ai_agent_cli
+    return lambda i, question: ai_agent_cli.chat(question)
+
+
+def _ai_agent_simple():
+    import ai_agent_simple
+    return lambda i, question: ai_agent_simple.chat(f"bench-{i}", question)
+
+
+def _ai_chatbot_api():
+    import ai_chatbot_api
+    client = ai_chatbot_api.app.test_client()
+
+    def chat(i, question):
+        response = client.post("/api/chat", json={"message": question, "session_id": f"bench-{i}"})
+        if response.status_code != 200:
+            raise RuntimeError(response.get_json())
+    return chat
+
+
+def _ai_agent():
+    import ai_agent
+    ai_agent.get_agent_executor().verbose = False
+    return lambda i, question: ai_agent.chat(f"bench-{i}", question)
+
+
+_FACTORIES = {
+    "ai_agent_cli": _ai_agent_cli,
+    "ai_agent_simple": _ai_agent_simple,
+    "ai_chatbot_api": _ai_chatbot_api,
+    "ai_agent": _ai_agent,
+}
+
+
+def _run_asgi(questions, iterations, concurrency):
+    import ai_chatbot_asgi
+    # الـ client مرتبط بالـ event loop الذي أُنشئ فيه
+    ai_chatbot_asgi._client = None
+
+    async def chat(i):
+        status, body = await ai_chatbot_asgi.chat({
+            "message": questions[i % len(questions)],
+            "session_id": f"bench-{i}"
+        })
+        if status != 200:
+            raise RuntimeError(body)
+
+    try:
+        return harness.run_async(
+            f"chat[ai_chatbot_asgi, concurrency={concurrency}]",
+            chat, iterations=iterations, warmup=2, concurrency=concurrency
+        )
+    finally:
+        ai_chatbot_asgi._client = None
+
+
+def run(entry_points=ENTRY_POINTS, iterations=200, concurrency=(1, 16)):
+    knowledge_base = corpus.load_knowledge_base()
+    questions = corpus.queries(knowledge_base, count=200)
+    results = []
+    for entry_point in entry_points:
+        for workers in concurrency:
+            try:
+                if entry_point == "ai_chatbot_asgi":
+                    results.append(_run_asgi(questions, iterations, workers))
+                    continue
+                chat = _FACTORIES[entry_point]()
+            except ImportError as e:
+                sys.stderr.write(f"Skipping {entry_point}: {e}\n")
+                break
+            results.append(harness.run(
+                f"chat[{entry_point}, concurrency={workers}]",
+                lambda i: chat(i, questions[i % len(questions)]),
+                iterations=iterations,
+                warmup=2,
+                concurrency=workers,
+                allocation_iterations=10 if workers == 1 else 0
+            ))
+    return results
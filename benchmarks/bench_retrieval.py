@@ -0,0 +1,91 @@
+"""
+قياس الاسترجاع: البحث في قاعدة المعرفة (lexical / semantic / hybrid) بأحجام متزايدة،
+وفهرس الموقع المبني مسبقاً، وأداة search_aau_website (أول جلب من الخادم ثم من الذاكرة المؤقتة)
+"""
+
+import os
+import sys
+import tempfile
+
+from benchmarks import corpus, harness
+from knowledge_store import KnowledgeSnapshot
+from site_index import SiteIndex, write_index
+
+SIZES = [10, 100, 1000, 5000]
+
+
+def _backends():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        sys.stderr.write("numpy is not installed, skipping semantic and hybrid retrieval\n")
+        return ["lexical"]
+    return ["lexical", "semantic", "hybrid"]
+
+
+def knowledge_benchmarks(knowledge_base, questions, sizes=SIZES, iterations=1000):
+    results = []
+    for size in sizes:
+        entries = corpus.synthetic_knowledge_base(knowledge_base, size)
+        for backend in _backends():
+            snapshot = KnowledgeSnapshot(entries, backend=backend)
+            results.append(harness.run(
+                f"knowledge.search[{backend}, {size} entries]",
+                lambda i: snapshot.search(questions[i % len(questions)]),
+                iterations=iterations
+            ))
+    return results
+
+
+def site_index_benchmarks(knowledge_base, questions, sizes=SIZES, iterations=1000):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, f"site-{size}.idx")
+            write_index(path, corpus.site_chunks(knowledge_base, size * 5))
+            index = SiteIndex(path)
+            results.append(harness.run(
+                f"site_index.search[{size * 5} chunks]",
+                lambda i: index.search(questions[i % len(questions)]),
+                iterations=iterations
+            ))
+    return results
+
+
+def website_tool_benchmarks(questions, server, iterations=200):
+    """search_aau_website مع صفحات يخدمها الخادم الوهمي: طلبات شرطية ثم ذاكرة مؤقتة حديثة"""
+    try:
+        import website_fetcher
+        from ai_agent import search_aau_website
+    except ImportError as e:
+        sys.stderr.write(f"Skipping search_aau_website: {e}\n")
+        return []
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        pages = sorted(server.pages)
+        for name, fresh_ttl in (("revalidate", 0.0), ("cached", 3600.0)):
+            website_fetcher._fetcher = website_fetcher.WebsiteFetcher(
+                base_url=server.base_url,
+                pages=pages,
+                cache=website_fetcher.PageCache(os.path.join(directory, name)),
+                fresh_ttl=fresh_ttl
+            )
+            results.append(harness.run(
+                f"search_aau_website[{name}, {len(pages)} pages]",
+                lambda i: search_aau_website(questions[i % len(questions)]),
+                iterations=iterations,
+                allocation_iterations=20
+            ))
+        website_fetcher._fetcher = None
+    return results
+
+
+def run(server, sizes=SIZES, iterations=1000):
+    knowledge_base = corpus.load_knowledge_base()
+    questions = corpus.queries(knowledge_base)
+    return (
+        knowledge_benchmarks(knowledge_base, questions, sizes, iterations)
+        + site_index_benchmarks(knowledge_base, questions, sizes, iterations)
+        + website_tool_benchmarks(questions, server, max(1, iterations // 5))
+    )
@@ -0,0 +1,100 @@
+"""
+بيانات القياس: أسئلة عربية وإنجليزية واقعية، وقواعد معرفة اصطناعية بأحجام متزايدة
+مبنية من قاعدة المعرفة الحقيقية (نفس المفردات وأشكال الكتابة)
+"""
+
+import json
+import os
+import random
+
+from knowledge_store import default_paths
+
+_ARABIC_TEMPLATES = [
+    "{keyword}",
+    "ما هي {keyword}؟",
+    "كم {keyword} في الجامعة",
+    "اريد معلومات عن {keyword}",
+    "هل يوجد {keyword} بجامعة عمان العربية؟",
+    "ممكن تحكيلي عن {keyword} لو سمحت",
+]
+_ENGLISH_TEMPLATES = [
+    "{keyword}",
+    "what about {keyword}?",
+    "tell me about the {keyword} please",
+    "how can I find {keyword} at AAU",
+]
+# أسئلة خارج نطاق قاعدة المعرفة (نسبة من الأسئلة لا يجب أن تطابق شيئاً)
+_OUT_OF_DOMAIN = [
+    "كيف حالك اليوم",
+    "ما هو الطقس في عمان",
+    "اكتب لي قصيدة قصيرة",
+    "hello there",
+    "what is the capital of france",
+    "شكرا جزيلا",
+]
+_ARABIC_VARIANTS = str.maketrans({"ا": "أ", "ه": "ة", "ي": "ى"})
+
+
+def load_knowledge_base():
+    """قاعدة المعرفة الحقيقية بصيغة {الفئة: {"keywords": [...], "info": نص}}"""
+    entries = {}
+    for path in default_paths():
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for category, entry in data.items():
+            if category != "default":
+                entries[category] = {
+                    "keywords": list(entry.get("keywords", [])),
+                    "info": entry.get("info") or entry.get("response") or "",
+                }
+    return entries
+
+
+def queries(knowledge_base, count=500, seed=7, out_of_domain_ratio=0.2):
+    """أسئلة مولدة من الكلمات المفتاحية بقوالب عربية وإنجليزية مع اختلافات في الكتابة"""
+    rng = random.Random(seed)
+    keywords = [keyword for entry in knowledge_base.values() for keyword in entry["keywords"]]
+    result = []
+    for _ in range(count):
+        if rng.random() < out_of_domain_ratio:
+            result.append(rng.choice(_OUT_OF_DOMAIN))
+            continue
+        keyword = rng.choice(keywords)
+        is_arabic = any("\u0600" <= ch <= "\u06ff" for ch in keyword)
+        query = rng.choice(_ARABIC_TEMPLATES if is_arabic else _ENGLISH_TEMPLATES).format(keyword=keyword)
+        if is_arabic and rng.random() < 0.3:
+            # أشكال كتابة مختلفة للهمزة والتاء المربوطة والألف المقصورة
+            query = query.translate(_ARABIC_VARIANTS)
+        result.append(query)
+    return result
+
+
+def synthetic_knowledge_base(knowledge_base, size, seed=7):
+    """قاعدة معرفة بعدد size من الفئات: الفئات الحقيقية ثم فئات مولدة من مفرداتها"""
+    rng = random.Random(seed)
+    entries = dict(list(knowledge_base.items())[:size])
+    words = sorted({word for entry in knowledge_base.values() for word in entry["info"].split() if len(word) > 2})
+    keywords = sorted({keyword for entry in knowledge_base.values() for keyword in entry["keywords"]})
+    sentences = [line for entry in knowledge_base.values() for line in entry["info"].split("\n") if line.strip()]
+
+    number = 0
+    while len(entries) < size:
+        number += 1
+        base = rng.choice(keywords)
+        entries[f"synthetic_{number}"] = {
+            "keywords": [f"{base} {number}", f"{rng.choice(words)} {rng.choice(words)}", f"topic{number}"],
+            "info": "\n".join(rng.sample(sentences, min(4, len(sentences)))) + f"\n{base} {number}",
+        }
+    return entries
+
+
+def site_chunks(knowledge_base, count, seed=7):
+    """مقاطع صفحات اصطناعية (الرابط، النص) لقياس فهرس الموقع"""
+    rng = random.Random(seed)
+    sentences = [line for entry in knowledge_base.values() for line in entry["info"].split("\n") if line.strip()]
+    return [
+        (f"https://www.aau.edu.jo/ar/page/{i // 4}", "\n".join(rng.sample(sentences, min(6, len(sentences)))))
+        for i in range(count)
+    ]
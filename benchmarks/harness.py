@@ -0,0 +1,160 @@
+"""
+أدوات القياس المشتركة: تشغيل العملية عدة مرات (مع تزامن اختياري)، حساب ops/sec
+والنسب المئوية للزمن، قياس الذاكرة المخصصة لكل عملية، وحفظ النتائج ومقارنتها بين الـ commits
+"""
+
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def percentile(sorted_values, q):
+    """النسبة المئوية q (0-100) من قائمة مرتبة، بالاستيفاء الخطي"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _summary(name, latencies, elapsed, concurrency, allocations):
+    latencies = sorted(latencies)
+    result = {
+        "name": name,
+        "iterations": len(latencies),
+        "concurrency": concurrency,
+        "ops_per_sec": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+    if allocations:
+        result.update(allocations)
+    return result
+
+
+def measure_allocations(operation, iterations):
+    """
+    الذاكرة لكل عملية عبر tracemalloc (في تشغيل منفصل لأن التتبع يبطئ التنفيذ)
+
+    Returns:
+        {"alloc_peak_kb": متوسط أعلى ذاكرة مؤقتة للعملية، "retained_kb": الذاكرة المتبقية لكل عملية}
+    """
+    tracemalloc.start()
+    try:
+        start_size = tracemalloc.get_traced_memory()[0]
+        peaks = []
+        for i in range(iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            operation(i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - start_size
+    finally:
+        tracemalloc.stop()
+    return {
+        "alloc_peak_kb": round(sum(peaks) / len(peaks) / 1024, 2),
+        "retained_kb": round(retained / iterations / 1024, 3),
+    }
+
+
+def run(name, operation, iterations=1000, warmup=10, concurrency=1, allocation_iterations=100):
+    """
+    قياس operation(i) المتزامنة
+
+    Args:
+        concurrency: عدد الـ threads التي تنفذ العمليات في نفس الوقت
+        allocation_iterations: عدد العمليات في قياس الذاكرة (0 لتخطيه)
+    """
+    for i in range(warmup):
+        operation(i)
+
+    def timed(i):
+        started = time.perf_counter()
+        operation(i)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, range(iterations)))
+    else:
+        latencies = [timed(i) for i in range(iterations)]
+    elapsed = time.perf_counter() - started
+
+    allocations = measure_allocations(operation, allocation_iterations) if allocation_iterations else None
+    return _summary(name, latencies, elapsed, concurrency, allocations)
+
+
+def run_async(name, operation, iterations=1000, warmup=10, concurrency=1):
+    """قياس coroutine operation(i) مع concurrency عملية متزامنة على event loop واحد"""
+    async def main():
+        for i in range(warmup):
+            await operation(i)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed(i):
+            async with semaphore:
+                started = time.perf_counter()
+                await operation(i)
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(timed(i) for i in range(iterations)))
+        return latencies, time.perf_counter() - started
+
+    latencies, elapsed = asyncio.run(main())
+    return _summary(name, latencies, elapsed, concurrency, None)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save(results, parameters, directory=RESULTS_DIR):
+    """حفظ النتائج في benchmarks/results/<commit>-<time>.json وإرجاع المسار"""
+    os.makedirs(directory, exist_ok=True)
+    commit = git_commit()
+    path = os.path.join(directory, f"{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "parameters": parameters,
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def print_results(results, baseline=None):
+    """جدول النتائج، مع نسبة التغيّر عن baseline (نتائج محفوظة سابقاً) إن وُجدت"""
+    previous = {result["name"]: result for result in (baseline or {}).get("results", [])}
+    print(f"{'benchmark':<48} {'ops/sec':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'alloc KB':>9}")
+    for result in results:
+        line = (
+            f"{result['name']:<48} {result['ops_per_sec']:>10.1f} {result['p50_ms']:>9.3f} "
+            f"{result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f} {result.get('alloc_peak_kb', ''):>9}"
+        )
+        old = previous.get(result["name"])
+        if old and old["ops_per_sec"]:
+            change = (result["ops_per_sec"] - old["ops_per_sec"]) / old["ops_per_sec"] * 100
+            line += f"  ({change:+.1f}% ops/sec vs {baseline.get('commit')})"
+        print(line)
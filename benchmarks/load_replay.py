@@ -0,0 +1,381 @@
+"""
+مولد حمل يعيد تشغيل محادثات مسجلة
+يقرأ محادثات ChatbotConversation المصدّرة (JSONL، مثل مخرجات mongoexport)، ويجمعها حسب sessionId،
+ثم يرسلها إلى /api/chat في ai_chatbot_api أو إلى عامل ai_agent_cli --serve بتزامن أو معدل وصول محدد،
+أمام خادم OpenAI وهمي محلي، ويعرض الإنتاجية ونسب الزمن ونسبة الأخطاء ونمو الذاكرة مع الوقت
+
+الاستخدام (من جذر المشروع):
+    mongoexport --collection chatbotconversations --out conversations.jsonl ...
+    python -m benchmarks.load_replay conversations.jsonl --target worker --concurrency 32 --duration 120
+    python -m benchmarks.load_replay conversations.jsonl --target api --rate 5 --duration 300
+    python -m benchmarks.load_replay conversations.jsonl --target api --url http://127.0.0.1:5001/api/chat
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from benchmarks.harness import ROOT, percentile
+from benchmarks.mock_openai import MockOpenAIServer
+
+REQUEST_TIMEOUT = 120
+
+
+def _timestamp(record):
+    created = record.get("createdAt") or record.get("timestamp")
+    if isinstance(created, dict):
+        created = created.get("$date")
+    return str(created or "")
+
+
+def load_sessions(path):
+    """
+    المحادثات المسجلة مجمعة حسب الجلسة ومرتبة حسب وقت الإنشاء
+
+    Returns:
+        قائمة جلسات، كل جلسة قائمة من {"message", "history"}
+    """
+    sessions = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            message = record.get("userMessage") or record.get("message")
+            if not message:
+                continue
+            history = [
+                {"role": "assistant" if turn.get("role") == "bot" else turn.get("role", "user"),
+                 "content": turn.get("content", "")}
+                for turn in record.get("conversationContext") or []
+            ]
+            session_id = record.get("sessionId") or f"record-{number}"
+            sessions.setdefault(session_id, []).append((_timestamp(record), number, message, history))
+    return [
+        [{"message": message, "history": history} for _, _, message, history in sorted(turns)]
+        for turns in sessions.values()
+    ]
+
+
+def process_rss_mb(pid):
+    """الذاكرة المقيمة للعملية (Linux)، أو None"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class ApiTarget:
+    """طلبات HTTP إلى /api/chat، مع تشغيل ai_chatbot_api محلياً إذا لم يُعطَ عنوان"""
+
+    def __init__(self, url=None, port=5055, env=None):
+        import requests
+        self._requests = requests
+        self._local = threading.local()
+        self.process = None
+        if url is None:
+            self.process = subprocess.Popen(
+                [sys.executable, "-c",
+                 f"import ai_chatbot_api; ai_chatbot_api.app.run(host='127.0.0.1', port={port}, threaded=True)"],
+                cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            url = f"http://127.0.0.1:{port}/api/chat"
+            self._wait_until_ready(url.replace("/api/chat", "/api/health"))
+        self.url = url
+
+    def _wait_until_ready(self, health_url, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if self._requests.get(health_url, timeout=1).ok:
+                    return
+            except self._requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError("ai_chatbot_api did not start")
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def send(self, session_id, turn):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.post(
+            self.url, json={"message": turn["message"], "session_id": session_id}, timeout=REQUEST_TIMEOUT
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+    def close(self):
+        if self.process:
+            self.process.terminate()
+            self.process.wait()
+
+
+class WorkerTarget:
+    """عامل ai_agent_cli --serve بنفس بروتوكول server.cjs (سطر JSON لكل طلب مع id)"""
+
+    def __init__(self, threads=8, env=None):
+        self.process = subprocess.Popen(
+            [sys.executable, "ai_agent_cli.py", "--serve", "--workers", str(threads)],
+            cwd=ROOT, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", bufsize=1
+        )
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def _read(self):
+        for line in self.process.stdout:
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            with self._lock:
+                future = self._pending.pop(payload.get("id"), None)
+            if future is not None:
+                future.set_result(payload)
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(RuntimeError("worker exited"))
+
+    def send(self, session_id, turn):
+        request_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._pending[request_id] = future
+            self.process.stdin.write(json.dumps({
+                "id": request_id,
+                "message": turn["message"],
+                "conversationHistory": turn["history"],
+                "sessionId": session_id
+            }, ensure_ascii=False) + "\n")
+            self.process.stdin.flush()
+        result = future.result(timeout=REQUEST_TIMEOUT)
+        if result.get("error"):
+            raise RuntimeError(result["error"])
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.terminate()
+        self.process.wait()
+
+
+class Recorder:
+    """نتائج الطلبات مع لقطات دورية (إنتاجية، زمن، أخطاء، ذاكرة)"""
+
+    def __init__(self, pid, interval):
+        self.pid = pid
+        self.interval = interval
+        self.started = time.monotonic()
+        self._window_started = self.started
+        self.latencies = []
+        self.errors = 0
+        self.timeline = []
+        self._window = []
+        self._window_errors = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def record(self, latency, ok):
+        with self._lock:
+            if ok:
+                self.latencies.append(latency)
+                self._window.append(latency)
+            else:
+                self.errors += 1
+                self._window_errors += 1
+
+    def _snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            window, self._window = sorted(self._window), []
+            errors, self._window_errors = self._window_errors, 0
+            # النافذة الأخيرة (عند stop) أقصر من interval
+            elapsed, self._window_started = now - self._window_started, now
+        rss = process_rss_mb(self.pid) if self.pid else None
+        point = {
+            "t": round(now - self.started, 1),
+            "rps": round((len(window) + errors) / elapsed, 2) if elapsed > 0 else 0.0,
+            "p50_ms": round(percentile(window, 50) * 1000, 1),
+            "p95_ms": round(percentile(window, 95) * 1000, 1),
+            "errors": errors,
+            "rss_mb": round(rss, 1) if rss else None,
+        }
+        self.timeline.append(point)
+        print(f"[{point['t']:>6}s] {point['rps']:>7} req/s  p50 {point['p50_ms']:>8} ms  "
+              f"p95 {point['p95_ms']:>8} ms  errors {errors:>4}  rss {point['rss_mb']} MB", flush=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._snapshot()
+
+    def start(self):
+        self.baseline_rss = process_rss_mb(self.pid) if self.pid else None
+        self.started = self._window_started = time.monotonic()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._snapshot()
+        self.elapsed = time.monotonic() - self.started
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        total = len(latencies) + self.errors
+        final_rss = self.timeline[-1]["rss_mb"] if self.timeline else None
+        return {
+            "requests": total,
+            "throughput_rps": round(total / self.elapsed, 2) if self.elapsed else 0.0,
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "rss_start_mb": round(self.baseline_rss, 1) if self.baseline_rss else None,
+            "rss_end_mb": final_rss,
+            "rss_growth_mb": round(final_rss - self.baseline_rss, 1) if final_rss and self.baseline_rss else None,
+            "timeline": self.timeline,
+        }
+
+
+def replay(target, sessions, recorder, concurrency, rate, duration, think_time):
+    """
+    إعادة تشغيل الجلسات: رسائل الجلسة الواحدة بالترتيب، والجلسات بالتوازي
+
+    Args:
+        concurrency: عدد الجلسات المتزامنة (أو الحد الأقصى لها مع rate؛ الجلسات الزائدة تنتظر
+            ويُحسب انتظارها من زمن الاستجابة، فلا يخفي التحميل الزائد ارتفاع الزمن)
+        rate: معدل وصول الجلسات في الثانية (توزيع Poisson)، أو None لحلقة مغلقة
+        duration: مدة التشغيل بالثواني (تُكرر الجلسات)، أو None لمرور واحد
+    """
+    deadline = time.monotonic() + duration if duration else None
+    passes = itertools.count() if duration else [0]
+    queue = ((f"replay-{number}-{index}", session) for number in passes for index, session in enumerate(sessions))
+    queue_lock = threading.Lock()
+
+    def next_session():
+        if deadline and time.monotonic() >= deadline:
+            return None
+        with queue_lock:
+            return next(queue, None)
+
+    def run_session(session_id, session, arrival=None):
+        for turn in session:
+            if deadline and time.monotonic() >= deadline:
+                return
+            # أول رسالة في الحلقة المفتوحة تُقاس من موعد وصولها المجدول لا من بدء إرسالها
+            started, arrival = (arrival if arrival is not None else time.perf_counter()), None
+            try:
+                target.send(session_id, turn)
+                recorder.record(time.perf_counter() - started, True)
+            except Exception as e:
+                sys.stderr.write(f"Request failed: {e}\n")
+                recorder.record(time.perf_counter() - started, False)
+            if think_time:
+                time.sleep(random.expovariate(1 / think_time))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if rate:
+            # حلقة مفتوحة: الجلسات تصل في مواعيد مجدولة مسبقاً بغض النظر عن سرعة الاستجابة
+            arrival = time.perf_counter()
+            while (item := next_session()) is not None:
+                pool.submit(run_session, *item, arrival)
+                arrival += random.expovariate(rate)
+                time.sleep(max(0.0, arrival - time.perf_counter()))
+        else:
+            def closed_loop():
+                while (item := next_session()) is not None:
+                    run_session(*item)
+            for _ in range(concurrency):
+                pool.submit(closed_loop)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay recorded chatbot conversations as load")
+    parser.add_argument("conversations", help="JSONL export of ChatbotConversation documents")
+    parser.add_argument("--target", choices=["api", "worker"], default="worker")
+    parser.add_argument("--url", help="existing /api/chat URL (default: start ai_chatbot_api locally)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="concurrent sessions (with --rate: the cap; queueing time counts as latency)")
+    parser.add_argument("--rate", type=float, help="session arrivals per second (open loop)")
+    parser.add_argument("--duration", type=float, help="seconds to run, repeating sessions")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between turns of a session")
+    parser.add_argument("--worker-threads", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=800, help="mock OpenAI latency")
+    parser.add_argument("--jitter-ms", type=float, default=400)
+    parser.add_argument("--openai-base-url", help="use this OpenAI-compatible URL instead of the mock")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between timeline samples")
+    parser.add_argument("--output", help="write the summary and timeline as JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sessions = load_sessions(args.conversations)
+    if not sessions:
+        sys.exit("No conversations found")
+    print(f"{sum(len(session) for session in sessions)} messages in {len(sessions)} sessions")
+
+    mock = None
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-load-test")
+    if args.openai_base_url:
+        env["OPENAI_BASE_URL"] = args.openai_base_url
+    else:
+        mock = MockOpenAIServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+        env["OPENAI_BASE_URL"] = f"{mock.base_url}/v1"
+
+    if args.target == "api":
+        target = ApiTarget(args.url, env=env)
+    else:
+        target = WorkerTarget(args.worker_threads, env=env)
+
+    # طلب أول قبل القياس حتى لا يدخل زمن الاستيراد وبناء الفهارس في النتائج أو في نمو الذاكرة
+    target.send("load-replay-warmup", sessions[0][0])
+
+    recorder = Recorder(target.pid, args.interval)
+    recorder.start()
+    try:
+        replay(target, sessions, recorder, args.concurrency, args.rate, args.duration, args.think_time)
+    finally:
+        recorder.stop()
+        target.close()
+        if mock:
+            mock.stop()
+
+    summary = recorder.summary()
+    print(f"\n{summary['requests']} requests, {summary['throughput_rps']} req/s, "
+          f"error rate {summary['error_rate']:.2%}")
+    print(f"latency p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms")
+    if summary["rss_growth_mb"] is not None:
+        print(f"memory {summary['rss_start_mb']} MB -> {summary['rss_end_mb']} MB "
+              f"({summary['rss_growth_mb']:+} MB)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(dict(summary, parameters=vars(args)), f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
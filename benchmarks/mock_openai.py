@@ -0,0 +1,255 @@
+"""
+خادم OpenAI وهمي محلي للقياس
+يطبق /v1/chat/completions (عادي و stream) بزمن استجابة قابل للضبط، ويخدم صفحات HTML
+من قاعدة المعرفة تحت /site/ لتجربة أداة البحث في الموقع دون إنترنت
+
+سلوك النموذج الوهمي:
+- إذا أُرسلت أدوات وكانت آخر رسالة من المستخدم: يطلب search_aau_knowledge بنص السؤال
+- غير ذلك: يعيد إجابة نصية قصيرة مبنية على آخر رسالة
+- نسبة error_rate من الطلبات تُرد بخطأ 500، ونسبة stall_rate تتأخر stall_ms إضافية
+  (لتجربة المهلة وإعادة المحاولة)
+
+الاستخدام:
+    python -m benchmarks.mock_openai --port 8900 --latency-ms 300
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 python3.11 ai_agent_cli.py "سؤال"
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER_WORDS = 60
+
+
+def _content_text(content):
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _usage(messages, completion_tokens):
+    prompt_tokens = sum(len(_content_text(m.get("content")).encode("utf-8")) // 4 + 4 for m in messages)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+def fake_completion(request):
+    """(message، finish_reason) حسب سلوك النموذج الوهمي"""
+    messages = request.get("messages", [])
+    last = messages[-1] if messages else {}
+    if request.get("tools") and last.get("role") == "user":
+        tool_name = request["tools"][0]["function"]["name"]
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {
+                    "name": tool_name,
+                    "arguments": json.dumps({"query": _content_text(last.get("content"))}, ensure_ascii=False)
+                }
+            }]
+        }, "tool_calls"
+
+    words = _content_text(last.get("content")).split() or ["مرحبا"]
+    answer = " ".join(words[i % len(words)] for i in range(ANSWER_WORDS))
+    return {"role": "assistant", "content": answer}, "stop"
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        pages = self.server.pages
+        path = self.path.split("?")[0]
+        if path in pages:
+            etag = '"' + hashlib.sha1(pages[path].encode("utf-8")).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            data = pages[path].encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send(404, json.dumps({"error": {"message": "not found"}}))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, json.dumps({"error": {"message": "not found"}}))
+            return
+
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        if random.random() < server.error_rate:
+            self._send(500, json.dumps({"error": {"message": "mock upstream error", "type": "server_error"}}))
+            return
+        latency = server.latency + random.uniform(0, server.jitter)
+        if random.random() < server.stall_rate:
+            latency += server.stall
+        message, finish_reason = fake_completion(request)
+
+        if request.get("stream"):
+            self._stream(request, message, finish_reason, latency)
+            return
+
+        time.sleep(latency)
+        completion_tokens = len((message.get("content") or "").split()) + 10
+        self._send(200, json.dumps({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": _usage(request.get("messages", []), completion_tokens)
+        }, ensure_ascii=False))
+
+    def _stream(self, request, message, finish_reason, latency):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+        }
+
+        def emit(delta, finish=None):
+            chunk = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish}])
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        # نصف زمن الاستجابة قبل أول token والباقي موزع على الـ tokens
+        time.sleep(latency / 2)
+        if message.get("tool_calls"):
+            tool_calls = [dict(call, index=i) for i, call in enumerate(message["tool_calls"])]
+            emit({"role": "assistant", "tool_calls": tool_calls})
+        else:
+            words = message["content"].split(" ")
+            for i, word in enumerate(words):
+                emit({"content": word if i == 0 else " " + word})
+                time.sleep(latency / 2 / len(words))
+        emit({}, finish_reason)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            completion_tokens = len((message.get("content") or "").split()) + 10
+            chunk = dict(base, choices=[], usage=_usage(request.get("messages", []), completion_tokens))
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, pages=None,
+                 error_rate=0.0, stall_rate=0.0, stall_ms=0.0):
+        super().__init__((host, port), MockOpenAIHandler)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall = stall_ms / 1000
+        self.pages = pages or {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self._thread = None
+
+    def handle_error(self, request, client_address):
+        # العميل أغلق الاتصال قبل الرد (انتهت مهلته)
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def knowledge_pages(knowledge_base):
+    """صفحة HTML لكل فئة من قاعدة المعرفة: {المسار: HTML}"""
+    pages = {}
+    for category, entry in knowledge_base.items():
+        text = entry.get("info") or entry.get("response") or ""
+        paragraphs = "".join(f"<p>{line}</p>" for line in text.split("\n") if line.strip())
+        pages[f"/site/{category}"] = (
+            f"<html><body><nav>الرئيسية | القبول | الكليات</nav>"
+            f"<h1>{category}</h1>{paragraphs}<footer>جامعة عمان العربية</footer></body></html>"
+        )
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the OpenAI chat completions API")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--stall-rate", type=float, default=0, help="fraction of requests delayed by --stall-ms")
+    parser.add_argument("--stall-ms", type=float, default=30000)
+    args = parser.parse_args()
+
+    from benchmarks.corpus import load_knowledge_base
+    server = MockOpenAIServer(
+        port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        pages=knowledge_pages(load_knowledge_base()),
+        error_rate=args.error_rate, stall_rate=args.stall_rate, stall_ms=args.stall_ms
+    )
+    print(f"Mock OpenAI listening on {server.base_url}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+تشغيل مجموعة القياسات
+يبدأ خادم OpenAI وهمي محلي، ويقيس الاسترجاع وحلقة chat() الكاملة، ثم يحفظ النتائج
+في benchmarks/results/ لمقارنتها مع commit سابق
+
+الاستخدام (من جذر المشروع):
+    python -m benchmarks.run
+    python -m benchmarks.run --suite retrieval --sizes 10,1000 --save
+    python -m benchmarks.run --suite chat --latency-ms 300 --concurrency 1,32
+    python -m benchmarks.run --compare benchmarks/results/<commit>-<time>.json
+"""
+
+import argparse
+import json
+import os
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Retrieval and chat loop benchmarks")
+    parser.add_argument("--suite", choices=["retrieval", "chat", "all"], default="all")
+    parser.add_argument("--iterations", type=int, default=1000, help="retrieval iterations per benchmark")
+    parser.add_argument("--chat-iterations", type=int, default=100)
+    parser.add_argument("--sizes", default="10,100,1000,5000", help="knowledge base sizes")
+    parser.add_argument("--concurrency", default="1,16", help="chat concurrency levels")
+    parser.add_argument("--entry-points", default="ai_agent_cli,ai_agent_simple,ai_chatbot_api,ai_chatbot_asgi,ai_agent")
+    parser.add_argument("--latency-ms", type=float, default=50, help="mock OpenAI response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--with-answer-cache", action="store_true",
+                        help="keep the answer cache on (off by default so every chat reaches the model)")
+    parser.add_argument("--save", action="store_true", help="write results to benchmarks/results/")
+    parser.add_argument("--compare", help="saved results file to compare against")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # يجب ضبط البيئة قبل استيراد ملفات الوكيل
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    if not args.with_answer_cache:
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+
+    from benchmarks import corpus, harness
+    from benchmarks.mock_openai import MockOpenAIServer, knowledge_pages
+
+    server = MockOpenAIServer(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        pages=knowledge_pages(corpus.load_knowledge_base())
+    )
+    os.environ["OPENAI_BASE_URL"] = f"{server.base_url}/v1"
+
+    results = []
+    with server:
+        if args.suite in ("retrieval", "all"):
+            from benchmarks import bench_retrieval
+            sizes = [int(size) for size in args.sizes.split(",")]
+            results += bench_retrieval.run(server, sizes=sizes, iterations=args.iterations)
+        if args.suite in ("chat", "all"):
+            from benchmarks import bench_chat
+            results += bench_chat.run(
+                entry_points=args.entry_points.split(","),
+                iterations=args.chat_iterations,
+                concurrency=[int(level) for level in args.concurrency.split(",")]
+            )
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    harness.print_results(results, baseline)
+    print(f"\nmock OpenAI requests: {server.requests}")
+
+    if args.save:
+        path = harness.save(results, vars(args))
+        print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+قياس زمن البدء البارد لكل نقطة دخول Python
+يشغّل `python -X importtime -c "import <module>"` في عملية جديدة عدة مرات، ويعرض أقل زمن كلي
+وأثقل الوحدات المستوردة (الزمن التراكمي من مخرجات -X importtime)
+
+الاستخدام:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --top 8 ai_agent ai_agent_cli
+    python benchmarks/startup.py --json > startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = ["ai_agent", "ai_agent_cli", "ai_agent_simple", "ai_chatbot_api", "ai_chatbot_asgi"]
+
+
+def parse_importtime(stderr):
+    """{الوحدة: الزمن التراكمي بالميكروثانية} من مخرجات -X importtime"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        cumulative[name.strip()] = (int(parts[1]), depth)
+    return cumulative
+
+
+def measure(module, runs, python=sys.executable):
+    """أقل زمن كلي (مللي ثانية) وقراءة importtime للتشغيل الأسرع"""
+    env = dict(os.environ)
+    # بعض الملفات تنشئ OpenAI client عند الاستيراد
+    env.setdefault("OPENAI_API_KEY", "sk-startup-benchmark")
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [python, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+            return {"module": module, "error": error}
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result.stderr)
+
+    imports = parse_importtime(best[1])
+    own_import_us = imports.get(module, (0, 0))[0]
+    return {
+        "module": module,
+        "wall_ms": round(best[0], 1),
+        "import_ms": round(own_import_us / 1000, 1),
+        "heaviest": sorted(
+            ((name, round(us / 1000, 1)) for name, (us, depth) in imports.items() if name != module and depth == 1),
+            key=lambda item: -item[1]
+        ),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cold-start time of each entry point")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="heaviest direct imports to show")
+    parser.add_argument("--json", action="store_true")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = [measure(module, args.runs) for module in args.modules]
+    if args.json:
+        for result in results:
+            result["heaviest"] = result.get("heaviest", [])[:args.top]
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print(f"python {sys.version.split()[0]}, best of {args.runs} runs")
+    for result in results:
+        if "error" in result:
+            print(f"\n{result['module']}: {result['error']}")
+            continue
+        print(f"\n{result['module']}: {result['wall_ms']} ms total, {result['import_ms']} ms importing")
+        for name, ms in result["heaviest"][:args.top]:
+            print(f"    {ms:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+فهرس مقلوب مع ترتيب BM25 لقاعدة المعرفة
+يفهرس الكلمات المفتاحية ونص المعلومات لكل فئة بعد التطبيع العربي
+"""
+
+import math
+from collections import Counter
+
+from arabic_text import tokenize
+
+# وزن الكلمات المفتاحية مقارنة بنص المعلومات
+KEYWORD_WEIGHT = 3
+# أقل درجة BM25 لاعتبار النتيجة ذات صلة
+MIN_SCORE = 2.5
+
+
+class BM25Index:
+    """فهرس مقلوب {الكلمة: [(رقم المستند، التكرار)]} مع ترتيب BM25"""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        """
+        Args:
+            documents: قائمة من (معرّف المستند، قائمة الكلمات المطبّعة)
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.doc_lengths = []
+        self.postings = {}
+
+        for doc_index, (doc_id, tokens) in enumerate(documents):
+            self.doc_ids.append(doc_id)
+            self.doc_lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                self.postings.setdefault(term, []).append((doc_index, frequency))
+
+        doc_count = len(self.doc_ids)
+        self.avg_length = (sum(self.doc_lengths) / doc_count) if doc_count else 0.0
+        self.idf = {
+            term: math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base, keyword_weight=KEYWORD_WEIGHT, **kwargs):
+        """بناء الفهرس من الكلمات المفتاحية ونص "info" أو "response" لكل فئة"""
+        documents = []
+        for category, data in knowledge_base.items():
+            tokens = tokenize(" ".join(data.get("keywords", []))) * keyword_weight
+            tokens += tokenize(data.get("info") or data.get("response") or "")
+            documents.append((category, tokens))
+        return cls(documents, **kwargs)
+
+    def scores(self, query):
+        """درجات BM25 لكل المستندات التي تحتوي على كلمة واحدة على الأقل من الاستعلام"""
+        scores = {}
+        k1 = self.k1
+        b = self.b
+        avg_length = self.avg_length or 1.0
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_index, frequency in postings:
+                norm = k1 * (1 - b + b * self.doc_lengths[doc_index] / avg_length)
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * frequency * (k1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, query, top_k=3, min_score=MIN_SCORE):
+        """
+        أفضل النتائج للاستعلام
+
+        Returns:
+            قائمة من (معرّف المستند، الدرجة) مرتبة تنازلياً
+        """
+        ranked = sorted(self.scores(query).items(), key=lambda item: (-item[1], item[0]))
+        return [
+            (self.doc_ids[doc_index], score)
+            for doc_index, score in ranked[:top_k]
+            if score >= min_score
+        ]
@@ -0,0 +1,144 @@
+"""
+بناء فهرس موقع الجامعة مسبقاً (خارج مسار الطلبات)
+يزحف على نسخة من الموقع (مجلد HTML محلي أو خادم HTTP)، ويستخرج النص، ويقسمه إلى مقاطع،
+ثم يكتب ملف الفهرس الذي تحمّله الوكلاء عند بدء التشغيل
+
+الاستخدام:
+    python -m build_index --source ./aau-mirror --output aau_site.idx
+    python -m build_index --source http://127.0.0.1:8000/ar --max-pages 500
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+
+from site_index import SITE_INDEX_FILE, write_index
+from website_fetcher import BASE_URL, declared_encoding, extract_text
+
+# الحد الأقصى لطول المقطع (بالحروف)
+CHUNK_CHARS = 800
+# أقصر مقطع يدخل في الفهرس
+MIN_CHUNK_CHARS = 40
+MAX_PAGES = 2000
+
+_HTML_EXTENSIONS = (".html", ".htm")
+
+
+def chunk_text(text, max_chars=CHUNK_CHARS):
+    """تقسيم النص إلى مقاطع متتالية من الأسطر لا يتجاوز كل منها max_chars تقريباً"""
+    chunks = []
+    current = []
+    size = 0
+    for line in text.split("\n"):
+        if current and size + len(line) > max_chars:
+            chunks.append("\n".join(current))
+            current = []
+            size = 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return [chunk for chunk in chunks if len(chunk) >= MIN_CHUNK_CHARS]
+
+
+def crawl_directory(root, base_url=BASE_URL):
+    """
+    صفحات HTML في مجلد محلي: (الرابط المقابل على الموقع، HTML)
+    HTML بايتات كما هي على القرص، فيُقرأ ترميزها من meta charset
+    """
+    for directory, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            if not name.lower().endswith(_HTML_EXTENSIONS):
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            if relative == "index.html" or relative.endswith("/index.html"):
+                relative = relative[:-len("index.html")]
+            with open(path, "rb") as f:
+                yield urljoin(base_url.rstrip("/") + "/", relative), f.read()
+
+
+def crawl_site(start_url, max_pages=MAX_PAGES, delay=0.0):
+    """
+    زحف بالعرض على صفحات نفس النطاق بدءاً من start_url: (الرابط، HTML)
+    HTML نص إذا ذكرت الترويسة الترميز، وإلا بايتات يُقرأ ترميزها من meta charset
+    """
+    host = urlparse(start_url).netloc
+    session = requests.Session()
+    session.headers["User-Agent"] = "TecBot/1.0 (+https://www.aau.edu.jo)"
+    queue = deque([start_url])
+    seen = {start_url}
+    fetched = 0
+    while queue and fetched < max_pages:
+        url = queue.popleft()
+        try:
+            response = session.get(url, timeout=15)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            sys.stderr.write(f"Skipping {url}: {e}\n")
+            continue
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            continue
+        fetched += 1
+        # response.text يفترض ISO-8859-1 عند غياب charset فيُحفظ النص العربي مشوهاً في الفهرس
+        html = response.text if declared_encoding(response) else response.content
+        yield url, html
+
+        for link in BeautifulSoup(html, "html.parser").find_all("a", href=True):
+            target = urldefrag(urljoin(url, link["href"]))[0]
+            if urlparse(target).netloc == host and target not in seen:
+                seen.add(target)
+                queue.append(target)
+        if delay:
+            time.sleep(delay)
+
+
+def build(pages, output, max_chars=CHUNK_CHARS):
+    """استخراج المقاطع من الصفحات وكتابة الفهرس، مع حذف المقاطع المكررة بين الصفحات"""
+    chunks = []
+    seen = set()
+    page_count = 0
+    for url, html in pages:
+        page_count += 1
+        for chunk in chunk_text(extract_text(html), max_chars):
+            if chunk not in seen:
+                seen.add(chunk)
+                chunks.append((url, chunk))
+    write_index(output, chunks)
+    return page_count, len(chunks)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the AAU website index")
+    parser.add_argument("--source", required=True,
+                        help="local mirror directory or start URL of the site")
+    parser.add_argument("--output", default=SITE_INDEX_FILE)
+    parser.add_argument("--base-url", default=BASE_URL,
+                        help="site URL the local mirror corresponds to")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    parser.add_argument("--chunk-chars", type=int, default=CHUNK_CHARS)
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="seconds to wait between HTTP requests")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.monotonic()
+    if urlparse(args.source).scheme in ("http", "https"):
+        pages = crawl_site(args.source, args.max_pages, args.delay)
+    else:
+        pages = crawl_directory(args.source, args.base_url)
+    page_count, chunk_count = build(pages, args.output, args.chunk_chars)
+    print(f"Indexed {page_count} pages into {chunk_count} chunks: {args.output} "
+          f"({os.path.getsize(args.output)} bytes, {time.monotonic() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+حالة الشات بوت المشتركة بين Flask API (ai_chatbot_api) و ASGI API (ai_chatbot_asgi)
+قاعدة المعرفة، أداة البحث، الجلسات، الذاكرة المؤقتة، ومصنف النوايا؛ بدون أي إطار ويب أو OpenAI client،
+فلا يستورد تطبيق ASGI مكتبة Flask ولا ينشئ client متزامن
+"""
+
+from knowledge_store import get_store
+from answer_cache import AnswerCache
+from session_store import SessionStore
+from history_manager import HistoryManager
+from tool_executor import ToolExecutor
+from single_flight import SingleFlight
+from metrics import REGISTRY, record_retrieval
+from intent_classifier import IntentRouter
+
+# قاعدة المعرفة الموحّدة (chatbot-knowledge.json) مع فهارسها وإعادة التحميل التلقائي
+KNOWLEDGE_STORE = get_store()
+
+# التحيات والأسئلة الشائعة الواضحة تُجاب من الردود المحفوظة دون استدعاء النموذج
+INTENT_ROUTER = IntentRouter(KNOWLEDGE_STORE)
+
+def search_aau_knowledge(query):
+    """البحث في قاعدة المعرفة"""
+    results = [info for _, info in KNOWLEDGE_STORE.search(query)]
+    record_retrieval("tool", bool(results))
+    
+    if results:
+        return "\n\n".join(results)
+    
+    return """لم أجد معلومات محددة عن سؤالك في قاعدة البيانات الحالية.
+يمكنك التواصل مباشرة مع جامعة عمان العربية:
+📞 الهاتف: 0798877440
+🌐 الموقع: https://www.aau.edu.jo/ar"""
+
+# تعريف الأداة
+tools = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_aau_knowledge",
+            "description": "البحث في قاعدة معرفة جامعة عمان العربية",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "سؤال المستخدم"
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    }
+]
+
+# تنفيذ الأدوات التي يطلبها النموذج (بالتوازي عند طلب أكثر من أداة)
+TOOL_EXECUTOR = ToolExecutor()
+TOOL_EXECUTOR.register("search_aau_knowledge", search_aau_knowledge)
+
+SYSTEM_MESSAGE = """أنت Tec 🤖، مساعد ذكي متخصص في جامعة عمان العربية.
+
+مهمتك:
+1. فهم أسئلة المستخدمين بدقة
+2. استخدام أداة البحث للحصول على معلومات دقيقة
+3. تقديم إجابات واضحة ومفيدة باللغة العربية
+4. إذا لم تجد المعلومة، وجه المستخدم للاتصال بالجامعة
+
+أسلوبك:
+- ودود ومحترف
+- واضح ومباشر
+- استخدم الإيموجي بشكل مناسب
+- قدم معلومات منظمة وسهلة القراءة"""
+
+# تخزين المحادثات (محدود العدد والذاكرة مع حذف الجلسات الخاملة)
+conversations = SessionStore()
+
+# ذاكرة مؤقتة للإجابات المتكررة
+ANSWER_CACHE = AnswerCache()
+REGISTRY.register_stats("tec_answer_cache", "Answer cache statistics", ANSWER_CACHE.stats, gauges=("size",))
+
+# الأسئلة المتطابقة المتزامنة تنتظر نتيجة أول طلب بدل استدعاء OpenAI لكل منها
+SINGLE_FLIGHT = SingleFlight()
+REGISTRY.register_stats(
+    "tec_single_flight", "Coalesced identical in-flight questions", SINGLE_FLIGHT.stats, gauges=("in_flight",)
+)
+REGISTRY.register_stats(
+    "tec_sessions", "Conversation store statistics", conversations.stats, gauges=("sessions", "bytes")
+)
+
+# ضغط سجل المحادثة الطويل ضمن ميزانية من الـ tokens
+HISTORY = HistoryManager()
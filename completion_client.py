@@ -0,0 +1,223 @@
+"""
+استدعاءات OpenAI ضمن مهلة لكل طلب
+كل طلب محادثة يحمل Deadline واحدة تمر عبر كل استدعاءاته للنموذج: لكل محاولة مهلة بقدر الوقت المتبقي،
+وإعادة محدودة مع انتظار متزايد عشوائي (jitter) للأخطاء المؤقتة (انقطاع، 429، 5xx)،
+وطلب مكرر اختياري (hedging) إذا تأخرت المحاولة الأولى، وعند اقتراب نهاية المهلة
+يُرفع CompletionUnavailable ليجيب المستدعي من قاعدة المعرفة مباشرة
+"""
+
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import openai
+
+from metrics import OPENAI_CALLS
+
+# المهلة الكلية لطلب المحادثة بالثواني (أقل من مهلة server.cjs حتى يصل رد قبلها)
+REQUEST_DEADLINE = float(os.getenv("OPENAI_REQUEST_DEADLINE", 30))
+# عدد مرات الإعادة بعد المحاولة الأولى
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+# الانتظار قبل الإعادة: عشوائي بين 0 و min(BACKOFF_MAX, BACKOFF_BASE * 2^المحاولة)
+BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", 0.5))
+BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", 4))
+# إرسال طلب مكرر إذا لم تنتهِ المحاولة خلال هذه المدة بالثواني (0 = معطل)
+HEDGE_AFTER = float(os.getenv("OPENAI_HEDGE_AFTER", 0))
+# أقل وقت متبقٍ يستحق بدء محاولة جديدة؛ دونه نجيب من قاعدة المعرفة
+MIN_ATTEMPT_SECONDS = float(os.getenv("OPENAI_MIN_ATTEMPT_SECONDS", 2))
+# أقصى مدة لمحاولة واحدة، حتى لا يستهلك طلب عالق كل المهلة ويبقى وقت لإعادته
+ATTEMPT_TIMEOUT = float(os.getenv("OPENAI_ATTEMPT_TIMEOUT", 10))
+
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+class CompletionUnavailable(Exception):
+    """تعذر الحصول على إجابة من النموذج (أخطاء مؤقتة متكررة)"""
+
+
+class DeadlineExceeded(CompletionUnavailable):
+    """لم يبقَ وقت كافٍ من مهلة الطلب لمحاولة أخرى"""
+
+
+class Deadline:
+    """نهاية مهلة الطلب (monotonic)"""
+
+    def __init__(self, seconds=REQUEST_DEADLINE):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def is_retryable(error):
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in _RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def backoff_delay(attempt, error=None, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    """مدة الانتظار قبل الإعادة رقم attempt (تبدأ من 0)، مع احترام Retry-After إن وُجد"""
+    delay = random.uniform(0, min(maximum, base * (2 ** attempt)))
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("retry-after", 0)))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+
+class _Policy:
+    def __init__(self, max_retries, backoff_base, backoff_max, hedge_after, min_attempt_seconds, attempt_timeout):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.min_attempt_seconds = min_attempt_seconds
+        self.attempt_timeout = attempt_timeout
+
+    def _attempt_timeout(self, deadline):
+        return min(deadline.remaining(), self.attempt_timeout)
+
+    def _check_remaining(self, deadline):
+        if deadline.remaining() < self.min_attempt_seconds:
+            OPENAI_CALLS.inc(("deadline_exceeded",))
+            raise DeadlineExceeded(f"{deadline.remaining():.1f}s left of the request deadline")
+
+    def _retry_delay(self, attempt, error, deadline):
+        """مدة الانتظار قبل الإعادة، أو رفع الخطأ إذا لم تكن الإعادة ممكنة"""
+        if not is_retryable(error):
+            OPENAI_CALLS.inc(("error",))
+            raise error
+        if attempt >= self.max_retries:
+            OPENAI_CALLS.inc(("exhausted",))
+            raise CompletionUnavailable(str(error)) from error
+        delay = backoff_delay(attempt, error, self.backoff_base, self.backoff_max)
+        if deadline.remaining() - delay < self.min_attempt_seconds:
+            OPENAI_CALLS.inc(("deadline_exceeded",))
+            raise DeadlineExceeded(f"no time left to retry after: {error}") from error
+        OPENAI_CALLS.inc(("retry",))
+        return delay
+
+    def _should_hedge(self, deadline, kwargs):
+        return self.hedge_after > 0 and not kwargs.get("stream") and deadline.remaining() > self.hedge_after
+
+
+class CompletionClient(_Policy):
+    """غلاف لـ client.chat.completions.create مع مهلة وإعادة و hedging"""
+
+    def __init__(self, client, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 hedge_after=HEDGE_AFTER, min_attempt_seconds=MIN_ATTEMPT_SECONDS, attempt_timeout=ATTEMPT_TIMEOUT):
+        super().__init__(max_retries, backoff_base, backoff_max, hedge_after, min_attempt_seconds, attempt_timeout)
+        # الإعادة تتم هنا ضمن المهلة، لا داخل الـ SDK
+        self.client = client.with_options(max_retries=0)
+        self._hedge_pool = ThreadPoolExecutor(thread_name_prefix="openai-hedge") if hedge_after > 0 else None
+
+    def create(self, deadline=None, **kwargs):
+        """
+        نفس معاملات chat.completions.create
+
+        Raises:
+            CompletionUnavailable: عند انتهاء المهلة أو استمرار الأخطاء المؤقتة
+        """
+        deadline = deadline or Deadline()
+        attempt = 0
+        while True:
+            self._check_remaining(deadline)
+            try:
+                response = self._attempt(deadline, kwargs)
+            except Exception as e:
+                time.sleep(self._retry_delay(attempt, e, deadline))
+                attempt += 1
+                continue
+            OPENAI_CALLS.inc(("success",))
+            return response
+
+    def _call(self, timeout, kwargs):
+        return self.client.chat.completions.create(timeout=timeout, **kwargs)
+
+    def _attempt(self, deadline, kwargs):
+        """محاولة واحدة، مع طلب مكرر إذا لم تنتهِ الأولى خلال hedge_after"""
+        if not self._should_hedge(deadline, kwargs):
+            return self._call(self._attempt_timeout(deadline), kwargs)
+
+        first = self._hedge_pool.submit(self._call, self._attempt_timeout(deadline), kwargs)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        # لا يمكن إلغاء طلب HTTP متزامن جارٍ؛ الطلب الخاسر ينتهي وحده ضمن مهلته
+        OPENAI_CALLS.inc(("hedged",))
+        second = self._hedge_pool.submit(self._call, self._attempt_timeout(deadline), kwargs)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        OPENAI_CALLS.inc(("hedge_won",))
+                    return future.result()
+                error = future.exception()
+        raise error
+
+
+class AsyncCompletionClient(_Policy):
+    """نفس CompletionClient لـ AsyncOpenAI؛ الطلب الخاسر في hedging يُلغى"""
+
+    def __init__(self, client, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 hedge_after=HEDGE_AFTER, min_attempt_seconds=MIN_ATTEMPT_SECONDS, attempt_timeout=ATTEMPT_TIMEOUT):
+        super().__init__(max_retries, backoff_base, backoff_max, hedge_after, min_attempt_seconds, attempt_timeout)
+        self.client = client.with_options(max_retries=0)
+
+    async def create(self, deadline=None, **kwargs):
+        deadline = deadline or Deadline()
+        attempt = 0
+        while True:
+            self._check_remaining(deadline)
+            try:
+                response = await self._attempt(deadline, kwargs)
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(attempt, e, deadline))
+                attempt += 1
+                continue
+            OPENAI_CALLS.inc(("success",))
+            return response
+
+    async def _attempt(self, deadline, kwargs):
+        if not self._should_hedge(deadline, kwargs):
+            return await self.client.chat.completions.create(timeout=self._attempt_timeout(deadline), **kwargs)
+
+        first = asyncio.ensure_future(
+            self.client.chat.completions.create(timeout=self._attempt_timeout(deadline), **kwargs)
+        )
+        done, _ = await asyncio.wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        OPENAI_CALLS.inc(("hedged",))
+        second = asyncio.ensure_future(
+            self.client.chat.completions.create(timeout=self._attempt_timeout(deadline), **kwargs)
+        )
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            OPENAI_CALLS.inc(("hedge_won",))
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,170 @@
+"""
+ضغط سجل المحادثة ضمن ميزانية من الـ tokens
+يحتفظ بآخر الأدوار كما هي، ويطوي الأدوار الأقدم في ملخص متراكم يُحفظ لكل جلسة
+ويُحدَّث تدريجياً بالأدوار المطوية الجديدة فقط
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# ميزانية الأدوار الأخيرة المرسلة كما هي
+TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 1500))
+# ميزانية الملخص المتراكم
+SUMMARY_TOKEN_BUDGET = int(os.getenv("HISTORY_SUMMARY_TOKEN_BUDGET", 300))
+# عدد الجلسات التي تُحفظ ملخصاتها
+MAX_SUMMARIES = 10000
+# طول مقتطف كل رسالة في الملخص المحلي
+SNIPPET_CHARS = 160
+# tokens إضافية لكل رسالة (الدور والفواصل)
+MESSAGE_OVERHEAD = 4
+
+_encoding = None
+if tiktoken is not None:
+    try:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        _encoding = None
+
+
+def count_tokens(text):
+    """عدد الـ tokens محلياً: tiktoken إن وُجد، وإلا تقدير من عدد البايتات"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text.encode("utf-8")) // 4)
+
+
+def _content_text(content):
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def message_tokens(message):
+    return count_tokens(_content_text(message.get("content"))) + MESSAGE_OVERHEAD
+
+
+def local_summarizer(previous_summary, messages):
+    """ملخص استخلاصي محلي: مقتطف قصير من كل رسالة مطوية، بدون أي استدعاء شبكة"""
+    labels = {"user": "المستخدم", "assistant": "المساعد"}
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        label = labels.get(message.get("role"))
+        text = " ".join(_content_text(message.get("content")).split())
+        if label and text:
+            snippet = text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS] + "…"
+            lines.append(f"{label}: {snippet}")
+    return "\n".join(lines)
+
+
+def make_llm_summarizer(client, model="gpt-4.1-mini"):
+    """ملخص باستخدام النموذج، يستقبل الملخص السابق والأدوار الجديدة فقط"""
+    def summarize(previous_summary, messages):
+        transcript = local_summarizer("", messages)
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "لخّص المحادثة التالية في نقاط قصيرة تحفظ الأسئلة والمعلومات المهمة فقط."},
+                {"role": "user", "content": f"الملخص السابق:\n{previous_summary or '-'}\n\nأدوار جديدة:\n{transcript}"}
+            ]
+        )
+        return response.choices[0].message.content or previous_summary
+    return summarize
+
+
+def _fingerprint(message):
+    return hashlib.sha1(
+        f"{message.get('role')}\x00{_content_text(message.get('content'))}".encode("utf-8")
+    ).hexdigest()
+
+
+class HistoryManager:
+    """يبني رسائل الطلب من سجل المحادثة ضمن ميزانية الـ tokens"""
+
+    def __init__(self, token_budget=TOKEN_BUDGET, summary_token_budget=SUMMARY_TOKEN_BUDGET,
+                 summarizer=local_summarizer, max_summaries=MAX_SUMMARIES):
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.summarizer = summarizer
+        self.max_summaries = max_summaries
+        # {الجلسة: (عدد الرسائل المطوية، بصمة آخر رسالة مطوية، الملخص)}
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _split_point(self, conversation):
+        """أول رسالة تبقى كما هي: آخر الرسائل ضمن الميزانية، بدءاً من رسالة مستخدم"""
+        used = 0
+        split = len(conversation)
+        while split > 0:
+            cost = message_tokens(conversation[split - 1])
+            if used + cost > self.token_budget and split < len(conversation):
+                break
+            used += cost
+            split -= 1
+        # لا نفصل رد المساعد أو نتائج الأدوات عن سؤال المستخدم الذي سبقها
+        while 0 < split < len(conversation) - 1 and conversation[split].get("role") != "user":
+            split += 1
+        return split
+
+    def _trim_summary(self, summary):
+        lines = summary.split("\n")
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > self.summary_token_budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def _summary(self, session_key, folded):
+        cached = None
+        if session_key is not None:
+            with self._lock:
+                cached = self._summaries.get(session_key)
+
+        # نكمل من الملخص المحفوظ إذا كانت الرسائل المطوية سابقاً ما زالت هي نفسها
+        if cached and cached[0] <= len(folded) and cached[1] == _fingerprint(folded[cached[0] - 1]):
+            folded_count, _, summary = cached
+            if folded_count == len(folded):
+                return summary
+            summary = self.summarizer(summary, folded[folded_count:])
+        else:
+            summary = self.summarizer("", folded)
+        summary = self._trim_summary(summary)
+
+        if session_key is not None:
+            with self._lock:
+                self._summaries[session_key] = (len(folded), _fingerprint(folded[-1]), summary)
+                self._summaries.move_to_end(session_key)
+                while len(self._summaries) > self.max_summaries:
+                    self._summaries.popitem(last=False)
+        return summary
+
+    def compact(self, session_key, messages):
+        """
+        رسائل الطلب بعد الضغط
+
+        Args:
+            session_key: معرّف الجلسة لحفظ الملخص (أو None بدون حفظ)
+            messages: كل الرسائل، وتبدأ برسائل system
+
+        Returns:
+            رسائل system الأصلية، ثم ملخص الأدوار القديمة (إن وُجد)، ثم آخر الأدوار
+        """
+        head = 0
+        while head < len(messages) and messages[head].get("role") == "system":
+            head += 1
+        system_messages = list(messages[:head])
+        conversation = list(messages[head:])
+
+        split = self._split_point(conversation)
+        if split == 0:
+            return system_messages + conversation
+
+        summary = self._summary(session_key, conversation[:split])
+        summary_message = {"role": "system", "content": f"ملخص الجزء الأقدم من المحادثة:\n{summary}"}
+        return system_messages + [summary_message] + conversation[split:]
@@ -0,0 +1,139 @@
+"""
+تجهيز الصور المرسلة للشات بوت قبل إرسالها للنموذج
+فك data URL، اكتشاف الصيغة الحقيقية، تصغير الأبعاد وإعادة الضغط ضمن حجم محدد،
+وحفظ وصف النموذج لكل صورة حسب بصمة محتواها حتى لا تُحلَّل نفس الصورة مرتين
+
+Pillow اختياري: بدونه تُرسل الصورة كما هي لكن بنوعها الصحيح
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import os
+import threading
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# أطول ضلع للصورة بعد التصغير (بالبكسل)
+MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", 1024))
+# الحجم الأقصى للصورة بعد الضغط (بالبايت)
+MAX_BYTES = int(float(os.getenv("IMAGE_MAX_KB", 300)) * 1024)
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 85))
+# مجلد أوصاف الصور المحفوظة وحجمه الأقصى
+CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(BASE_DIR, ".cache", "image_descriptions"))
+CACHE_MAX_BYTES = int(float(os.getenv("IMAGE_CACHE_MB", 16)) * 1024 * 1024)
+
+# التواقيع الأولى لكل صيغة تقبلها OpenAI
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+_description_cache = None
+_description_cache_lock = threading.Lock()
+
+
+def detect_mime_type(data):
+    """نوع الصورة من أول البايتات، أو None إذا كانت الصيغة غير معروفة"""
+    for signature, mime_type in _SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def decode_image_data(image_data):
+    """بايتات الصورة من data URL أو base64 مجرد"""
+    if image_data.startswith("data:"):
+        image_data = image_data.split(",", 1)[1]
+    try:
+        return base64.b64decode(image_data, validate=False)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid image data")
+
+
+def _data_url(mime_type, data):
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def _recompress(data, max_side, max_bytes, quality):
+    """تصغير الصورة وإعادة ضغطها JPEG، مع خفض الجودة تدريجياً حتى تصبح ضمن max_bytes"""
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side))
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    while True:
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+        if output.tell() <= max_bytes or quality <= 40:
+            return output.getvalue()
+        quality -= 15
+
+
+class ImageInput:
+    """
+    صورة مرسلة من المستخدم (data URL أو base64 أو رابط http(s))
+    البصمة تُحسب فوراً للبحث في الذاكرة، والتصغير يتم فقط عند طلب to_url()
+
+    Raises:
+        ValueError: إذا لم تكن البيانات صورة بصيغة معروفة
+    """
+
+    def __init__(self, image_data):
+        if image_data.startswith(("http://", "https://")):
+            self.data = None
+            self.mime_type = None
+            self.digest = hashlib.sha256(image_data.encode("utf-8")).hexdigest()
+            self._url = image_data
+            return
+        self.data = decode_image_data(image_data)
+        self.mime_type = detect_mime_type(self.data)
+        if self.mime_type is None:
+            raise ValueError("Unsupported image format")
+        self.digest = hashlib.sha256(self.data).hexdigest()
+        self._url = None
+
+    def to_url(self, max_side=MAX_SIDE, max_bytes=MAX_BYTES, quality=JPEG_QUALITY):
+        """data URL بعد التصغير وإعادة الضغط (أو الرابط كما هو)"""
+        if self._url is not None:
+            return self._url
+        data, mime_type = self.data, self.mime_type
+        if Image is not None:
+            try:
+                with Image.open(io.BytesIO(data)) as image:
+                    width, height = image.size
+                    animated = getattr(image, "is_animated", False)
+                # الصور الصغيرة والمتحركة تُرسل كما هي
+                if not animated and (len(data) > max_bytes or max(width, height) > max_side):
+                    data = _recompress(data, max_side, max_bytes, quality)
+                    mime_type = "image/jpeg"
+            except (OSError, ValueError, Image.DecompressionBombError):
+                raise ValueError("Invalid image data")
+        return _data_url(mime_type, data)
+
+
+def get_description_cache():
+    """ذاكرة أوصاف الصور على القرص (تُنشأ عند أول صورة)؛ مشتركة بين كل عمليات العمال"""
+    global _description_cache
+    if _description_cache is None:
+        with _description_cache_lock:
+            if _description_cache is None:
+                from website_fetcher import PageCache
+                _description_cache = PageCache(CACHE_DIR, CACHE_MAX_BYTES)
+    return _description_cache
@@ -0,0 +1,243 @@
+"""
+مصنف نوايا محلي للرد على التحيات والأسئلة الشائعة دون استدعاء النموذج
+Naive Bayes على الكلمات ومقاطع الحروف، يُدرَّب من الكلمات المفتاحية في قاعدة المعرفة
+ومن أمثلة مستخرجة من المحادثات المسجلة (intent_examples.json)، ويُعاد تدريبه عند تغيّر قاعدة المعرفة
+
+الرسالة تُجاب من الرد المحفوظ للفئة فقط إذا كانت قصيرة، واحتمال الفئة عالياً،
+وكل كلماتها تقريباً معروفة لتلك الفئة؛ غير ذلك تذهب للنموذج كالمعتاد
+
+بناء الأمثلة من المحادثات (ملف JSONL من mongoexport لـ ChatbotConversation):
+    python -m intent_classifier conversations.jsonl --output intent_examples.json
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import threading
+
+from arabic_text import normalize_text, tokenize
+from keyword_matcher import KeywordMatcher
+from knowledge_store import CONVERSATIONAL_CATEGORIES
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES_FILE = os.getenv("AAU_INTENT_EXAMPLES", os.path.join(BASE_DIR, "intent_examples.json"))
+
+ENABLED = os.getenv("INTENT_FAST_PATH", "1") != "0"
+# الفئات التي تُجاب من الرد المحفوظ مباشرة
+FAST_PATH_INTENTS = tuple(
+    intent.strip()
+    for intent in os.getenv("INTENT_FAST_PATH_INTENTS", "greetings,thanks,contact,location").split(",")
+    if intent.strip()
+)
+# فئات يمكن الرد عليها في أي وقت من المحادثة؛ الباقي في أول رسالة فقط
+CONVERSATIONAL_INTENTS = CONVERSATIONAL_CATEGORIES
+# أقل احتمال للفئة، وأقل نسبة من كلمات الرسالة المعروفة للفئة
+MIN_PROBABILITY = float(os.getenv("INTENT_MIN_PROBABILITY", 0.85))
+MIN_COVERAGE = float(os.getenv("INTENT_MIN_COVERAGE", 0.75))
+# الرسائل الأطول من هذا العدد من الكلمات تذهب دائماً للنموذج
+MAX_WORDS = int(os.getenv("INTENT_MAX_WORDS", 6))
+
+# فئة الرسائل التي تحتاج النموذج (من المحادثات المسجلة)
+OTHER = "other"
+# كلمات لا تغيّر نية الرسالة، فلا تُحسب ضد تغطية الفئة
+NEUTRAL_TOKENS = frozenset({
+    "جامعه", "عمان", "عربيه", "tec", "aau", "بوت", "كم", "شو", "ايش", "وش", "كيف", "ممكن",
+    "بدي", "اريد", "ابغي", "لو", "سمحت", "رجاء", "حضرتك", "اخي", "استاذ", "please", "your", "university",
+})
+SMOOTHING = 0.5
+NGRAM = 3
+
+_REPEATED = re.compile(r"(.)\1{2,}")
+
+
+def _words(text):
+    # "هلااا" و "شكرااا" تُعامل مثل "هلا" و "شكرا"
+    return tokenize(_REPEATED.sub(r"\1", normalize_text(text)))
+
+
+def features(words):
+    """الكلمات ومقاطع من ثلاثة أحرف من كل كلمة (لتحمّل الأخطاء الإملائية والتصريف)"""
+    result = [f"w:{word}" for word in words]
+    for word in words:
+        padded = f" {word} "
+        result.extend(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+    return result
+
+
+class IntentClassifier:
+    """Naive Bayes متعدد الحدود"""
+
+    def __init__(self, examples):
+        """
+        Args:
+            examples: قائمة من (النص، الفئة)
+        """
+        counts = {}
+        totals = {}
+        documents = {}
+        self._vocabulary = {}
+        all_features = set()
+        for text, label in examples:
+            words = _words(text)
+            if not words:
+                continue
+            label_counts = counts.setdefault(label, {})
+            example_features = features(words)
+            for feature in example_features:
+                label_counts[feature] = label_counts.get(feature, 0) + 1
+            all_features.update(example_features)
+            totals[label] = totals.get(label, 0) + len(example_features)
+            documents[label] = documents.get(label, 0) + 1
+            self._vocabulary.setdefault(label, set()).update(words)
+
+        # احتمالات لوغاريتمية محسوبة مسبقاً، فالتصنيف مجرد بحث في قواميس
+        self.labels = list(counts)
+        feature_count = len(all_features) or 1
+        document_count = sum(documents.values()) or 1
+        self._log_priors = {}
+        self._log_probabilities = {}
+        self._log_unseen = {}
+        for label in self.labels:
+            denominator = math.log(totals[label] + SMOOTHING * feature_count)
+            self._log_priors[label] = math.log(documents[label] / document_count)
+            self._log_probabilities[label] = {
+                feature: math.log(count + SMOOTHING) - denominator
+                for feature, count in counts[label].items()
+            }
+            self._log_unseen[label] = math.log(SMOOTHING) - denominator
+
+    def predict(self, text):
+        """
+        Returns:
+            (الفئة، احتمالها، نسبة كلمات الرسالة المعروفة للفئة)، أو (None, 0, 0) لرسالة بلا كلمات
+        """
+        words = _words(text)
+        if not words or not self.labels:
+            return None, 0.0, 0.0
+        message_features = features(words)
+        scores = {}
+        for label in self.labels:
+            log_probabilities = self._log_probabilities[label]
+            unseen = self._log_unseen[label]
+            scores[label] = self._log_priors[label] + sum(
+                log_probabilities.get(feature, unseen) for feature in message_features
+            )
+        best = max(scores, key=scores.get)
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        vocabulary = self._vocabulary[best]
+        significant = [word for word in words if word not in NEUTRAL_TOKENS]
+        if not significant:
+            coverage = 0.0
+        else:
+            coverage = sum(word in vocabulary for word in significant) / len(significant)
+        return best, 1.0 / total, coverage
+
+
+def training_examples(entries):
+    """كل كلمة مفتاحية مثال لفئتها"""
+    return [
+        (keyword, category)
+        for category, entry in entries.items()
+        for keyword in entry.get("keywords", [])
+    ]
+
+
+def load_examples(path=EXAMPLES_FILE):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [tuple(example) for example in json.load(f)["examples"]]
+
+
+def examples_from_conversations(path, entries, matcher):
+    """
+    أمثلة من المحادثات المسجلة:
+    - رد البوت مطابق للرد المحفوظ لفئة (نظام الكلمات المفتاحية السابق) ← تلك الفئة
+    - رد آخر ولا توجد أي كلمة مفتاحية في الرسالة ← OTHER
+    """
+    responses = {entry["info"].strip(): category for category, entry in entries.items() if entry.get("info")}
+    examples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            message = record.get("userMessage") or record.get("message")
+            if not message:
+                continue
+            category = responses.get((record.get("botResponse") or "").strip())
+            if category is not None:
+                examples.append((message, category))
+            elif not matcher.match_counts(message):
+                examples.append((message, OTHER))
+    return examples
+
+
+class IntentRouter:
+    """يجيب الرسائل الواضحة من الرد المحفوظ لفئتها؛ يُعاد التدريب عند تغيّر إصدار قاعدة المعرفة"""
+
+    def __init__(self, store, examples_path=EXAMPLES_FILE, intents=FAST_PATH_INTENTS, enabled=ENABLED,
+                 min_probability=MIN_PROBABILITY, min_coverage=MIN_COVERAGE, max_words=MAX_WORDS):
+        self.store = store
+        self.examples = load_examples(examples_path)
+        self.intents = set(intents)
+        self.enabled = enabled
+        self.min_probability = min_probability
+        self.min_coverage = min_coverage
+        self.max_words = max_words
+        self._lock = threading.Lock()
+        self._model = (None, None, None)
+
+    def _current(self):
+        snapshot = self.store.snapshot()
+        version, classifier, entries = self._model
+        if version != snapshot.version:
+            with self._lock:
+                if self._model[0] != snapshot.version:
+                    classifier = IntentClassifier(training_examples(snapshot.entries) + self.examples)
+                    self._model = (snapshot.version, classifier, snapshot.entries)
+                version, classifier, entries = self._model
+        return classifier, entries
+
+    def route(self, message, has_history=False):
+        """
+        Returns:
+            (الفئة، الرد المحفوظ) إذا أمكن الرد دون النموذج، وإلا None
+        """
+        if not self.enabled or not message or len(message.split()) > self.max_words:
+            return None
+        classifier, entries = self._current()
+        intent, probability, coverage = classifier.predict(message)
+        if intent not in self.intents or intent not in entries:
+            return None
+        if has_history and intent not in CONVERSATIONAL_INTENTS:
+            return None
+        if probability < self.min_probability or coverage < self.min_coverage:
+            return None
+        return intent, entries[intent]["info"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build intent examples from logged conversations")
+    parser.add_argument("conversations", help="JSONL export of ChatbotConversation")
+    parser.add_argument("--output", default=EXAMPLES_FILE)
+    args = parser.parse_args()
+
+    from knowledge_store import get_store
+    snapshot = get_store().snapshot()
+    # مطابق بكل الفئات، فمطابق الاسترجاع لا يشمل التحيات والشكر
+    matcher = KeywordMatcher.from_knowledge_base(snapshot.entries)
+    examples = examples_from_conversations(args.conversations, snapshot.entries, matcher)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"examples": examples}, f, ensure_ascii=False, indent=1)
+    labels = {}
+    for _, label in examples:
+        labels[label] = labels.get(label, 0) + 1
+    print(f"{len(examples)} examples written to {args.output}: {labels}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+مطابقة الكلمات المفتاحية باستخدام خوارزمية Aho-Corasick
+تُبنى الآلة مرة واحدة عند التحميل، ثم تجد كل الكلمات المفتاحية في مرور واحد على النص.
+المطابقة على الكلمات بعد التطبيع (arabic_text.tokenize) لا على الحروف،
+فلا تطابق "hi" داخل "which" ولا "طلب" داخل "طلاب"، وتطابق "رسوم" في "الرسوم"
+"""
+
+from collections import deque
+
+from arabic_text import tokenize
+
+
+class KeywordMatcher:
+    """آلة Aho-Corasick لكلمات مفتاحية مرتبطة بفئات قاعدة المعرفة"""
+
+    def __init__(self, keyword_map):
+        """
+        Args:
+            keyword_map: قاموس {الفئة: [الكلمات المفتاحية]} بترتيب الفئات المطلوب
+        """
+        self.categories = list(keyword_map.keys())
+        self._category_order = {category: i for i, category in enumerate(self.categories)}
+        # كل مدخل هو (الفئة، الكلمة المفتاحية)، ويُعرّف برقمه في هذه القائمة
+        self._entries = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for category, keywords in keyword_map.items():
+            for keyword in keywords:
+                tokens = tokenize(keyword) if keyword else []
+                if tokens:
+                    self._add(len(self._entries), tokens)
+                    self._entries.append((category, keyword, len(tokens)))
+
+        self._build_failure_links()
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base):
+        """بناء الآلة من قاعدة معرفة بصيغة {الفئة: {"keywords": [...], ...}}"""
+        return cls({
+            category: data.get("keywords", [])
+            for category, data in knowledge_base.items()
+        })
+
+    def _add(self, entry_id, tokens):
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][token] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(entry_id)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _scan(self, text):
+        """يولّد (رقم آخر كلمة، رقم المدخل) لكل تطابق في كلمات النص"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        node = 0
+        for position, token in enumerate(tokenize(text)):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for entry_id in output[node]:
+                yield position, entry_id
+
+    def find_all(self, text):
+        """
+        إيجاد كل الكلمات المفتاحية في النص
+
+        Returns:
+            قائمة من (البداية، النهاية، الفئة، الكلمة المفتاحية) مرتبة حسب موضع النهاية،
+            والمواضع أرقام كلمات النص بعد التقطيع
+        """
+        matches = []
+        for end, entry_id in self._scan(text):
+            category, keyword, length = self._entries[entry_id]
+            matches.append((end - length + 1, end + 1, category, keyword))
+        return matches
+
+    def match_counts(self, text):
+        """
+        عدد الكلمات المفتاحية المختلفة الموجودة في النص لكل فئة
+
+        Returns:
+            قاموس {الفئة: العدد} للفئات المطابقة فقط، بنفس ترتيب الفئات الأصلي
+        """
+        seen = set()
+        for _, entry_id in self._scan(text):
+            seen.add(entry_id)
+
+        counts = {}
+        for entry_id in sorted(seen):
+            category = self._entries[entry_id][0]
+            counts[category] = counts.get(category, 0) + 1
+        return dict(sorted(counts.items(), key=lambda item: self._category_order[item[0]]))
@@ -0,0 +1,236 @@
+"""
+مخزن موحّد لقاعدة معرفة جامعة عمان العربية
+يحمّل chatbot-knowledge.json (وملفات إضافية اختيارية)، ويبني الفهارس مرة واحدة،
+ويستبدلها تلقائياً عند تعديل الملفات دون إعادة تشغيل العملية
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from arabic_text import normalize_text
+from keyword_matcher import KeywordMatcher
+from bm25_index import BM25Index
+from site_index import SITE_INDEX_FILE, SiteIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KNOWLEDGE_FILE = os.path.join(BASE_DIR, "chatbot-knowledge.json")
+EXTRA_KNOWLEDGE_FILE = os.path.join(BASE_DIR, "chatbot-knowledge-extra.json")
+
+# أقل فترة (بالثواني) بين فحص تواريخ تعديل الملفات
+CHECK_INTERVAL = 2.0
+
+# وضع "استرجاع ثم توليد": البحث محلياً قبل أول استدعاء للنموذج بدلاً من انتظار استدعاء الأداة
+PREFETCH_RETRIEVAL = os.getenv("AAU_PREFETCH_RETRIEVAL", "1") != "0"
+
+# طريقة الاسترجاع: lexical (كلمات مفتاحية + BM25)، semantic (متجهات محلية)، أو hybrid
+RETRIEVAL_BACKEND = os.getenv("AAU_RETRIEVAL_BACKEND", "lexical")
+
+# فئات الردود المحادثية (تحية، شكر): لا تُسترجع كمعلومات، وتبقى في entries لمصنف النوايا فقط
+CONVERSATIONAL_CATEGORIES = ("greetings", "thanks")
+
+# اسم الجامعة نفسه لا يدل على موضوع السؤال ("عمان" كلمة مفتاحية لفئة الموقع)
+_UNIVERSITY_NAME = re.compile(r"(?:جامعه\s+)?عمان\s+(?:ال)?عربيه|amman\s+arab(?:\s+university)?|\baau\b")
+
+
+def default_paths():
+    """الملف الرئيسي ثم الملفات الإضافية من AAU_KNOWLEDGE_EXTRA_FILES (مفصولة بـ os.pathsep)"""
+    extra = os.getenv("AAU_KNOWLEDGE_EXTRA_FILES")
+    extra_paths = extra.split(os.pathsep) if extra else [EXTRA_KNOWLEDGE_FILE]
+    return [os.getenv("AAU_KNOWLEDGE_FILE", KNOWLEDGE_FILE)] + [p for p in extra_paths if p]
+
+
+class KnowledgeSnapshot:
+    """نسخة ثابتة من قاعدة المعرفة مع فهارسها المبنية مسبقاً"""
+
+    def __init__(self, entries, default_response=None, version="", backend=RETRIEVAL_BACKEND,
+                 site_index=None):
+        """
+        Args:
+            entries: قاموس {الفئة: {"keywords": [...], "info": نص}}
+            default_response: الرد الافتراضي عند عدم وجود نتيجة
+            version: بصمة محتوى الملفات
+            backend: طريقة الاسترجاع (lexical أو semantic أو hybrid)
+            site_index: فهرس صفحات الموقع المبني مسبقاً (اختياري)
+        """
+        self.entries = entries
+        self.site_index = site_index
+        self.default_response = default_response
+        self.version = version
+        self.retrieval_entries = {
+            category: entry for category, entry in entries.items() if category not in CONVERSATIONAL_CATEGORIES
+        }
+        self.matcher = KeywordMatcher.from_knowledge_base(self.retrieval_entries)
+        self.index = BM25Index.from_knowledge_base(self.retrieval_entries)
+        self.backend = backend
+        self.semantic_index = None
+        if backend in ("semantic", "hybrid"):
+            try:
+                from semantic_index import SemanticIndex
+            except ImportError:
+                sys.stderr.write(f"numpy is not installed, falling back to lexical retrieval instead of {backend}\n")
+                self.backend = "lexical"
+            else:
+                self.semantic_index = SemanticIndex.from_knowledge_base(self.retrieval_entries)
+
+    def search(self, query, top_k=3):
+        """
+        البحث في قاعدة المعرفة حسب طريقة الاسترجاع المختارة،
+        ثم في مقاطع فهرس الموقع إذا كانت النتائج أقل من top_k
+
+        Returns:
+            قائمة من (الفئة أو رابط الصفحة، النص)
+        """
+        if self.backend == "semantic":
+            ranked = [category for category, _ in self.semantic_index.search(query, top_k=top_k)]
+        else:
+            ranked = self.lexical_search(query, top_k)
+            if self.backend == "hybrid" and len(ranked) < top_k:
+                for category, _ in self.semantic_index.search(query, top_k=top_k):
+                    if category not in ranked:
+                        ranked.append(category)
+        results = [(category, self.entries[category]["info"]) for category in ranked[:top_k]]
+        if self.site_index is not None and len(results) < top_k:
+            results += self.site_index.search(query, top_k=top_k - len(results))
+        return results
+
+    def lexical_search(self, query, top_k=3):
+        """
+        الفئات ذات الكلمات المفتاحية المطابقة حرفياً أولاً (حسب عدد الكلمات ثم درجة BM25)،
+        ثم نتائج BM25 للنص المطبّع التي تتجاوز حد الدرجة
+
+        Returns:
+            قائمة بأسماء الفئات
+        """
+        query = _UNIVERSITY_NAME.sub(" ", normalize_text(query))
+        bm25_scores = dict(self.index.search(query, top_k=len(self.retrieval_entries), min_score=0.0))
+        keyword_hits = self.matcher.match_counts(query)
+        ranked = sorted(
+            keyword_hits,
+            key=lambda category: (-keyword_hits[category], -bm25_scores.get(category, 0.0)),
+        )
+        for category, _ in self.index.search(query, top_k=top_k):
+            if category not in keyword_hits:
+                ranked.append(category)
+        return ranked[:top_k]
+
+
+def _load_file(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    return raw, json.loads(raw.decode("utf-8"))
+
+
+def build_snapshot(paths, site_index_path=None):
+    """قراءة الملفات وبناء نسخة جديدة؛ الفئات في الملفات اللاحقة تستبدل السابقة"""
+    entries = {}
+    default_response = None
+    digest = hashlib.sha1()
+    for path in paths:
+        if path != paths[0] and not os.path.exists(path):
+            continue
+        raw, data = _load_file(path)
+        digest.update(raw)
+        for category, entry in data.items():
+            text = entry.get("info") or entry.get("response") or ""
+            if category == "default":
+                default_response = text
+                continue
+            entries[category] = {"keywords": list(entry.get("keywords", [])), "info": text}
+
+    site_index = None
+    if site_index_path and os.path.exists(site_index_path):
+        # الفهرس يُفتح عبر mmap ولا يُقرأ؛ بصمته محفوظة في ترويسته
+        site_index = SiteIndex(site_index_path)
+        digest.update(site_index.digest.encode("ascii"))
+    return KnowledgeSnapshot(entries, default_response, digest.hexdigest()[:12], site_index=site_index)
+
+
+class KnowledgeStore:
+    """يحتفظ بآخر نسخة من قاعدة المعرفة ويعيد بناءها عند تغيّر تاريخ تعديل الملفات"""
+
+    def __init__(self, paths=None, check_interval=CHECK_INTERVAL, site_index_path=SITE_INDEX_FILE):
+        self.paths = list(paths or default_paths())
+        self.site_index_path = site_index_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtimes = self._current_mtimes()
+        self._snapshot = build_snapshot(self.paths, site_index_path)
+        self._next_check = time.monotonic() + check_interval
+
+    def _current_mtimes(self):
+        mtimes = []
+        for path in self.paths + [self.site_index_path]:
+            if path is None:
+                continue
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def snapshot(self):
+        """النسخة الحالية، بعد إعادة التحميل إذا تغيّرت الملفات"""
+        if time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._snapshot
+
+    def reload_if_changed(self):
+        """إعادة بناء الفهارس إذا تغيّر أي ملف؛ تبقى النسخة القديمة إذا فشل التحميل"""
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            mtimes = self._current_mtimes()
+            if mtimes == self._mtimes:
+                return False
+            try:
+                snapshot = build_snapshot(self.paths, self.site_index_path)
+            except (OSError, ValueError) as e:
+                # التواريخ لا تُحفظ، فيُعاد المحاولة في الفحص التالي (ملف ما زال يُكتب مثلاً)
+                sys.stderr.write(f"Knowledge reload failed, keeping version {self._snapshot.version}: {e}\n")
+                return False
+            # استبدال ذري: القرّاء يرون النسخة القديمة أو الجديدة كاملة
+            self._snapshot = snapshot
+            self._mtimes = mtimes
+            return True
+
+    @property
+    def version(self):
+        return self.snapshot().version
+
+    def search(self, query, top_k=3):
+        return self.snapshot().search(query, top_k=top_k)
+
+
+def with_knowledge_context(messages, results):
+    """
+    نسخة من الرسائل مع رسالة system تحمل نتائج البحث قبل رسالة المستخدم الأخيرة،
+    دون تعديل سجل المحادثة نفسه
+    """
+    context = "معلومات من قاعدة معرفة جامعة عمان العربية ذات صلة بسؤال المستخدم:\n\n"
+    context += "\n\n".join(info for _, info in results)
+    return list(messages[:-1]) + [{"role": "system", "content": context}] + list(messages[-1:])
+
+
+def knowledge_only_answer(results):
+    """إجابة من نتائج البحث مباشرة دون النموذج (عند انتهاء مهلة الطلب أو تعذر الوصول لـ OpenAI)"""
+    if not results:
+        return "عذراً، تأخر الرد على سؤالك. يرجى المحاولة مرة أخرى أو التواصل مع الجامعة على: 0798877440"
+    return "إليك المعلومات المتوفرة حول سؤالك:\n\n" + "\n\n".join(info for _, info in results[:2])
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_store():
+    """المخزن المشترك للعملية"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = KnowledgeStore()
+    return _default_store
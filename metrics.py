@@ -0,0 +1,225 @@
+"""
+مقاييس مسار المحادثة
+زمن كل مرحلة (الاسترجاع، استدعاءات النموذج، تنفيذ الأدوات، التسلسل)، وعدد الـ tokens من كل استدعاء،
+ونسب إصابة الذاكرة المؤقتة والاسترجاع، بصيغة Prometheus النصية (بدون مكتبات إضافية)
+وكملخص لكل طلب (RequestTrace.stats)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# حدود الـ histogram بالثواني
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # {labels: [عدادات الحدود..., المجموع، العدد]}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state):
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', '+Inf')])} {state[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {state[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    """المقاييس المسجلة، مع مصادر إحصاءات تُقرأ عند كل طلب لـ /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+        self._stats_sources = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix, help, stats_function, gauges=()):
+        """
+        تصدير قاموس أرقام (مثل ANSWER_CACHE.stats) كمقاييس باسم prefix_المفتاح:
+        المفاتيح في gauges قيم حالية (الحجم، العدد الجاري)، والباقي عدادات تراكمية
+        تُصدَّر كـ counter باسم prefix_المفتاح_total حتى يعمل rate()؛
+        القواميس الداخلية تصبح label باسم key
+        """
+        self._stats_sources.append((prefix, help, stats_function, frozenset(gauges)))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, help, stats_function, gauges in self._stats_sources:
+            for key, value in stats_function().items():
+                if key in gauges:
+                    name, kind = f"{prefix}_{key}", "gauge"
+                else:
+                    name, kind = f"{prefix}_{key}_total", "counter"
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                if isinstance(value, dict):
+                    for label, number in sorted(value.items()):
+                        lines.append(f'{name}{{key="{_escape(label)}"}} {number}')
+                else:
+                    lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "tec_chat_stage_seconds", "Time spent in each stage of a chat request", ("stage",)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "tec_chat_request_seconds", "Total time of a chat request", ("endpoint",)
+)
+TOKENS = REGISTRY.counter(
+    "tec_chat_tokens_total", "Tokens reported by OpenAI completions", ("stage", "type")
+)
+RETRIEVAL = REGISTRY.counter(
+    "tec_retrieval_total", "Knowledge retrievals by source and whether they found results", ("source", "result")
+)
+ANSWER_CACHE_LOOKUPS = REGISTRY.counter(
+    "tec_answer_cache_lookups_total", "Answer cache lookups by result (hit, miss, skip)", ("result",)
+)
+OPENAI_CALLS = REGISTRY.counter(
+    "tec_openai_calls_total",
+    "OpenAI completion attempts by outcome (success, retry, hedged, hedge_won, error, exhausted, deadline_exceeded)",
+    ("outcome",)
+)
+INTENT_ANSWERS = REGISTRY.counter(
+    "tec_intent_answers_total", "Messages answered by the local intent classifier without the model", ("intent",)
+)
+DEGRADED_ANSWERS = REGISTRY.counter(
+    "tec_degraded_answers_total", "Answers served from the knowledge base without the model", ("endpoint",)
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def record_retrieval(source, found):
+    RETRIEVAL.inc((source, "hit" if found else "miss"))
+
+
+class RequestTrace:
+    """مقاييس طلب واحد؛ تُضاف أيضاً للمقاييس العامة"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.cache = None
+        self.coalesced = False
+        self.degraded = False
+        self.intent = None
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            STAGE_SECONDS.observe((name,), elapsed)
+
+    def record_usage(self, stage, response):
+        """tokens من استجابة completion (إن وُجد usage)"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        for kind in ("prompt", "completion"):
+            count = getattr(usage, f"{kind}_tokens", 0) or 0
+            self.tokens[kind] += count
+            TOKENS.inc((stage, kind), count)
+
+    def record_cache(self, key, answer):
+        """نتيجة البحث في ذاكرة الإجابات: hit أو miss أو skip (سؤال غير قابل للتخزين)"""
+        self.cache = "skip" if key is None else ("hit" if answer is not None else "miss")
+        ANSWER_CACHE_LOOKUPS.inc((self.cache,))
+
+    def record_coalesced(self, coalesced):
+        """True إذا أُخذت الإجابة من طلب مطابق جارٍ (single-flight)"""
+        self.coalesced = coalesced
+
+    def record_intent(self, intent):
+        """الرسالة أُجيبت من الرد المحفوظ لفئتها دون النموذج"""
+        self.intent = intent
+        INTENT_ANSWERS.inc((intent,))
+
+    def record_degraded(self):
+        """الإجابة من قاعدة المعرفة مباشرة بسبب انتهاء المهلة أو تعذر الوصول للنموذج"""
+        self.degraded = True
+        DEGRADED_ANSWERS.inc((self.endpoint,))
+
+    def finish(self):
+        """تسجيل الزمن الكلي وإرجاع ملخص الطلب"""
+        total = time.perf_counter() - self.started
+        REQUEST_SECONDS.observe((self.endpoint,), total)
+        return {
+            "total_ms": round(total * 1000, 2),
+            "stages_ms": {name: round(value * 1000, 2) for name, value in self.stages.items()},
+            "tokens": dict(self.tokens),
+            "cache": self.cache,
+            "coalesced": self.coalesced,
+            "degraded": self.degraded,
+            "intent": self.intent,
+        }
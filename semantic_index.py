@@ -0,0 +1,141 @@
+"""
+استرجاع دلالي محلي بدون أي خدمة خارجية
+يمثّل النصوص بمتجهات TF-IDF لمقاطع الحروف (character n-grams) مجمّعة بالـ hashing،
+ويخزّنها في مصفوفة float32 متصلة، ويحسب التشابه بضرب مصفوفة في متجه واحد
+"""
+
+import zlib
+
+import numpy as np
+
+from arabic_text import normalize_text, tokenize
+
+# عدد أبعاد المتجه بعد الـ hashing
+DIMENSIONS = 1024
+# أطوال مقاطع الحروف
+NGRAM_RANGE = (2, 4)
+# أقل تشابه جيب تمام لاعتبار النتيجة ذات صلة
+MIN_SIMILARITY = 0.25
+# الحد الأقصى لعدد الكلمات المحفوظة مقاطعها مسبقاً
+BUCKET_CACHE_SIZE = 50000
+
+
+class HashedNgramVectorizer:
+    """تحويل النص إلى متجه TF-IDF لمقاطع الحروف داخل كل كلمة"""
+
+    def __init__(self, dimensions=DIMENSIONS, ngram_range=NGRAM_RANGE):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+        self.idf = np.ones(dimensions, dtype=np.float32)
+        self._bucket_cache = {}
+
+    def _buckets(self, text):
+        buckets = []
+        low, high = self.ngram_range
+        for token in tokenize(text):
+            cached = self._bucket_cache.get(token)
+            if cached is None:
+                padded = f" {token} "
+                cached = [
+                    zlib.crc32(padded[i:i + n].encode("utf-8")) % self.dimensions
+                    for n in range(low, high + 1)
+                    for i in range(max(1, len(padded) - n + 1))
+                ]
+                if len(self._bucket_cache) < BUCKET_CACHE_SIZE:
+                    self._bucket_cache[token] = cached
+            buckets.extend(cached)
+        return buckets
+
+    def fit(self, texts):
+        """حساب أوزان IDF من مجموعة النصوص"""
+        document_frequency = np.zeros(self.dimensions, dtype=np.float32)
+        for text in texts:
+            document_frequency[np.unique(np.asarray(self._buckets(text), dtype=np.int64))] += 1
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def transform(self, texts):
+        """مصفوفة (عدد النصوص × الأبعاد) من المتجهات المطبّعة (L2)"""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets = self._buckets(text)
+            if buckets:
+                np.add.at(matrix[row], buckets, 1.0)
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+
+
+class SemanticIndex:
+    """مصفوفة متجهات للمقاطع النصية، مع التشابه الأعلى لكل مستند"""
+
+    def __init__(self, documents, dimensions=DIMENSIONS, ngram_range=NGRAM_RANGE):
+        """
+        Args:
+            documents: قائمة من (معرّف المستند، قائمة المقاطع النصية)
+        """
+        self.doc_ids = []
+        texts = []
+        offsets = []
+        for doc_id, passages in documents:
+            passages = [p for p in passages if normalize_text(p).strip()]
+            if not passages:
+                continue
+            self.doc_ids.append(doc_id)
+            offsets.append(len(texts))
+            texts.extend(passages)
+
+        self.vectorizer = HashedNgramVectorizer(dimensions, ngram_range).fit(texts)
+        self.matrix = np.ascontiguousarray(self.vectorizer.transform(texts))
+        # بداية صفوف كل مستند، لاستخراج أعلى تشابه لكل مستند بعملية واحدة
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base, split_lines=False, **kwargs):
+        """
+        بناء الفهرس من الكلمات المفتاحية ونص "info" أو "response" لكل فئة
+
+        Args:
+            split_lines: متجه لكل سطر بدلاً من متجه واحد لكل فئة (أدق، لكن صفوف أكثر)
+        """
+        documents = []
+        for category, data in knowledge_base.items():
+            keywords = " ".join(data.get("keywords", []))
+            text = data.get("info") or data.get("response") or ""
+            passages = [keywords] + text.split("\n") if split_lines else [keywords + "\n" + text]
+            documents.append((category, passages))
+        return cls(documents, **kwargs)
+
+    def _rank(self, row_scores, top_k, min_similarity):
+        doc_scores = np.maximum.reduceat(row_scores, self._offsets)
+        if top_k < len(doc_scores):
+            candidates = np.argpartition(-doc_scores, top_k)[:top_k]
+        else:
+            candidates = np.arange(len(doc_scores))
+        candidates = candidates[np.argsort(-doc_scores[candidates], kind="stable")]
+        return [
+            (self.doc_ids[i], float(doc_scores[i]))
+            for i in candidates
+            if doc_scores[i] >= min_similarity
+        ]
+
+    def search(self, query, top_k=3, min_similarity=MIN_SIMILARITY):
+        """
+        أفضل النتائج لاستعلام واحد
+
+        Returns:
+            قائمة من (معرّف المستند، التشابه) مرتبة تنازلياً
+        """
+        if not self.doc_ids:
+            return []
+        query_vector = self.vectorizer.transform([query])[0]
+        return self._rank(self.matrix @ query_vector, top_k, min_similarity)
+
+    def search_batch(self, queries, top_k=3, min_similarity=MIN_SIMILARITY):
+        """أفضل النتائج لعدة استعلامات بضرب مصفوفتين واحد"""
+        if not self.doc_ids:
+            return [[] for _ in queries]
+        scores = self.vectorizer.transform(list(queries)) @ self.matrix.T
+        return [self._rank(row, top_k, min_similarity) for row in scores]
@@ -1229,6 +1229,148 @@ app.put('/api/chatbot/settings', async (req, res) => {
 const { spawn } = require('child_process');
 const chatSessions = new Map();
 
+const AI_AGENT_FALLBACK_RESPONSE = 'عذراً، أنا غير قادر على الإجابة في الوقت الحالي. يرجى الاتصال بالجامعة على الرقم 0798877440 للمساعدة.';
+
+// Restart delay for a crashed worker doubles after each quick crash, up to the max;
+// after AI_AGENT_MAX_RESTARTS consecutive quick crashes the slot is given up
+const AI_AGENT_RESTART_BASE_MS = 1000;
+const AI_AGENT_RESTART_MAX_MS = 60000;
+// A worker that ran at least this long before exiting counts as healthy again
+const AI_AGENT_HEALTHY_UPTIME_MS = 30000;
+const AI_AGENT_MAX_RESTARTS = parseInt(process.env.AI_AGENT_MAX_RESTARTS || '10', 10);
+
+// Pool of warm AI agent workers (ai_agent_cli.py --serve) that exchange
+// newline-delimited JSON tagged with a request id, instead of one process per message
+class AiAgentWorkerPool {
+  constructor(size, timeoutMs) {
+    this.size = size;
+    this.timeoutMs = timeoutMs;
+    this.workers = [];
+    this.crashes = [];
+    this.pending = new Map();
+    this.nextId = 1;
+    this.nextWorker = 0;
+  }
+
+  start() {
+    for (let i = 0; i < this.size; i++) {
+      this.workers[i] = this.spawnWorker(i);
+    }
+  }
+
+  spawnWorker(index) {
+    const proc = spawn('python3.11', [path.join(__dirname, 'ai_agent_cli.py'), '--serve']);
+    const worker = { proc, buffer: '', inFlight: new Set(), alive: true, startedAt: Date.now() };
+
+    proc.stdout.setEncoding('utf8');
+    proc.stdout.on('data', (chunk) => {
+      worker.buffer += chunk;
+      let newline;
+      while ((newline = worker.buffer.indexOf('\n')) >= 0) {
+        const line = worker.buffer.slice(0, newline).trim();
+        worker.buffer = worker.buffer.slice(newline + 1);
+        if (line) this.handleLine(worker, line);
+      }
+    });
+
+    proc.stderr.on('data', (data) => {
+      console.error(`AI Agent worker ${index}:`, data.toString());
+    });
+
+    // Writing to a worker that already died emits EPIPE here instead of crashing the server
+    proc.stdin.on('error', (error) => {
+      this.handleWorkerDeath(index, worker, `stdin error: ${error.message}`);
+    });
+
+    proc.on('error', (error) => {
+      this.handleWorkerDeath(index, worker, `failed to start: ${error.message}`);
+    });
+
+    proc.on('exit', (code, signal) => {
+      this.handleWorkerDeath(index, worker, `exited with code ${code}${signal ? ` (${signal})` : ''}`);
+    });
+
+    return worker;
+  }
+
+  // Called once per worker for whichever of exit/error/stdin error comes first
+  handleWorkerDeath(index, worker, reason) {
+    if (!worker.alive) return;
+    worker.alive = false;
+    worker.proc.kill();
+    for (const id of worker.inFlight) {
+      this.settle(id, new Error(`AI Agent worker ${reason}`));
+    }
+
+    if (Date.now() - worker.startedAt >= AI_AGENT_HEALTHY_UPTIME_MS) this.crashes[index] = 0;
+    const crashes = this.crashes[index] = (this.crashes[index] || 0) + 1;
+    if (crashes > AI_AGENT_MAX_RESTARTS) {
+      console.error(`AI Agent worker ${index} ${reason}; giving up after ${crashes - 1} quick restarts`);
+      return;
+    }
+    const delay = Math.min(AI_AGENT_RESTART_MAX_MS, AI_AGENT_RESTART_BASE_MS * 2 ** (crashes - 1));
+    console.error(`AI Agent worker ${index} ${reason}, restarting in ${delay}ms (attempt ${crashes})`);
+    setTimeout(() => { this.workers[index] = this.spawnWorker(index); }, delay);
+  }
+
+  handleLine(worker, line) {
+    let result;
+    try {
+      result = JSON.parse(line);
+    } catch (e) {
+      console.error('AI Agent worker sent invalid JSON:', line);
+      return;
+    }
+    worker.inFlight.delete(result.id);
+    this.settle(result.id, null, result);
+  }
+
+  settle(id, error, result) {
+    const entry = this.pending.get(id);
+    if (!entry) return;
+    this.pending.delete(id);
+    entry.worker.inFlight.delete(id);
+    clearTimeout(entry.timer);
+    if (error) entry.reject(error);
+    else entry.resolve(result);
+  }
+
+  pickWorker() {
+    for (let i = 0; i < this.workers.length; i++) {
+      const worker = this.workers[(this.nextWorker + i) % this.workers.length];
+      if (worker && worker.alive) {
+        this.nextWorker = (this.nextWorker + i + 1) % this.workers.length;
+        return worker;
+      }
+    }
+    return null;
+  }
+
+  request(payload) {
+    return new Promise((resolve, reject) => {
+      const worker = this.pickWorker();
+      if (!worker) {
+        reject(new Error('No AI Agent worker available'));
+        return;
+      }
+      const id = this.nextId++;
+      const timer = setTimeout(() => {
+        this.settle(id, new Error('AI Agent worker timed out'));
+      }, this.timeoutMs);
+      this.pending.set(id, { resolve, reject, timer, worker });
+      worker.inFlight.add(id);
+      // The worker answers from the knowledge base alone before this deadline expires
+      worker.proc.stdin.write(JSON.stringify({ ...payload, id, timeoutMs: this.timeoutMs }) + '\n');
+    });
+  }
+}
+
+const aiAgentPool = new AiAgentWorkerPool(
+  parseInt(process.env.AI_AGENT_POOL_SIZE || '2', 10),
+  parseInt(process.env.AI_AGENT_TIMEOUT_MS || '60000', 10)
+);
+aiAgentPool.start();
+
 app.post('/api/chatbot/message', async (req, res) => {
   try {
     const { message, sessionId, imageUrl, conversationHistory } = req.body;
@@ -1240,85 +1382,57 @@ app.post('/api/chatbot/message', async (req, res) => {
       return res.json({ response: 'عذراً، الشات بوت غير متاح حالياً.' });
     }
 
-    // Prepare conversation history for AI agent
-    let historyJson = null;
-    if (conversationHistory && conversationHistory.length > 0) {
-      // Convert conversation history to the format expected by AI agent
-      historyJson = JSON.stringify(conversationHistory);
-    }
-
     // Use AI Agent with conversation history and image data
-    const python = spawn('python3.11', [path.join(__dirname, 'ai_agent_cli.py')]);
-    
     const inputData = {
       message: message,
       conversationHistory: conversationHistory || [],
-      imageUrl: imageUrl || null
+      imageUrl: imageUrl || null,
+      sessionId: sessionId || null
     };
-    
-    python.stdin.write(JSON.stringify(inputData));
-    python.stdin.end();
-
-    let dataString = '';
-    let errorString = '';
 
-    python.stdout.on('data', (data) => {
-      dataString += data.toString();
-    });
-
-    python.stderr.on('data', (data) => {
-      errorString += data.toString();
-    });
-
-    python.on('close', async (code) => {
-      const responseTime = Date.now() - startTime;
-      let botResponse = '';
-      
-      if (code === 0 && dataString) {
-        try {
-          const result = JSON.parse(dataString);
-          botResponse = result.response;
-        } catch (e) {
-          botResponse = dataString.trim();
-        }
-      } else {
-        console.error('AI Agent error:', errorString);
-        botResponse = 'عذراً، أنا غير قادر على الإجابة في الوقت الحالي. يرجى الاتصال بالجامعة على الرقم 0798877440 للمساعدة.';
-      }
-
-      // Save conversation to database
-      try {
-        console.log('Attempting to save conversation...');
-        const conversation = new ChatbotConversation({
-          userMessage: message,
-          botResponse: botResponse,
-          imageUrl: imageUrl || null,
-          imageAnalysis: imageUrl ? 'Image uploaded and analyzed' : null,
-          sessionId: sessionId || null,
-          responseTime: responseTime,
-          ipAddress: req.ip || req.connection.remoteAddress,
-          conversationContext: conversationHistory || [],
-          metadata: {
-            browser: req.headers['user-agent'] || 'Unknown',
-            language: req.headers['accept-language'] || 'ar',
-            source: 'website',
-            hasImage: !!imageUrl
-          }
-        });
-        await conversation.save();
-        console.log('Conversation saved successfully!');
-      } catch (dbError) {
-        console.error('Error saving conversation:', dbError);
-        console.error('Conversation object that failed to save:', JSON.stringify(conversation, null, 2));
+    let botResponse = '';
+    try {
+      const result = await aiAgentPool.request(inputData);
+      if (result.error) throw new Error(result.error);
+      botResponse = result.response;
+    } catch (agentError) {
+      console.error('AI Agent error:', agentError.message);
+      botResponse = AI_AGENT_FALLBACK_RESPONSE;
+    }
+    const responseTime = Date.now() - startTime;
+
+    // Save conversation to database
+    const conversation = new ChatbotConversation({
+      userMessage: message,
+      botResponse: botResponse,
+      imageUrl: imageUrl || null,
+      imageAnalysis: imageUrl ? 'Image uploaded and analyzed' : null,
+      sessionId: sessionId || null,
+      responseTime: responseTime,
+      ipAddress: req.ip || req.connection.remoteAddress,
+      conversationContext: conversationHistory || [],
+      metadata: {
+        browser: req.headers['user-agent'] || 'Unknown',
+        language: req.headers['accept-language'] || 'ar',
+        source: 'website',
+        hasImage: !!imageUrl
       }
-
-      res.json({ response: botResponse, sessionId: sessionId, conversationHistory: conversationHistory || [] });
     });
+    try {
+      console.log('Attempting to save conversation...');
+      await conversation.save();
+      console.log('Conversation saved successfully!');
+    } catch (dbError) {
+      console.error('Error saving conversation:', dbError);
+      console.error('Conversation object that failed to save:', JSON.stringify(conversation, null, 2));
+    }
+
+    res.json({ response: botResponse, sessionId: sessionId, conversationHistory: conversationHistory || [] });
     
   } catch (error) {
     console.error('Chatbot error:', error);
     res.json({
-      response: 'عذراً، أنا غير قادر على الإجابة في الوقت الحالي. يرجى الاتصال بالجامعة على الرقم 0798877440 للمساعدة.',
+      response: AI_AGENT_FALLBACK_RESPONSE,
     });
   }
 });
@@ -0,0 +1,168 @@
+"""
+مخزن محادثات محدود الحجم
+يطرد المحادثات الأقدم استخداماً (LRU) عند تجاوز عدد الجلسات أو ميزانية الذاكرة،
+ويحذف أقدم الأدوار من الجلسة الواحدة إذا تجاوزت حدها، ويحذف الجلسات الخاملة بعد مدة محددة، ويحفظ الرسائل كقواميس مختصرة بدل كائنات SDK
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# الحد الأقصى لعدد الجلسات
+MAX_SESSIONS = int(os.getenv("SESSION_MAX", 10000))
+# مدة الخمول (بالثواني) قبل حذف الجلسة
+IDLE_TTL = float(os.getenv("SESSION_TTL", 1800))
+# ميزانية الذاكرة التقريبية لكل الجلسات (بالبايت)
+MEMORY_BUDGET = int(float(os.getenv("SESSION_MEMORY_BUDGET_MB", 64)) * 1024 * 1024)
+# حدود الجلسة الواحدة (عدد الرسائل والحجم بالبايت)؛ الجلسة النشطة لا تُطرد فتحتاج حداً خاصاً بها
+MAX_SESSION_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", 200))
+MAX_SESSION_SIZE = int(float(os.getenv("SESSION_MAX_SIZE_KB", 256)) * 1024)
+
+
+def compact_message(message):
+    """تحويل رسالة (قاموس أو كائن من OpenAI SDK) إلى قاموس يحتوي الحقول اللازمة فقط"""
+    if not isinstance(message, dict):
+        message = message.model_dump(exclude_none=True)
+
+    compact = {"role": message["role"], "content": message.get("content")}
+    if message.get("tool_calls"):
+        compact["tool_calls"] = [
+            {
+                "id": tool_call["id"],
+                "type": tool_call.get("type", "function"),
+                "function": {
+                    "name": tool_call["function"]["name"],
+                    "arguments": tool_call["function"]["arguments"]
+                }
+            }
+            for tool_call in message["tool_calls"]
+        ]
+    for key in ("tool_call_id", "name"):
+        if message.get(key):
+            compact[key] = message[key]
+    return compact
+
+
+def message_size(message):
+    """الحجم التقريبي للرسالة بالبايت"""
+    return len(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+
+
+class _Session:
+    __slots__ = ("messages", "size", "last_access")
+
+    def __init__(self):
+        self.messages = []
+        self.size = 0
+        self.last_access = time.monotonic()
+
+
+class SessionStore:
+    """جلسات المحادثة مرتبة حسب آخر استخدام، آمنة للاستخدام من عدة threads"""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_ttl=IDLE_TTL, memory_budget=MEMORY_BUDGET,
+                 max_session_messages=MAX_SESSION_MESSAGES, max_session_size=MAX_SESSION_SIZE):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.memory_budget = memory_budget
+        self.max_session_messages = max_session_messages
+        self.max_session_size = max_session_size
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_size = 0
+        self.evictions = {"capacity": 0, "ttl": 0, "memory": 0}
+        self.trimmed_messages = 0
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get_or_create(self, session_id, system_message):
+        """
+        رسائل الجلسة (قائمة حيّة تُحدَّث عبر append)، مع إنشاء جلسة جديدة إذا لم تكن موجودة
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = _Session()
+                self._sessions[session_id] = session
+                self._add(session, {"role": "system", "content": system_message})
+                self._enforce_limits(session_id)
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+            return session.messages
+
+    def append(self, session_id, *messages):
+        """إضافة رسائل إلى الجلسة بعد اختصارها؛ يتم تجاهلها إذا طُردت الجلسة"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            for message in messages:
+                self._add(session, compact_message(message))
+            self._trim(session)
+            session.last_access = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            self._enforce_limits(session_id)
+
+    def _add(self, session, message):
+        size = message_size(message)
+        session.messages.append(message)
+        session.size += size
+        self.total_size += size
+
+    def _trim(self, session):
+        """حذف أقدم الأدوار (عدا رسائل system) من الجلسة حتى تعود ضمن حدودها، مع إبقاء الدور الحالي"""
+        messages = session.messages
+        while len(messages) > self.max_session_messages or session.size > self.max_session_size:
+            start = next((i for i, message in enumerate(messages) if message["role"] != "system"), None)
+            if start is None:
+                break
+            # الدور يمتد حتى رسالة المستخدم التالية، فلا تبقى نتائج أدوات بدون الرسالة التي طلبتها
+            end = next((i for i in range(start + 1, len(messages)) if messages[i]["role"] == "user"), None)
+            if end is None:
+                break
+            size = sum(message_size(message) for message in messages[start:end])
+            del messages[start:end]
+            session.size -= size
+            self.total_size -= size
+            self.trimmed_messages += end - start
+
+    def _remove(self, session_id, reason):
+        session = self._sessions.pop(session_id)
+        self.total_size -= session.size
+        self.evictions[reason] += 1
+
+    def _expire(self, now):
+        # الجلسات مرتبة من الأقدم استخداماً، فنتوقف عند أول جلسة غير منتهية
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.idle_ttl:
+                break
+            self._remove(session_id, "ttl")
+
+    def _enforce_limits(self, current_session_id):
+        while len(self._sessions) > self.max_sessions:
+            self._remove(next(iter(self._sessions)), "capacity")
+        while self.total_size > self.memory_budget and len(self._sessions) > 1:
+            oldest = next(iter(self._sessions))
+            if oldest == current_session_id:
+                break
+            self._remove(oldest, "memory")
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self.total_size,
+                "evictions": dict(self.evictions),
+                "trimmed_messages": self.trimmed_messages,
+            }
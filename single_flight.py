@@ -0,0 +1,139 @@
+"""
+دمج الطلبات المتطابقة الجارية (single-flight)
+عند وصول نفس السؤال من عدة مستخدمين في نفس اللحظة (فتح القبول، يوم النتائج) ينفذ الطلب الأول
+استدعاءات OpenAI، وينتظر الباقون نتيجته بدل إرسال استدعاءات مستقلة.
+المفتاح هو مفتاح ذاكرة الإجابات (السؤال بعد التطبيع + إصدار قاعدة المعرفة)، فلا تُدمج إلا الأسئلة
+القابلة للتخزين (بداية المحادثة)
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+ENABLED = os.getenv("SINGLE_FLIGHT", "1") != "0"
+# أقصى مدة انتظار لنتيجة الطلب الأول بالثواني؛ بعدها ينفذ المنتظر الطلب بنفسه
+TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", 30))
+
+# نتيجة الطلب الأول في run_async
+_OK, _FAILED, _CANCELLED = range(3)
+
+
+class SingleFlight:
+    """آمن للاستخدام من عدة threads (run) ومن event loop واحد (run_async)"""
+
+    def __init__(self, enabled=ENABLED, timeout=TIMEOUT):
+        self.enabled = enabled
+        self.timeout = timeout
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _wait_timeout(self, deadline):
+        """مدة انتظار المنتظر: TIMEOUT أو ما تبقى من مهلة طلبه إن كان أقل"""
+        if deadline is None:
+            return self.timeout
+        return min(self.timeout, deadline.remaining())
+
+    def run(self, key, function, deadline=None):
+        """
+        تنفيذ function() مرة واحدة لكل مفتاح جارٍ
+
+        Args:
+            deadline: مهلة طلب المستدعي (completion_client.Deadline)؛ لا ينتظر المنتظر بعدها،
+                بل ينفذ function() بنفسه فتتعامل مع انتهاء المهلة كالمعتاد
+
+        Returns:
+            (النتيجة، True إذا أُخذت النتيجة من طلب آخر)
+        """
+        if key is None or not self.enabled:
+            return function(), False
+
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+                self.leaders += 1
+
+        if not leader:
+            try:
+                result = future.result(timeout=self._wait_timeout(deadline))
+            except FutureTimeoutError:
+                self._count("timeouts")
+                return function(), False
+            self._count("coalesced")
+            return result, True
+
+        try:
+            result = function()
+        except BaseException as e:
+            self._count("errors")
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    async def run_async(self, key, coroutine_function, deadline=None):
+        """
+        نفس run لكن لدالة async؛ المنتظرون لا يحجزون thread.
+        إلغاء الطلب الأول (انقطاع اتصال صاحبه) لا يُلغي المنتظرين: أولهم يصبح الطلب الأول الجديد
+        """
+        if key is None or not self.enabled:
+            return await coroutine_function(), False
+
+        while True:
+            future = self._async_flights.get(key)
+            if future is None:
+                break
+            try:
+                status, result = await asyncio.wait_for(asyncio.shield(future), self._wait_timeout(deadline))
+            except asyncio.TimeoutError:
+                self._count("timeouts")
+                return await coroutine_function(), False
+            if status == _CANCELLED:
+                continue
+            if status == _FAILED:
+                raise result
+            self._count("coalesced")
+            return result, True
+
+        # النتيجة تُحفظ كـ (الحالة، قيمة) حتى لا يحذّر asyncio من استثناء لم ينتظره أحد
+        future = self._async_flights[key] = asyncio.get_running_loop().create_future()
+        self._count("leaders")
+        try:
+            result = await coroutine_function()
+        except asyncio.CancelledError:
+            future.set_result((_CANCELLED, None))
+            raise
+        except BaseException as e:
+            self._count("errors")
+            future.set_result((_FAILED, e))
+            raise
+        else:
+            future.set_result((_OK, result))
+            return result, False
+        finally:
+            del self._async_flights[key]
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._flights) + len(self._async_flights),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+            }
@@ -0,0 +1,189 @@
+"""
+فهرس موقع الجامعة المبني مسبقاً (يُنشأ بالأمر build_index)
+ملف ثنائي للقراءة فقط يُفتح عبر mmap ويُستعلم منه مباشرة دون تحميله أو تحليله:
+فتح الفهرس يستغرق نفس الوقت مهما كان حجمه، وكل العمليات (العمال) التي تفتح نفس الملف
+تتشارك نفس صفحات الذاكرة من ذاكرة نظام التشغيل
+
+صيغة الملف (كل الأعداد little-endian):
+    الترويسة HEADER: MAGIC، بصمة المحتوى، الأعداد، متوسط طول المقطع، وبدايات الأقسام
+    جدول الروابط: (موضع النص، طوله) لكل رابط
+    جدول المقاطع: (موضع النص، طوله، رقم الرابط) لكل مقطع
+    أطوال المقاطع: uint32 لكل مقطع (عدد الكلمات)
+    جدول الكلمات مرتب حسب بايتات الكلمة: (موضع الكلمة، موضع الـ postings، طول الكلمة، عدد المقاطع، idf)
+    الـ postings: أزواج uint32 (رقم المقطع، التكرار)
+    النصوص: UTF-8 متتالية
+
+يُستبدل الملف دائماً بـ os.replace، فتبقى العمليات التي فتحت النسخة القديمة تقرأها بأمان
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+from collections import Counter
+
+from arabic_text import tokenize
+from bm25_index import MIN_SCORE
+
+MAGIC = b"AAUIDX2\n"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# مسار الفهرس الذي تحمّله الوكلاء
+SITE_INDEX_FILE = os.getenv("AAU_SITE_INDEX", os.path.join(BASE_DIR, "aau_site.idx"))
+
+K1 = 1.5
+B = 0.75
+
+HEADER = struct.Struct("<8s20sIIIIdQQQQQQ")
+URL_RECORD = struct.Struct("<QI")
+CHUNK_RECORD = struct.Struct("<QII")
+TERM_RECORD = struct.Struct("<QQIIf4x")
+
+
+def write_index(path, chunks):
+    """
+    كتابة الفهرس
+
+    Args:
+        chunks: قائمة من (الرابط، نص المقطع)
+    """
+    strings = bytearray()
+
+    def add_string(text):
+        data = text.encode("utf-8")
+        offset = len(strings)
+        strings.extend(data)
+        return offset, len(data)
+
+    urls = {}
+    url_table = bytearray()
+    chunk_table = bytearray()
+    lengths = []
+    postings = {}
+    for chunk_id, (url, text) in enumerate(chunks):
+        if url not in urls:
+            urls[url] = len(urls)
+            url_table += URL_RECORD.pack(*add_string(url))
+        tokens = tokenize(text)
+        lengths.append(len(tokens))
+        for term, frequency in Counter(tokens).items():
+            postings.setdefault(term, []).append((chunk_id, frequency))
+        chunk_table += CHUNK_RECORD.pack(*add_string(text), urls[url])
+
+    chunk_count = len(lengths)
+    avg_length = (sum(lengths) / chunk_count) if chunk_count else 0.0
+    term_table = bytearray()
+    postings_data = bytearray()
+    for term in sorted(postings, key=lambda term: term.encode("utf-8")):
+        term_postings = postings[term]
+        term_offset, term_length = add_string(term)
+        idf = math.log(1 + (chunk_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+        term_table += TERM_RECORD.pack(term_offset, len(postings_data), term_length, len(term_postings), idf)
+        postings_data += struct.pack(f"<{len(term_postings) * 2}I", *(n for pair in term_postings for n in pair))
+
+    sections = [url_table, chunk_table, struct.pack(f"<{chunk_count}I", *lengths), term_table, postings_data, strings]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+
+    digest = hashlib.sha1()
+    for section in sections:
+        digest.update(section)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, digest.digest(), len(urls), chunk_count, len(postings), 0, avg_length, *offsets))
+        for section in sections:
+            f.write(section)
+    os.replace(tmp_path, path)
+
+
+class SiteIndex:
+    """فهرس المقاطع المفتوح عبر mmap مع ترتيب BM25 مباشرة من الملف"""
+
+    def __init__(self, path=SITE_INDEX_FILE):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = self._mmap
+        if len(buffer) < HEADER.size or buffer[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a site index file")
+
+        (_, digest, self.url_count, self.chunk_count, self.term_count, _, self.avg_length,
+         self._urls_offset, self._chunks_offset, lengths_offset, self._terms_offset,
+         postings_offset, self._strings_offset) = HEADER.unpack_from(buffer)
+        self.digest = digest.hex()
+
+        view = memoryview(buffer)
+        self._lengths = view[lengths_offset:lengths_offset + 4 * self.chunk_count].cast("I")
+        self._postings = view[postings_offset:self._strings_offset].cast("I")
+
+    @classmethod
+    def load(cls, path=SITE_INDEX_FILE):
+        return cls(path)
+
+    def __len__(self):
+        return self.chunk_count
+
+    def _string(self, offset, length):
+        start = self._strings_offset + offset
+        return self._mmap[start:start + length].decode("utf-8")
+
+    def _find_term(self, term):
+        """بحث ثنائي في جدول الكلمات: (idf، موضع الـ postings، عدد المقاطع) أو None"""
+        key = term.encode("utf-8")
+        buffer = self._mmap
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            term_offset, postings_offset, length, count, idf = TERM_RECORD.unpack_from(
+                buffer, self._terms_offset + middle * TERM_RECORD.size
+            )
+            start = self._strings_offset + term_offset
+            candidate = buffer[start:start + length]
+            if candidate == key:
+                return idf, postings_offset // 4, count
+            if candidate < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def scores(self, query):
+        """درجات BM25 لكل المقاطع التي تحتوي على كلمة واحدة على الأقل من الاستعلام"""
+        scores = {}
+        lengths = self._lengths
+        postings = self._postings
+        avg_length = self.avg_length or 1.0
+        for term in set(tokenize(query)):
+            found = self._find_term(term)
+            if found is None:
+                continue
+            idf, start, count = found
+            for position in range(start, start + 2 * count, 2):
+                chunk_id = postings[position]
+                frequency = postings[position + 1]
+                norm = K1 * (1 - B + B * lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+        return scores
+
+    def chunk(self, chunk_id):
+        """(الرابط، نص المقطع)"""
+        text_offset, text_length, url_id = CHUNK_RECORD.unpack_from(
+            self._mmap, self._chunks_offset + chunk_id * CHUNK_RECORD.size
+        )
+        url_offset, url_length = URL_RECORD.unpack_from(self._mmap, self._urls_offset + url_id * URL_RECORD.size)
+        return self._string(url_offset, url_length), self._string(text_offset, text_length)
+
+    def search(self, query, top_k=3, min_score=MIN_SCORE):
+        """
+        أقرب المقاطع للسؤال
+
+        Returns:
+            قائمة من (الرابط، نص المقطع)
+        """
+        ranked = sorted(self.scores(query).items(), key=lambda item: (-item[1], item[0]))
+        return [self.chunk(chunk_id) for chunk_id, score in ranked[:top_k] if score >= min_score]
@@ -13,6 +13,10 @@ const TecChatbot = ({ apiUrl, isEnabled = true }) => {
   const [imagePreview, setImagePreview] = useState(null);
   const messagesEndRef = useRef(null);
   const fileInputRef = useRef(null);
+  // Stable id for this conversation so the backend can keep per-session state (history summaries)
+  const sessionIdRef = useRef(
+    window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`
+  );
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -93,6 +97,7 @@ const TecChatbot = ({ apiUrl, isEnabled = true }) => {
           message: inputMessage,
           conversationHistory: conversationHistory,
           imageUrl: sentImage || null,
+          sessionId: sessionIdRef.current,
         }),
       });
 
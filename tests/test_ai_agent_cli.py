@@ -0,0 +1,97 @@
+"""
+مسار العامل (server.cjs ← ai_agent_cli.py --serve) بنفس الطلب الذي يرسله TecChatbot.jsx:
+conversationHistory يبدأ دائماً برسالة الترحيب حتى في أول سؤال
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from openai import OpenAI
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import ai_agent_cli
+from answer_cache import AnswerCache
+from benchmarks.mock_openai import MockOpenAIServer
+from completion_client import CompletionClient
+from history_manager import HistoryManager
+from single_flight import SingleFlight
+
+WELCOME = "مرحباً! أنا Tec 🤖، مساعدك الذكي في جامعة عمان العربية. كيف يمكنني مساعدتك اليوم؟"
+
+
+def widget_request(message, history=()):
+    """نفس body الذي يرسله TecChatbot.jsx، كما يمرره server.cjs للعامل"""
+    return {
+        "message": message,
+        "conversationHistory": [{"role": "assistant", "content": WELCOME}, *history],
+        "imageUrl": None,
+        "sessionId": None,
+        "timeoutMs": 60000,
+    }
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockOpenAIServer(latency_ms=50) as server:
+        client = OpenAI(api_key="test", base_url=server.base_url + "/v1")
+        monkeypatch.setattr(ai_agent_cli, "completions", CompletionClient(client))
+        monkeypatch.setattr(ai_agent_cli, "ANSWER_CACHE", AnswerCache())
+        yield server
+
+
+def test_first_question_from_widget_is_cached(server):
+    first = ai_agent_cli.handle_request(widget_request("ما هي رسوم الساعات المعتمدة؟"))
+    requests_after_first = server.requests
+    second = ai_agent_cli.handle_request(widget_request("ما هي رسوم الساعات المعتمدة"))
+    assert second == first
+    assert server.requests == requests_after_first
+    assert ai_agent_cli.ANSWER_CACHE.stats()["hits"] == 1
+
+
+def test_follow_up_question_is_not_cached(server):
+    history = [{"role": "user", "content": "ما هي التخصصات؟"}, {"role": "assistant", "content": "..."}]
+    ai_agent_cli.handle_request(widget_request("كم رسومها؟", history))
+    ai_agent_cli.handle_request(widget_request("كم رسومها؟", history))
+    assert ai_agent_cli.ANSWER_CACHE.stats()["hits"] == 0
+
+
+def test_concurrent_identical_widget_questions_are_coalesced(server, monkeypatch):
+    monkeypatch.setattr(ai_agent_cli, "SINGLE_FLIGHT", SingleFlight(enabled=True))
+    server.latency = 0.3
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        answers = list(executor.map(
+            lambda _: ai_agent_cli.handle_request(widget_request("ما هي رسوم الساعات المعتمدة؟")), range(8)
+        ))
+    assert len({answer["response"] for answer in answers}) == 1
+    assert server.requests == 1
+    assert ai_agent_cli.SINGLE_FLIGHT.stats()["coalesced"] >= 1
+
+
+def test_contact_question_from_widget_is_answered_locally(server):
+    response = ai_agent_cli.handle_request(widget_request("رقم الهاتف"))["response"]
+    assert response == ai_agent_cli.KNOWLEDGE_STORE.snapshot().entries["contact"]["info"]
+    assert server.requests == 0
+
+    history = [{"role": "user", "content": "ما هي التخصصات؟"}, {"role": "assistant", "content": "..."}]
+    ai_agent_cli.handle_request(widget_request("رقم الهاتف", history))
+    assert server.requests == 1
+
+
+def test_history_summary_is_reused_without_session_id():
+    history = [{"role": "user", "content": f"سؤال رقم {i} " * 40} if i % 2 == 0
+               else {"role": "assistant", "content": f"جواب رقم {i} " * 40} for i in range(20)]
+    calls = []
+
+    def summarizer(previous, messages):
+        calls.append(len(messages))
+        return "ملخص"
+
+    manager = HistoryManager(summarizer=summarizer)
+    for turns in (16, 18, 20):
+        payload = widget_request("سؤال جديد", history[:turns])
+        key = ai_agent_cli.history_key(payload["sessionId"], payload["conversationHistory"])
+        manager.compact(key, [{"role": "system", "content": "..."}, *payload["conversationHistory"]])
+    # بعد أول ملخص تُلخَّص الأدوار المطوية الجديدة فقط
+    assert calls[0] > 2 and all(count <= 2 for count in calls[1:])
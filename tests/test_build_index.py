@@ -0,0 +1,21 @@
+"""
+نسخة الموقع المحلية تُقرأ بايتات، فتُفك الصفحات غير UTF-8 حسب meta charset
+"""
+
+from build_index import crawl_directory
+from website_fetcher import extract_text
+
+TEXT = "شروط القبول في جامعة عمان العربية"
+
+
+def test_mirror_pages_use_their_meta_charset(tmp_path):
+    (tmp_path / "ar").mkdir()
+    (tmp_path / "ar" / "index.html").write_bytes(
+        f'<html><head><meta charset="windows-1256"></head><body><p>{TEXT}</p></body></html>'.encode("cp1256")
+    )
+
+    [(url, html)] = crawl_directory(str(tmp_path), "https://www.aau.edu.jo")
+
+    assert url == "https://www.aau.edu.jo/ar/"
+    assert isinstance(html, bytes)
+    assert extract_text(html) == TEXT
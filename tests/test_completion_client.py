@@ -0,0 +1,46 @@
+"""
+محاولة عالقة تنتهي بعد attempt_timeout ويُعاد الطلب ضمن مهلة الطلب نفسها
+"""
+
+import threading
+import time
+
+import pytest
+from openai import OpenAI
+
+from benchmarks.mock_openai import MockOpenAIServer
+from completion_client import CompletionClient, Deadline, DeadlineExceeded
+
+MESSAGES = [{"role": "user", "content": "ما هي رسوم الساعات المعتمدة"}]
+
+
+@pytest.fixture
+def server():
+    with MockOpenAIServer(stall_ms=5000) as server:
+        yield server
+
+
+def _client(server, **kwargs):
+    openai_client = OpenAI(api_key="test", base_url=server.base_url + "/v1")
+    return CompletionClient(openai_client, backoff_base=0.01, min_attempt_seconds=0.2, **kwargs)
+
+
+def test_stalled_attempt_is_retried_within_deadline(server):
+    server.stall_rate = 1.0
+    # الطلب الأول فقط يعلق
+    threading.Timer(0.2, setattr, (server, "stall_rate", 0.0)).start()
+    client = _client(server, attempt_timeout=0.5)
+    started = time.monotonic()
+    response = client.create(Deadline(3), model="gpt-4.1-mini", messages=MESSAGES)
+    assert response.choices[0].message.content
+    assert time.monotonic() - started < 2
+    assert server.requests == 2
+
+
+def test_stall_longer_than_deadline_raises(server):
+    server.stall_rate = 1.0
+    client = _client(server, attempt_timeout=0.5, max_retries=10)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        client.create(Deadline(1.5), model="gpt-4.1-mini", messages=MESSAGES)
+    assert time.monotonic() - started < 2
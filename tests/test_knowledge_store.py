@@ -0,0 +1,72 @@
+"""
+الاسترجاع لا يعيد فئات غير مرتبطة بالسؤال:
+الكلمات المفتاحية تُطابق كلمات كاملة، والتحيات والشكر ليست ضمن الاسترجاع
+"""
+
+import json
+import os
+
+import pytest
+
+from keyword_matcher import KeywordMatcher
+from knowledge_store import CONVERSATIONAL_CATEGORIES, KNOWLEDGE_FILE, KnowledgeStore, build_snapshot
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    return build_snapshot([KNOWLEDGE_FILE])
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("which major should I choose?", ["majors"]),
+    ("this is about the library", ["services"]),
+    ("ما هي رسوم جامعة عمان العربية؟", ["fees"]),
+    ("شروط قبول الطلاب", ["admission"]),
+])
+def test_lexical_search_ignores_unrelated_categories(snapshot, query, expected):
+    assert snapshot.lexical_search(query) == expected
+
+
+@pytest.mark.parametrize("query", ["hi", "شكرا جزيلا", "السلام عليكم"])
+def test_conversational_categories_are_not_retrieved(snapshot, query):
+    categories = [category for category, _ in snapshot.search(query)]
+    assert not set(categories) & set(CONVERSATIONAL_CATEGORIES)
+
+
+def test_conversational_categories_stay_in_entries(snapshot):
+    for category in CONVERSATIONAL_CATEGORIES:
+        assert category in snapshot.entries
+
+
+def test_location_keyword_still_matches_outside_university_name(snapshot):
+    assert snapshot.lexical_search("وين موقع الجامعة")[0] == "location"
+
+
+def test_matcher_uses_token_boundaries():
+    matcher = KeywordMatcher({"greetings": ["hi", "السلام عليكم"], "admission": ["طلب"], "fees": ["رسوم"]})
+    assert matcher.match_counts("which") == {}
+    assert matcher.match_counts("this") == {}
+    assert matcher.match_counts("طلاب الجامعة") == {}
+    assert matcher.match_counts("hi there") == {"greetings": 1}
+    assert matcher.match_counts("وعليكم السلام عليكم") == {"greetings": 1}
+    assert matcher.match_counts("ما هي الرسوم") == {"fees": 1}
+
+
+def test_reload_retries_after_invalid_file(tmp_path):
+    path = tmp_path / "knowledge.json"
+    entry = {"keywords": ["رسوم"], "info": "الرسوم القديمة"}
+    path.write_text(json.dumps({"fees": entry}, ensure_ascii=False), encoding="utf-8")
+    store = KnowledgeStore([str(path)], check_interval=0, site_index_path=None)
+    version = store.version
+
+    # ملف نصف مكتوب: تبقى النسخة القديمة
+    path.write_text('{"fees": {"keywords": ["رسوم"], "info": "الرسوم ال', encoding="utf-8")
+    assert not store.reload_if_changed()
+    assert store.version == version
+
+    # نفس تاريخ التعديل بعد إكمال الكتابة (دقة نظام الملفات): يجب أن تُحمّل النسخة الجديدة
+    mtime = os.stat(path).st_mtime_ns
+    path.write_text(json.dumps({"fees": dict(entry, info="الرسوم الجديدة")}, ensure_ascii=False), encoding="utf-8")
+    os.utime(path, ns=(mtime, mtime))
+    assert store.reload_if_changed()
+    assert store.search("رسوم")[0][1] == "الرسوم الجديدة"
@@ -0,0 +1,52 @@
+"""
+الجلسة الواحدة لا تنمو بلا حد: أقدم الأدوار تُحذف مع إبقاء رسالة system والدور الحالي
+"""
+
+from session_store import SessionStore, message_size
+
+
+def tool_turn(store, session_id, number):
+    store.append(session_id, {"role": "user", "content": f"سؤال {number}"})
+    store.append(
+        session_id,
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"id": f"call-{number}", "type": "function",
+             "function": {"name": "search_aau_knowledge", "arguments": "{}"}}
+        ]},
+        {"role": "tool", "tool_call_id": f"call-{number}", "content": "نتيجة"},
+    )
+    store.append(session_id, {"role": "assistant", "content": f"جواب {number}"})
+
+
+def test_message_cap_drops_oldest_whole_turns():
+    store = SessionStore(max_session_messages=9)
+    messages = store.get_or_create("s", "system")
+    for number in range(5):
+        tool_turn(store, "s", number)
+
+    assert len(messages) <= 9
+    assert messages[0] == {"role": "system", "content": "system"}
+    # كل نتيجة أداة متبقية تسبقها الرسالة التي طلبتها
+    assert messages[1]["role"] == "user"
+    assert messages[-1]["content"] == "جواب 4"
+    assert store.stats()["trimmed_messages"] == 21 - len(messages)
+    assert store.total_size == sum(message_size(message) for message in messages)
+
+
+def test_size_cap_bounds_the_active_session():
+    store = SessionStore(max_session_size=2000)
+    messages = store.get_or_create("s", "system")
+    for number in range(50):
+        store.append("s", {"role": "user", "content": "س" * 100}, {"role": "assistant", "content": "ج" * 100})
+
+    assert store.stats()["bytes"] <= 2000
+    assert len(store) == 1
+    assert messages[0]["role"] == "system"
+
+
+def test_current_turn_is_never_dropped():
+    store = SessionStore(max_session_messages=2)
+    messages = store.get_or_create("s", "system")
+    store.append("s", {"role": "user", "content": "سؤال"}, {"role": "assistant", "content": "جواب"})
+
+    assert [message["role"] for message in messages] == ["system", "user", "assistant"]
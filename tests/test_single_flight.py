@@ -0,0 +1,69 @@
+"""
+المنتظرون يحترمون مهلة طلبهم، وإلغاء الطلب الأول لا يُلغي المنتظرين
+"""
+
+import asyncio
+import threading
+import time
+
+from completion_client import Deadline
+from single_flight import SingleFlight
+
+
+def test_follower_stops_waiting_at_its_deadline():
+    flight = SingleFlight(timeout=30)
+    release = threading.Event()
+    leader = threading.Thread(target=flight.run, args=("key", lambda: release.wait(5) and "leader"))
+    leader.start()
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    result, coalesced = flight.run("key", lambda: "own", Deadline(0.2))
+    assert (result, coalesced) == ("own", False)
+    assert time.monotonic() - started < 1
+    assert flight.timeouts == 1
+    release.set()
+    leader.join()
+
+
+def test_async_follower_stops_waiting_at_its_deadline():
+    flight = SingleFlight(timeout=30)
+
+    async def slow():
+        await asyncio.sleep(5)
+        return "leader"
+
+    async def own():
+        return "own"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.run_async("key", slow))
+        await asyncio.sleep(0)
+        result = await flight.run_async("key", own, Deadline(0.2))
+        leader.cancel()
+        return result
+
+    assert asyncio.run(main()) == ("own", False)
+
+
+def test_cancelled_async_leader_hands_over_to_followers():
+    flight = SingleFlight(timeout=30)
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.run_async("key", generate))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.run_async("key", generate)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*followers)
+
+    results = asyncio.run(main())
+    assert [result for result, _ in results] == ["answer"] * 3
+    assert sorted(coalesced for _, coalesced in results) == [False, True, True]
+    assert len(calls) == 2
@@ -0,0 +1,95 @@
+"""
+WebsiteFetcher مقابل خادم HTTP محلي: ترميز الصفحات العربية، الطلبات الشرطية، وفهرس الفقرات في الذاكرة
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from website_fetcher import PageCache, WebsiteFetcher
+
+LAST_MODIFIED = "Mon, 06 Jan 2025 10:00:00 GMT"
+PAGES = {
+    # بدون charset في الترويسة: الترميز من meta فقط
+    "/ar/library": (
+        "text/html",
+        '<html><head><meta charset="utf-8"></head><body>'
+        "<nav>القائمة</nav><p>تفتح مكتبة الجامعة أبوابها من الساعة الثامنة صباحاً</p></body></html>",
+    ),
+    "/ar/student-affairs": (
+        "text/html; charset=utf-8",
+        "<html><body><p>عمادة شؤون الطلبة تنظم الأنشطة والنوادي الطلابية</p></body></html>",
+    ),
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        if self.path not in PAGES:
+            self.send_error(404)
+            return
+        if self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            self.send_response(304)
+            self.end_headers()
+            return
+        content_type, html = PAGES[self.path]
+        body = html.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.hits = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _fetcher(server, tmp_path, fresh_ttl=3600):
+    host, port = server.server_address[:2]
+    return WebsiteFetcher(
+        base_url=f"http://{host}:{port}",
+        pages=list(PAGES),
+        cache=PageCache(str(tmp_path)),
+        fresh_ttl=fresh_ttl,
+    )
+
+
+def test_arabic_page_without_charset_header_is_decoded(server, tmp_path):
+    text = _fetcher(server, tmp_path).fetch_text("/ar/library")
+    assert "مكتبة الجامعة" in text
+    assert "القائمة" not in text
+
+
+def test_search_reuses_in_memory_index(server, tmp_path):
+    fetcher = _fetcher(server, tmp_path)
+    url, passage = fetcher.search("متى تفتح المكتبة")[0]
+    assert url.endswith("/ar/library")
+    assert "الثامنة" in passage
+    assert fetcher.requests_sent == 2
+
+    fetcher.cache.get = None  # أي قراءة من القرص تفشل
+    assert fetcher.search("النوادي الطلابية")[0][0].endswith("/ar/student-affairs")
+    assert fetcher.requests_sent == 2
+
+
+def test_stale_pages_are_revalidated_without_rebuilding(server, tmp_path):
+    fetcher = _fetcher(server, tmp_path, fresh_ttl=0)
+    fetcher.search("مكتبة")
+    index = fetcher._index
+    fetcher.search("مكتبة")
+    assert fetcher.requests_sent == 4
+    assert fetcher._index is index
@@ -0,0 +1,105 @@
+"""
+تنفيذ استدعاءات الأدوات التي يطلبها النموذج
+سجل للأدوات، وتنفيذ متوازٍ عبر مجمع threads محدود مع مهلة لكل أداة،
+وإرجاع النتائج بنفس ترتيب الطلبات
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# الحد الأقصى لعدد الأدوات المنفذة في نفس الوقت
+MAX_WORKERS = int(os.getenv("TOOL_EXECUTOR_WORKERS", 8))
+# المهلة الافتراضية لكل أداة بالثواني
+DEFAULT_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", 10))
+
+
+def _call_fields(tool_call):
+    """(المعرّف، اسم الأداة، نص المعاملات) من كائن SDK أو قاموس"""
+    if isinstance(tool_call, dict):
+        return tool_call["id"], tool_call["function"]["name"], tool_call["function"]["arguments"]
+    return tool_call.id, tool_call.function.name, tool_call.function.arguments
+
+
+class ToolExecutor:
+    """سجل الأدوات ومنفذها"""
+
+    def __init__(self, max_workers=MAX_WORKERS, default_timeout=DEFAULT_TIMEOUT):
+        self.default_timeout = default_timeout
+        self._tools = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def register(self, name, func, timeout=None):
+        """تسجيل أداة تُستدعى بالمعاملات التي يرسلها النموذج: func(**arguments) -> str"""
+        self._tools[name] = (func, timeout or self.default_timeout)
+        return func
+
+    def _run(self, name, arguments):
+        tool = self._tools.get(name)
+        if tool is None:
+            return f"الأداة '{name}' غير معروفة."
+        func, _ = tool
+        try:
+            return str(func(**json.loads(arguments or "{}")))
+        except Exception as e:
+            sys.stderr.write(f"Tool {name} failed: {e}\n")
+            return f"عذراً، حدث خطأ أثناء تنفيذ الأداة: {str(e)}"
+
+    def _timeout(self, name):
+        tool = self._tools.get(name)
+        return tool[1] if tool else self.default_timeout
+
+    @staticmethod
+    def _tool_message(tool_call_id, name, content):
+        return {
+            "tool_call_id": tool_call_id,
+            "role": "tool",
+            "name": name,
+            "content": content
+        }
+
+    @staticmethod
+    def _timeout_message(name):
+        sys.stderr.write(f"Tool {name} timed out\n")
+        return f"انتهت مهلة تنفيذ الأداة '{name}'."
+
+    def execute(self, tool_calls):
+        """
+        تنفيذ استدعاءات الأدوات بالتوازي
+
+        Returns:
+            رسائل role=tool بنفس ترتيب tool_calls
+        """
+        calls = [_call_fields(tool_call) for tool_call in tool_calls]
+        started = time.monotonic()
+        futures = [self._pool.submit(self._run, name, arguments) for _, name, arguments in calls]
+        messages = []
+        for (tool_call_id, name, _), future in zip(calls, futures):
+            remaining = max(0.0, self._timeout(name) - (time.monotonic() - started))
+            try:
+                content = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                future.cancel()
+                content = self._timeout_message(name)
+            messages.append(self._tool_message(tool_call_id, name, content))
+        return messages
+
+    async def execute_async(self, tool_calls):
+        """نفس execute لكن دون حجز event loop: الأدوات تعمل في المجمع وتُنتظر بـ asyncio.gather"""
+        loop = asyncio.get_running_loop()
+        calls = [_call_fields(tool_call) for tool_call in tool_calls]
+
+        async def run(tool_call_id, name, arguments):
+            try:
+                content = await asyncio.wait_for(
+                    loop.run_in_executor(self._pool, self._run, name, arguments),
+                    timeout=self._timeout(name)
+                )
+            except asyncio.TimeoutError:
+                content = self._timeout_message(name)
+            return self._tool_message(tool_call_id, name, content)
+
+        return list(await asyncio.gather(*(run(*call) for call in calls)))
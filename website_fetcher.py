@@ -0,0 +1,270 @@
+"""
+جلب صفحات موقع جامعة عمان العربية واستخراج نصها
+اتصالات مُعاد استخدامها عبر requests.Session، وطلبات شرطية (ETag / Last-Modified)،
+وذاكرة مؤقتة على القرص لنص الصفحات محدودة الحجم بحيث لا تصل الأسئلة المتكررة للشبكة
+
+للاختبار بدون إنترنت يكفي توجيه AAU_WEBSITE_BASE_URL إلى خادم HTTP محلي
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from arabic_text import tokenize
+from bm25_index import BM25Index
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# عنوان الموقع والصفحات التي يتم البحث فيها
+BASE_URL = os.getenv("AAU_WEBSITE_BASE_URL", "https://www.aau.edu.jo")
+PAGES = [
+    page.strip()
+    for page in os.getenv("AAU_WEBSITE_PAGES", "/ar,/ar/library,/ar/student-affairs").split(",")
+    if page.strip()
+]
+# مجلد الذاكرة المؤقتة وحجمها الأقصى (بالبايت)
+CACHE_DIR = os.getenv("AAU_WEBSITE_CACHE_DIR", os.path.join(BASE_DIR, ".cache", "aau_website"))
+CACHE_MAX_BYTES = int(float(os.getenv("AAU_WEBSITE_CACHE_MB", 32)) * 1024 * 1024)
+# المدة (بالثواني) التي تُعتبر فيها الصفحة المحفوظة حديثة دون أي طلب للشبكة
+FRESH_TTL = float(os.getenv("AAU_WEBSITE_FRESH_TTL", 3600))
+# عدد الاتصالات المفتوحة مع الموقع
+POOL_SIZE = int(os.getenv("AAU_WEBSITE_POOL_SIZE", 4))
+TIMEOUT = float(os.getenv("AAU_WEBSITE_TIMEOUT", 10))
+# أقصر فقرة تدخل في البحث (بالحروف)
+MIN_PASSAGE_CHARS = 20
+# أقل درجة BM25 للفقرة (أقل من قاعدة المعرفة لأن الفقرات قصيرة وبدون كلمات مفتاحية)
+MIN_PASSAGE_SCORE = 1.0
+
+_SKIP_TAGS = ("script", "style", "noscript", "header", "footer", "nav", "form", "svg")
+
+
+def declared_encoding(response):
+    """
+    الترميز المذكور في ترويسة Content-Type فقط؛ requests يفترض ISO-8859-1 لـ text/html بدونه
+    فتتشوه الصفحات العربية، وبدونه يقرأ BeautifulSoup الترميز من meta charset
+    """
+    if "charset" in response.headers.get("Content-Type", "").lower():
+        return response.encoding
+    return None
+
+
+def extract_text(html, encoding=None):
+    """
+    نص الصفحة المقروء: فقرة في كل سطر، بدون القوائم والسكربتات
+
+    Args:
+        html: بايتات الصفحة (يُكتشف ترميزها من encoding أو meta charset) أو نص
+        encoding: الترميز من ترويسة الرد إن وُجد
+    """
+    if isinstance(html, bytes):
+        soup = BeautifulSoup(html, "html.parser", from_encoding=encoding)
+    else:
+        soup = BeautifulSoup(html, "html.parser")
+    for element in soup(_SKIP_TAGS):
+        element.decompose()
+    lines = (" ".join(line.split()) for line in soup.get_text("\n").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class PageCache:
+    """ذاكرة على القرص: ملف JSON لكل صفحة، ويُحذف الأقدم استخداماً عند تجاوز الحجم"""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_size = sum(size for _, _, size in self._files())
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _files(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+        return files
+
+    def get(self, url):
+        """{"etag", "last_modified", "fetched_at", "text"} أو None"""
+        path = self._path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # تاريخ التعديل يمثل آخر استخدام
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def set(self, url, entry):
+        path = self._path(url)
+        data = json.dumps(dict(entry, url=url), ensure_ascii=False).encode("utf-8")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.total_size += len(data) - old_size
+            self._evict(keep=path)
+
+    def touch(self, url, fetched_at):
+        """تحديث وقت الجلب بعد رد 304 دون تغيير النص"""
+        entry = self.get(url)
+        if entry is not None:
+            entry["fetched_at"] = fetched_at
+            self.set(url, entry)
+
+    def _evict(self, keep):
+        if self.total_size <= self.max_bytes:
+            return
+        for _, path, size in sorted(self._files()):
+            if self.total_size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                self.total_size -= size
+            except OSError:
+                pass
+
+
+class WebsiteFetcher:
+    """
+    يجلب صفحات الموقع (من الذاكرة أو بطلب شرطي) ويبحث في فقراتها بـ BM25؛
+    فهرس الفقرات في الذاكرة، ويُعاد فحص الصفحات كل fresh_ttl ويُبنى من جديد فقط إذا تغيّر نص صفحة
+    """
+
+    def __init__(self, base_url=BASE_URL, pages=None, cache=None, fresh_ttl=FRESH_TTL,
+                 pool_size=POOL_SIZE, timeout=TIMEOUT):
+        self.base_url = base_url
+        self.pages = list(pages if pages is not None else PAGES)
+        self.cache = cache if cache is not None else PageCache()
+        self.fresh_ttl = fresh_ttl
+        self.timeout = timeout
+        self.requests_sent = 0
+        self._stats_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = "TecBot/1.0 (+https://www.aau.edu.jo)"
+        self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="website")
+
+        self._index_lock = threading.Lock()
+        self._index = None
+        self._passages = []
+        # يصبح True عند حفظ نص جديد لأي صفحة
+        self._index_dirty = True
+        self._index_checked_until = 0.0
+
+    def fetch_text(self, url):
+        """نص الصفحة؛ يرجع للنسخة المحفوظة إذا كانت حديثة أو إذا فشل الاتصال"""
+        url = urljoin(self.base_url, url)
+        entry = self.cache.get(url)
+        now = time.time()
+        if entry is not None and now - entry.get("fetched_at", 0) < self.fresh_ttl:
+            return entry["text"]
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            with self._stats_lock:
+                self.requests_sent += 1
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry is not None:
+                self.cache.touch(url, now)
+                return entry["text"]
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if entry is not None:
+                sys.stderr.write(f"Website fetch failed for {url}, using cached copy: {e}\n")
+                return entry["text"]
+            raise
+
+        text = extract_text(response.content, declared_encoding(response))
+        self.cache.set(url, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": now,
+            "text": text
+        })
+        if entry is None or entry.get("text") != text:
+            self._index_dirty = True
+        return text
+
+    def _page_texts(self):
+        def fetch(page):
+            try:
+                return page, self.fetch_text(page)
+            except requests.RequestException as e:
+                sys.stderr.write(f"Website fetch failed for {page}: {e}\n")
+                return page, ""
+        return list(self._pool.map(fetch, self.pages))
+
+    def _passage_index(self):
+        """فهرس BM25 لفقرات كل الصفحات؛ لا يُقرأ القرص ولا الشبكة قبل انتهاء fresh_ttl"""
+        with self._index_lock:
+            if self._index is not None and time.time() < self._index_checked_until:
+                return self._index, self._passages
+            texts = self._page_texts()
+            self._index_checked_until = time.time() + self.fresh_ttl
+            if self._index is None or self._index_dirty:
+                self._index_dirty = False
+                passages = [
+                    (urljoin(self.base_url, page), line)
+                    for page, text in texts
+                    for line in text.split("\n")
+                    if len(line) >= MIN_PASSAGE_CHARS
+                ]
+                self._index = BM25Index(
+                    [(position, tokenize(line)) for position, (_, line) in enumerate(passages)]
+                )
+                self._passages = passages
+            return self._index, self._passages
+
+    def search(self, query, top_k=3):
+        """
+        أقرب فقرات الموقع للسؤال
+
+        Returns:
+            قائمة من (رابط الصفحة، نص الفقرة)
+        """
+        index, passages = self._passage_index()
+        return [passages[position] for position, _ in index.search(query, top_k=top_k, min_score=MIN_PASSAGE_SCORE)]
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """WebsiteFetcher واحد مشترك للعملية"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = WebsiteFetcher()
+        return _fetcher